@@ -1,7 +1,8 @@
 from app import app
 from extensions import db
-from services.stock_service import Stock  # Import models
-from services.billing_service import Billing  # Import models
+from services.stock_service import Stock, StockLot  # Import models
+from services.billing_service import Billing, BillHeader, BillLine  # Import models
+from services.sequence_service import BillSequence  # Import models
 from services.reports_service import Report  # Import models
 from services.reminders_service import Reminder  # Import models
 #from services.templates_service import Template  # Import models
@@ -9,6 +10,9 @@ from services.account_service import Account  # Import models
 from services.dashboard_service import Dashboard  # Import models
 from services.party_service import Party  # Import models
 from services.staff_service import Staff  # Import models
+from services.customer_service import Customer  # Import models
+from services.cache_service import DataVersion  # Import models
+from services.rollup_service import DailySalesRollup  # Import models
 from services.billing_service import Billing  # Import models
 
 # Initialize the app and db
@@ -1,3 +1,5 @@
 # extensions.py
 from flask_sqlalchemy import SQLAlchemy
+from flask_socketio import SocketIO
 db = SQLAlchemy()
+socketio = SocketIO()
@@ -0,0 +1,111 @@
+# predict/forecast.py
+# Demand forecasts for the whole catalog at once. The smoothing state of
+# every product is advanced one day at a time with array operations, so the
+# cost grows with the days of history, not with the number of products.
+import numpy as np
+from sales_engine import day_number
+
+# Average days between sales above which a product counts as an
+# intermittent seller and is forecast with Croston's method
+INTERMITTENT_ADI = 1.32
+
+
+class SmoothingState:
+    """
+    Per-product simple exponential smoothing and Croston state.
+
+    SES smooths the daily quantity from a product's first sale on. Croston
+    smooths demand sizes and the intervals between sales separately, only on
+    days with a sale; its daily rate is size / interval. The interval starts
+    at the gap between the first two sales, so neither method depends on
+    where the history window begins; a product sold once has its sale spread
+    over the days since.
+    """
+
+    FIELDS = ('level', 'size', 'interval', 'since', 'sale_days', 'first_sale')
+
+    def __init__(self, n_products=0, alpha=0.1):
+        self.alpha = alpha
+        self.level = np.zeros(n_products)
+        self.size = np.zeros(n_products)
+        self.interval = np.zeros(n_products)
+        self.since = np.ones(n_products)  # Days since the previous sale, counting today
+        self.sale_days = np.zeros(n_products, dtype=np.int64)
+        self.first_sale = np.full(n_products, -1, dtype=np.int64)  # Epoch day, -1 if never sold
+
+    def grow(self, n_products):
+        """Make room for products added to the catalog since the state was created."""
+        extra = n_products - len(self.level)
+        if extra > 0:
+            for name, fill in (('level', 0), ('size', 0), ('interval', 0), ('since', 1),
+                               ('sale_days', 0), ('first_sale', -1)):
+                values = getattr(self, name)
+                setattr(self, name, np.concatenate([values, np.full(extra, fill, dtype=values.dtype)]))
+
+    def step(self, row, day):
+        """Advance every product by one day given that day's quantities."""
+        alpha = self.alpha
+        sold = row > 0
+        seen = self.sale_days > 0
+        first = sold & ~seen
+        again = sold & seen
+        second = again & (self.sale_days == 1)
+        self.level = np.where(first, row, np.where(seen, self.level + alpha * (row - self.level), self.level))
+        self.size = np.where(first, row, np.where(again, self.size + alpha * (row - self.size), self.size))
+        self.interval = np.where(second, self.since,
+                                 np.where(again, self.interval + alpha * (self.since - self.interval),
+                                          self.interval))
+        self.first_sale = np.where(first, day, self.first_sale)
+        self.sale_days += sold
+        self.since = np.where(sold, 1, self.since + 1)
+
+    def fold(self, demand, start_day):
+        """Advance through a day x product matrix whose first row is epoch day start_day."""
+        self.grow(demand.shape[1])
+        for t, row in enumerate(demand):
+            self.step(row, start_day + t)
+
+    def rates(self, end_day):
+        """
+        Daily demand rate, average interval between sales and method of each
+        product, for state folded up to (not including) epoch day end_day.
+        """
+        n_products = len(self.level)
+        adi = np.divide(end_day - self.first_sale, self.sale_days, out=np.zeros(n_products),
+                        where=self.sale_days > 0)
+        intermittent = adi > INTERMITTENT_ADI
+        once = np.divide(self.size, end_day - self.first_sale, out=np.zeros(n_products),
+                         where=self.sale_days > 0)
+        croston = np.divide(self.size, self.interval, out=once, where=self.interval > 0)
+        rates = np.where(intermittent, croston, self.level)
+        methods = np.where(self.sale_days == 0, 'none', np.where(intermittent, 'croston', 'ses'))
+        return rates, adi, methods
+
+
+def forecast_rows(sales, rates, adi, methods, horizons):
+    """One dict per product with its method, daily rate and forecast per horizon."""
+    rate_list, adi_list, method_list = rates.tolist(), adi.round(2).tolist(), methods.tolist()
+    forecasts = {str(h): (rates * h).round(2).tolist() for h in horizons}
+    return [{
+        'product_code': sales.codes[i],
+        'product_name': sales.names[i],
+        'method': method_list[i],
+        'average_interval': adi_list[i],
+        'daily_rate': round(rate_list[i], 4),
+        'forecast': {h: values[i] for h, values in forecasts.items()},
+    } for i in range(len(rate_list))]
+
+
+def forecast_demand(sales, today, history_days=730, horizons=(7, 30), alpha=0.1):
+    """
+    Forecast units sold over the next `horizons` days for every product,
+    from the `history_days` full days before `today`.
+
+    Products whose average interval between sales (from their first sale
+    on) exceeds INTERMITTENT_ADI get Croston's method, the rest simple
+    exponential smoothing. Returns one dict per product.
+    """
+    end = day_number(today)
+    state = SmoothingState(sales.n_products, alpha)
+    state.fold(sales.daily(end - history_days, end), end - history_days)
+    return forecast_rows(sales, *state.rates(end), horizons)
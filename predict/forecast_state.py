@@ -0,0 +1,160 @@
+# predict/forecast_state.py
+# Forecast state kept current from new bill lines only. Monthly totals and
+# smoothing levels are running values updated per batch of new lines and
+# per closed day, then checkpointed to disk, so neither a /predict call nor
+# a restart has to walk the whole sales history again.
+import os
+import numpy as np
+from forecast import SmoothingState
+
+# Days folded into the smoothing state per day x product matrix
+FOLD_BLOCK_DAYS = 90
+
+
+def month_numbers(days):
+    """month_number() of an array of epoch days."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) + 1970 * 12
+
+
+class ForecastState:
+    """
+    Running per-product state:
+
+    - `monthly`: units per calendar month and product, rows from `first_month`
+    - `smoothing`: SES/Croston state folded over every day before `as_of`
+    - `pending`: (product, day, quantity) lines of days not folded yet
+
+    Lines arriving for a day that is already folded (backdated bills) are
+    counted on the next day folded.
+    """
+
+    def __init__(self, alpha=0.1):
+        self.smoothing = SmoothingState(0, alpha)
+        self.first_month = None
+        self.monthly = np.zeros((0, 0))
+        self.as_of = None
+        self.pending = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64))
+
+    @property
+    def n_products(self):
+        return len(self.smoothing.level)
+
+    def _grow(self, n_products, months):
+        # Widen for new products and lengthen for months outside the matrix
+        self.smoothing.grow(n_products)
+        rows, columns = self.monthly.shape
+        first = min(months.min(), self.first_month) if self.first_month is not None else months.min()
+        last = max(months.max(), self.first_month + rows - 1) if self.first_month is not None else months.max()
+        if first == self.first_month and last - first + 1 == rows and columns == n_products:
+            return
+        grown = np.zeros((int(last - first) + 1, n_products))
+        if self.first_month is not None:
+            offset = int(self.first_month - first)
+            grown[offset:offset + rows, :columns] = self.monthly
+        self.first_month, self.monthly = int(first), grown
+
+    def add(self, chunks, n_products):
+        """Count new (product, day, quantity) line chunks into the monthly totals and pending lines."""
+        chunks = list(chunks)
+        if not chunks:
+            self.smoothing.grow(n_products)
+            return
+        product, day, quantity = (np.concatenate(column) for column in zip(*chunks))
+        months = month_numbers(day)
+        self._grow(n_products, months)
+        np.add.at(self.monthly, (months - self.first_month, product), quantity)
+        self.pending = tuple(np.concatenate(pair) for pair in zip(self.pending, (product, day, quantity)))
+
+    def advance(self, today_day):
+        """Fold every closed day before today_day into the smoothing state. Returns True if any was."""
+        product, day, quantity = self.pending
+        if self.as_of is None:
+            if not len(day):
+                return False
+            self.as_of = int(day.min())
+        if today_day <= self.as_of:
+            return False
+
+        closed = day < today_day
+        fold_day = np.maximum(day[closed], self.as_of).astype(np.int64)
+        fold_product, fold_quantity = product[closed], quantity[closed]
+        n_products = self.n_products
+        for start in range(self.as_of, today_day, FOLD_BLOCK_DAYS):
+            end = min(start + FOLD_BLOCK_DAYS, today_day)
+            block = (fold_day >= start) & (fold_day < end)
+            demand = np.bincount((fold_day[block] - start) * n_products + fold_product[block],
+                                 weights=fold_quantity[block], minlength=(end - start) * n_products)
+            self.smoothing.fold(demand.reshape(end - start, n_products), start)
+
+        self.as_of = today_day
+        self.pending = tuple(column[~closed] for column in self.pending)
+        return True
+
+    def day_totals(self, day):
+        """Units per product on an epoch day that is not folded yet (today)."""
+        product, days, quantity = self.pending
+        mask = days == day
+        return np.bincount(product[mask], weights=quantity[mask], minlength=self.n_products)
+
+    def monthly_totals(self):
+        """(first month_number, month x product matrix), the shape SalesData.monthly() returns."""
+        if self.first_month is None:
+            return 0, np.zeros((0, self.n_products))
+        missing = self.n_products - self.monthly.shape[1]
+        if missing > 0:
+            # Products added from the catalog that have not sold yet
+            return self.first_month, np.pad(self.monthly, ((0, 0), (0, missing)))
+        return self.first_month, self.monthly
+
+    def rates(self, today_day):
+        """Daily rate, average interval between sales and method per product."""
+        return self.smoothing.rates(self.as_of if self.as_of is not None else today_day)
+
+    def save(self, path, meta):
+        """
+        Checkpoint the state with the `meta` it matches (see load()); written
+        atomically.
+        """
+        tmp = path + '.tmp.npz'
+        smoothing = {f'smoothing_{name}': getattr(self.smoothing, name) for name in SmoothingState.FIELDS}
+        np.savez(tmp, codes=np.array(meta['codes'], dtype=str), names=np.array(meta['names'], dtype=str),
+                 last_id=meta['last_id'], last_stock_id=meta.get('last_stock_id', 0),
+                 timezone=meta.get('timezone', ''),
+                 recent=np.array(meta.get('recent', ()), dtype=np.int64),
+                 marks=np.array(meta.get('marks', ()), dtype=np.float64).reshape(-1, 2),
+                 alpha=self.smoothing.alpha,
+                 as_of=-1 if self.as_of is None else self.as_of,
+                 first_month=-1 if self.first_month is None else self.first_month,
+                 monthly=self.monthly, pending_product=self.pending[0], pending_day=self.pending[1],
+                 pending_quantity=self.pending[2], **smoothing)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a checkpoint as (state, meta), or None if there is none. `meta`
+        holds the catalog (codes, names), the bill line watermark (last_id,
+        recent, marks; see LineWatermark), last_stock_id and the timezone
+        days are counted in, None for checkpoints from before that was kept.
+        """
+        try:
+            data = np.load(path)
+        except FileNotFoundError:
+            return None
+        with data:
+            state = cls(float(data['alpha']))
+            for name in SmoothingState.FIELDS:
+                setattr(state.smoothing, name, data[f'smoothing_{name}'])
+            state.as_of = None if int(data['as_of']) < 0 else int(data['as_of'])
+            state.first_month = None if int(data['first_month']) < 0 else int(data['first_month'])
+            state.monthly = data['monthly']
+            state.pending = (data['pending_product'], data['pending_day'], data['pending_quantity'])
+            return state, {
+                'codes': data['codes'].tolist(),
+                'names': data['names'].tolist(),
+                'last_id': int(data['last_id']),
+                'recent': data['recent'].tolist() if 'recent' in data else [],
+                'marks': data['marks'].tolist() if 'marks' in data else [],
+                'last_stock_id': int(data['last_stock_id']) if 'last_stock_id' in data else 0,
+                'timezone': str(data['timezone']) if 'timezone' in data else None,
+            }
@@ -1,97 +1,151 @@
-from flask import Flask, jsonify
-import requests
-from datetime import datetime, timedelta
-from collections import defaultdict
+import os
+import sys
+
+# The shop's services package (time_service, line_watermark) is one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request
+from datetime import date
+import numpy as np
+from sales_source import init_sales_source
+from services.time_service import shop_today
+from forecast import forecast_demand, forecast_rows
+from rolling import parse_window
+from sales_engine import EPOCH, day_number, month_number, month_window, most_least, top_bottom
 
 app = Flask(__name__)
+sales_source = init_sales_source(app)
+
+# Windows /predict reports by default, with the calendar months each sums (None: today only)
+NAMED_WINDOWS = {'today': None, 'this_month': 1, 'last_3_months': 3, 'last_6_months': 6, 'last_12_months': 12}
 
-def fetch_data():
-    try:
-        response = requests.get("http://localhost:5000/billing/billing-data")
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-    return []
-
-def parse_date(timestamp):
-    try:
-        return datetime.strptime(timestamp, "%a, %d %b %Y %H:%M:%S GMT")
-    except Exception as e:
-        print(f"Failed to parse timestamp: {timestamp}, error: {e}")
-        return None
-
-def group_sales_by_month(data):
-    sales_by_month = defaultdict(lambda: defaultdict(int))
-    sales_all = defaultdict(int)
-    for record in data:
-        timestamp = record.get("timestamp")
-        date = parse_date(timestamp)
-        if date:
-            year_month = date.strftime("%Y-%m")
-            key = (record["product_code"], record["product_name"])
-            quantity = record.get("quantity", 0)
-            sales_by_month[year_month][key] += quantity
-            sales_all[key] += quantity
-    return sales_by_month, sales_all
-
-def get_top_least_products(sales_dict):
-    if not sales_dict:
-        return None, None
-    sorted_items = sorted(sales_dict.items(), key=lambda x: x[1], reverse=True)
-    top = sorted_items[0]
-    least = sorted_items[-1]
-    return top, least
-
-def filter_sales_by_month_range(sales_by_month, months):
-    current_month = datetime.now().replace(day=1)
-    result = defaultdict(int)
-    for i in range(months):
-        month_key = (current_month - timedelta(days=30 * i)).strftime("%Y-%m")
-        for k, v in sales_by_month.get(month_key, {}).items():
-            result[k] += v
-    return result
 
 @app.route('/predict', methods=['GET'])
 def predict():
-    data = fetch_data()
-    sales_by_month, _ = group_sales_by_month(data)
-    today = datetime.now()
-    today_key = today.strftime("%Y-%m")
-    today_day = today.day
-
-    # Sales for today
-    day_sales = defaultdict(int)
-    for record in data:
-        date = parse_date(record.get("timestamp", ""))
-        if date and date.date() == today.date():
-            key = (record["product_code"], record["product_name"])
-            day_sales[key] += record.get("quantity", 0)
-
-    predictions = {}
-
-    def safe_wrap(sales):
-        top, least = get_top_least_products(sales)
+    """
+    Most and least sold product per window. ?window= (repeatable) picks the
+    windows: the NAMED_WINDOWS, N for the last N days or FROM:TO dates.
+    ?n=5 adds the top and bottom n products of each window, where the
+    bottom includes stock products that sold nothing.
+    """
+    try:
+        n = request.args.get('n', type=int)
+        if n is not None and not 1 <= n <= 1000:
+            return jsonify({"error": "n must be between 1 and 1000"}), 400
+        specs = request.args.getlist('window') or list(NAMED_WINDOWS)
+        today = shop_today()
+        custom = {spec: parse_window(spec, today) for spec in specs if spec not in NAMED_WINDOWS}
+    except ValueError as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+
+    # Only bill lines added since the last call are read; ?reload=1 starts over
+    sales = sales_source.refresh(today, rebuild=request.args.get('reload') == '1',
+                                 windows=bool(custom), catalog=n is not None)
+    this_month = month_number(today)
+
+    # Today's lines and the running month x product totals every month
+    # window is summed from; other windows come from the prefix sums
+    state = sales_source.state
+    monthly = state.monthly_totals()
+    if custom:
+        bounds = list(custom.values())
+        custom_totals = dict(zip(custom, sales_source.prefix.windows(
+            np.arange(sales.n_products), [day_number(start) for start, _ in bounds],
+            [day_number(end) + 1 for _, end in bounds])))
+
+    def window_totals(spec):
+        if spec == 'today':
+            return state.day_totals(day_number(today))
+        if spec in NAMED_WINDOWS:
+            return month_window(monthly, this_month, NAMED_WINDOWS[spec])
+        return custom_totals[spec]
+
+    def product(i, totals):
         return {
-            "most_sold": {
-                "product_code": top[0][0],
-                "product_name": top[0][1],
-                "total_quantity": top[1]
-            } if top else {},
-            "least_sold": {
-                "product_code": least[0][0],
-                "product_name": least[0][1],
-                "total_quantity": least[1]
-            } if least else {}
+            "product_code": sales.codes[i],
+            "product_name": sales.names[i],
+            "total_quantity": int(totals[i])
         }
 
-    predictions['today'] = safe_wrap(day_sales)
-    predictions['this_month'] = safe_wrap(sales_by_month.get(today_key, {}))
-    predictions['last_3_months'] = safe_wrap(filter_sales_by_month_range(sales_by_month, 3))
-    predictions['last_6_months'] = safe_wrap(filter_sales_by_month_range(sales_by_month, 6))
-    predictions['last_12_months'] = safe_wrap(filter_sales_by_month_range(sales_by_month, 12))
+    def safe_wrap(totals):
+        top, least = most_least(totals)
+        wrapped = {
+            "most_sold": product(top, totals) if top is not None else {},
+            "least_sold": product(least, totals) if least is not None else {}
+        }
+        if n is not None:
+            top_n, bottom_n = top_bottom(totals, n)
+            wrapped["top"] = [product(i, totals) for i in top_n.tolist()]
+            wrapped["bottom"] = [product(i, totals) for i in bottom_n.tolist()]
+        return wrapped
 
+    predictions = {spec: safe_wrap(window_totals(spec)) for spec in specs}
     return jsonify(predictions)
 
+@app.route('/predict/forecast', methods=['GET'])
+def forecast():
+    """
+    Demand forecast for every product: ?horizons=7,30 (days ahead). By
+    default it comes from the running forecast state over all history;
+    passing &history=730 (days of sales used) or &alpha=0.1 (smoothing)
+    recomputes it from the individual lines instead.
+    """
+    try:
+        horizons = [int(h) for h in request.args.get('horizons', '7,30').split(',') if h.strip()]
+        history = request.args.get('history', type=int)
+        alpha = request.args.get('alpha', type=float)
+        if not horizons or min(horizons) < 1 or (history is not None and history < 1) \
+                or (alpha is not None and not 0 < alpha <= 1):
+            return jsonify({"error": "horizons and history must be positive and 0 < alpha <= 1"}), 400
+        today = shop_today()
+        if history is None and alpha is None:
+            sales = sales_source.refresh(today)
+            state = sales_source.state
+            products = forecast_rows(sales, *state.rates(day_number(today)), horizons)
+            alpha = state.smoothing.alpha
+        else:
+            sales = sales_source.refresh(today, lines=True)
+            history, alpha = history or 730, alpha or sales_source.alpha
+            products = forecast_demand(sales, today, history_days=history, horizons=horizons, alpha=alpha)
+        return jsonify({'as_of': today.isoformat(), 'history_days': history, 'alpha': alpha,
+                        'products': products})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/predict/window', methods=['GET', 'POST'])
+def window_sales():
+    """
+    Units sold per product in any number of windows at once. GET takes
+    repeated ?window=YYYY-MM-DD:YYYY-MM-DD or ?window=30 (last 30 days) and
+    ?sku=CODE; POST takes {"windows": [{"from", "to"} or {"days"}], "skus": [...]}.
+    Without SKUs every product is returned.
+    """
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            specs, skus = body.get('windows') or [], body.get('skus') or []
+        else:
+            specs = request.args.getlist('window')
+            skus = [code for arg in request.args.getlist('sku') for code in arg.split(',') if code]
+        today = shop_today()
+        windows = [parse_window(spec, today) for spec in specs or ['30']]
+
+        sales = sales_source.refresh(today, windows=True)
+        prefix = sales_source.prefix
+        codes = skus or sales.codes
+        known = [code for code in codes if code in sales.index]
+        quantities = prefix.windows([sales.index[code] for code in known],
+                                    [day_number(start) for start, _ in windows],
+                                    [day_number(end) + 1 for _, end in windows]).T.tolist()
+        return jsonify({
+            'windows': [{'from': start.isoformat(), 'to': end.isoformat()} for start, end in windows],
+            'history_from': date.fromordinal(EPOCH.toordinal() + prefix.base_day).isoformat(),
+            'products': [{'product_code': code, 'product_name': sales.names[sales.index[code]],
+                          'quantities': values} for code, values in zip(known, quantities)],
+            'unknown_skus': [code for code in codes if code not in sales.index],
+        })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=9000)
@@ -0,0 +1,119 @@
+# predict/rolling.py
+# Per-product cumulative daily sales. With prefix sums over a day-indexed
+# array, the quantity a product sold between any two days is one
+# subtraction, so any number of windows costs the same as one.
+from datetime import date, timedelta
+import numpy as np
+
+
+class PrefixSums:
+    """
+    cumulative[t, p] is the quantity of product p sold on epoch days
+    base_day <= d < base_day + t. Sales before base_day are not counted.
+
+    At most `max_days` days are kept: as days are added, base_day moves up
+    and the oldest rows are dropped. Rows live in a buffer with spare room
+    at the end, so a new day is written in place and the buffer is only
+    compacted once the spare room is used up.
+    """
+
+    def __init__(self, base_day, n_products=0, max_days=None):
+        self.base_day = base_day
+        self.max_days = max_days
+        self._buffer = np.zeros((1, n_products))
+        self._start = 0  # Buffer row of base_day
+        self._rows = 1
+
+    @property
+    def cumulative(self):
+        return self._buffer[self._start:self._start + self._rows]
+
+    @property
+    def end_day(self):
+        """First epoch day not covered yet."""
+        return self.base_day + self._rows - 1
+
+    @classmethod
+    def from_sales(cls, sales, base_day, end_day):
+        """
+        Build from a SalesData for days base_day <= d < end_day with one
+        bincount and one cumsum; keeps that many days from then on.
+        """
+        prefix = cls(base_day, sales.n_products, max_days=end_day - base_day)
+        daily = sales.daily(base_day, end_day)
+        prefix._buffer = np.vstack([np.zeros((1, sales.n_products)), np.cumsum(daily, axis=0)])
+        prefix._rows = len(prefix._buffer)
+        return prefix
+
+    def _grow(self, n_products, end_day):
+        # New products start at zero; days past the end repeat the last totals
+        if n_products > self._buffer.shape[1]:
+            self._buffer = np.hstack([self._buffer, np.zeros((len(self._buffer), n_products - self._buffer.shape[1]))])
+        if end_day <= self.end_day:
+            return
+        if self.max_days is not None and end_day - self.max_days > self.base_day:
+            # Drop the days before the kept range; the last row stands in for
+            # any days in between, which have no sales yet
+            drop = min(end_day - self.max_days - self.base_day, self._rows - 1)
+            self._start += drop
+            self._rows -= drop
+            self.base_day = end_day - self.max_days
+        rows = end_day - self.base_day + 1
+        if self._start + rows > len(self._buffer):
+            spare = max(rows // 4, 32)
+            buffer = np.empty((rows + spare, self._buffer.shape[1]))
+            buffer[:self._rows] = self.cumulative
+            self._buffer, self._start = buffer, 0
+        last = self._start + self._rows
+        self._buffer[last:self._start + rows] = self._buffer[last - 1]
+        self._rows = rows
+
+    def add(self, chunks, n_products, end_day):
+        """
+        Count new (product, day, quantity) line chunks in and cover days up to
+        end_day. Each distinct day touches the rows after it once, so lines
+        for today only update the last row.
+        """
+        self._grow(n_products, end_day)
+        cumulative = self.cumulative
+        for product, day, quantity in chunks:
+            day = day.astype(np.int64)
+            keep = (day >= self.base_day) & (day < self.end_day)
+            product, day, quantity = product[keep], day[keep], quantity[keep]
+            for d in np.unique(day).tolist():
+                on_day = day == d
+                totals = np.bincount(product[on_day], weights=quantity[on_day], minlength=n_products)
+                cumulative[d - self.base_day + 1:] += totals
+
+    def windows(self, products, starts, ends):
+        """
+        Quantity of each product in each window starts[w] <= d < ends[w]
+        (epoch days, clipped to the covered range) as a windows x products
+        matrix.
+        """
+        first = np.clip(np.asarray(starts) - self.base_day, 0, len(self.cumulative) - 1)
+        last = np.clip(np.asarray(ends) - self.base_day, 0, len(self.cumulative) - 1)
+        last = np.maximum(last, first)
+        columns = np.asarray(products, dtype=np.int64)
+        return self.cumulative[np.ix_(last, columns)] - self.cumulative[np.ix_(first, columns)]
+
+
+def parse_window(spec, today):
+    """
+    A window as (from, to) dates, both inclusive. Accepts {"from": ...,
+    "to": ...} with YYYY-MM-DD dates (`to` defaults to today), {"days": n}
+    for the last n days including today, or the query-string forms
+    "YYYY-MM-DD:YYYY-MM-DD" and "n".
+    """
+    if isinstance(spec, str):
+        spec = dict(zip(('from', 'to'), spec.split(':'))) if ':' in spec else {'days': spec}
+    if 'days' in spec:
+        days = int(spec['days'])
+        if days < 1:
+            raise ValueError("days must be positive")
+        return today - timedelta(days=days - 1), today
+    start = date.fromisoformat(spec['from'])
+    end = date.fromisoformat(spec['to']) if spec.get('to') else today
+    if end < start:
+        raise ValueError("'to' must not be before 'from'")
+    return start, end
@@ -0,0 +1,151 @@
+# predict/sales_engine.py
+# Columnar sales aggregation for the predict service. Bill lines are held as
+# parallel NumPy arrays (product index, epoch day, quantity) and every
+# per-day, per-month and per-window total is a single np.bincount over them.
+from datetime import date
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(day):
+    """Days since 1970-01-01 of a date."""
+    return (day - EPOCH).days
+
+
+def month_number(day):
+    """Months since January of year 0, so consecutive months differ by one."""
+    return day.year * 12 + day.month - 1
+
+
+class SalesData:
+    """
+    Sales as parallel arrays: `product` indexes into `codes`/`names`, `day`
+    is the epoch day of the sale and `quantity` the units sold.
+    """
+
+    def __init__(self, codes, names, product, day, quantity):
+        self.codes = codes
+        self.names = names
+        self.index = {code: i for i, code in enumerate(codes)}
+        self.product = product
+        self.day = day
+        self.quantity = quantity
+
+    @property
+    def n_products(self):
+        return len(self.codes)
+
+    @staticmethod
+    def columns():
+        """Empty (product, day, quantity) arrays."""
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], *cls.columns())
+
+    def product_indexes(self, codes, names):
+        """
+        Index of each product code, adding codes not seen before. A product's
+        name is kept up to date with the latest one given.
+        """
+        for code, name in dict(zip(codes, names)).items():
+            i = self.index.get(code)
+            if i is None:
+                self.index[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append(name)
+            elif name:
+                self.names[i] = name
+        return np.array([self.index[code] for code in codes], dtype=np.int32)
+
+    def extend(self, chunks):
+        """Append (product, day, quantity) array chunks with a single concatenate per column."""
+        chunks = list(chunks)
+        if chunks:
+            product, day, quantity = zip(*chunks)
+            self.product = np.concatenate((self.product,) + product)
+            self.day = np.concatenate((self.day,) + day)
+            self.quantity = np.concatenate((self.quantity,) + quantity)
+
+    def totals(self, start_day=None, end_day=None):
+        """Units sold per product on epoch days start_day <= d < end_day."""
+        mask = np.ones(len(self.day), dtype=bool)
+        if start_day is not None:
+            mask &= self.day >= start_day
+        if end_day is not None:
+            mask &= self.day < end_day
+        return np.bincount(self.product[mask], weights=self.quantity[mask], minlength=self.n_products)
+
+    def daily(self, start_day, end_day):
+        """
+        Day x product matrix of units sold on epoch days start_day <= d < end_day:
+        matrix[t, p] is the quantity of product p on day start_day + t.
+        """
+        n_days = max(end_day - start_day, 0)
+        mask = (self.day >= start_day) & (self.day < end_day)
+        key = (self.day[mask].astype(np.int64) - start_day) * self.n_products + self.product[mask]
+        matrix = np.bincount(key, weights=self.quantity[mask], minlength=n_days * self.n_products)
+        return matrix.reshape(n_days, self.n_products)
+
+    def monthly(self):
+        """
+        Units per calendar month and product as (first month_number, matrix)
+        where matrix[m, p] is the quantity of product p in month first + m.
+        """
+        if not len(self.day):
+            return 0, np.zeros((0, self.n_products))
+        # Map each distinct day to its month once, then every line via the inverse index
+        unique_days, inverse = np.unique(self.day, return_inverse=True)
+        months = np.array([month_number(date.fromordinal(EPOCH.toordinal() + int(d)))
+                           for d in unique_days], dtype=np.int64)
+        first = int(months.min())
+        row = (months - first)[inverse]
+        n_months = int(months.max()) - first + 1
+        matrix = np.bincount(row * self.n_products + self.product, weights=self.quantity,
+                             minlength=n_months * self.n_products)
+        return first, matrix.reshape(n_months, self.n_products)
+
+
+def month_window(monthly, current_month, months):
+    """Units per product over the `months` calendar months ending with current_month."""
+    first, matrix = monthly
+    lo = max(current_month - months + 1 - first, 0)
+    hi = max(current_month + 1 - first, 0)
+    return matrix[lo:hi].sum(axis=0) if hi > lo else np.zeros(matrix.shape[1])
+
+
+def most_least(totals):
+    """
+    Indexes of the most and least sold product among those that sold in the
+    window (None, None if nothing sold). Ties go to the product seen first for
+    the most sold and the one seen last for the least sold.
+    """
+    sold = np.flatnonzero(totals > 0)
+    if not len(sold):
+        return None, None
+    values = totals[sold]
+    least = sold[len(values) - 1 - np.argmin(values[::-1])]
+    return int(sold[np.argmax(values)]), int(least)
+
+
+def _smallest(keys, n):
+    # Indexes of the n smallest keys ordered by (key, index). np.argpartition
+    # finds the cut-off value; values tied with it are taken lowest index first
+    cut = keys[np.argpartition(keys, n - 1)[n - 1]]
+    below = np.flatnonzero(keys < cut)
+    chosen = np.concatenate((below, np.flatnonzero(keys == cut)[:n - len(below)]))
+    return chosen[np.lexsort((chosen, keys[chosen]))]
+
+
+def top_bottom(totals, n):
+    """
+    Indexes of the n largest and n smallest totals, each ordered (largest
+    first / smallest first, ties by index, also at the cut-off). Uses
+    np.argpartition, so only the 2n selected values are sorted.
+    """
+    n = min(n, len(totals))
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return _smallest(-totals, n), _smallest(totals, n)
@@ -0,0 +1,24 @@
+# predict/sales_tables.py
+# The two shop tables the predict service reads, declared here so the
+# predict process does not import the main app's models and, through them,
+# every Flask service.
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+
+db = SQLAlchemy()
+metadata = MetaData()
+
+bill_line = Table(
+    'bill_line', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('product_code', String(50)),
+    Column('quantity', Integer),
+    Column('timestamp', DateTime),  # Naive UTC
+)
+
+stock = Table(
+    'stock', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('product_code', String(50)),
+    Column('item_name', String(100)),
+)
@@ -0,0 +1,232 @@
+# services/bill_import_service.py
+import csv
+import io
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import insert, update, bindparam
+from extensions import db
+from services.stock_service import Stock, allocate_fefo
+from services.billing_service import BillHeader, BillLine, generate_bill_ids
+from services.customer_service import remember_customers
+from services.rollup_service import record_sales
+from services.time_service import to_utc
+
+bill_import_bp = Blueprint('bill_import', __name__)
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+def _parse_timestamp(value):
+    # Import timestamps are shop-local wall-clock times; bills store naive UTC
+    value = (value or '').strip()
+    if not value:
+        return datetime.utcnow()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%d/%m/%Y %H:%M', '%d/%m/%Y'):
+        try:
+            return to_utc(datetime.strptime(value, fmt))
+        except ValueError:
+            pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_utc(parsed)
+
+
+def _parse_row(row):
+    """Validate one import row; returns the parsed line or raises ValueError."""
+    customer_name = (row.get('customer_name') or '').strip()
+    customer_mobile = (row.get('customer_mobile') or '').strip()
+    product_code = (row.get('product_code') or '').strip()
+    if not customer_name or not customer_mobile:
+        raise ValueError('customer_name and customer_mobile are required')
+    if not product_code:
+        raise ValueError('product_code is required')
+
+    # Through float so 2.7 and "2.7" are rejected rather than truncated to 2
+    try:
+        quantity = float(row.get('quantity') or 0)
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity <= 0 or not quantity.is_integer():
+        raise ValueError('quantity must be a positive whole number')
+    quantity = int(quantity)
+
+    total_price = row.get('total_price')
+    status = (row.get('status') or 'Unpaid').strip().capitalize()
+    if status not in ('Paid', 'Unpaid'):
+        raise ValueError('status must be Paid or Unpaid')
+
+    return {
+        'customer_name': customer_name,
+        'customer_mobile': customer_mobile,
+        'product_code': product_code,
+        'quantity': quantity,
+        'total_price': float(total_price) if total_price not in (None, '') else None,
+        'status': status,
+        'timestamp': _parse_timestamp(row.get('timestamp')),
+    }
+
+
+def import_bills(rows, dry_run=False):
+    """
+    Import offline sales given as dicts with customer_name, customer_mobile,
+    product_code, quantity and optionally bill_ref, timestamp, status and
+    total_price. Rows sharing a bill_ref form one bill; rows without one are
+    bills of their own.
+
+    Every product code is checked against one preloaded Stock map. A bill is
+    imported only if all of its rows are valid and in stock; rejected rows are
+    reported by row number. Accepted bills are written with one UPDATE per
+    product and chunked executemany INSERTs, added to the daily sales
+    rollup, and committed together.
+
+    Bill numbers for every bill whose rows all parsed are reserved before
+    the stock rows are locked, one allocator call per month; numbers of
+    bills then rejected for stock are skipped.
+    """
+    errors = []
+    bills = {}
+    for number, row in enumerate(rows, start=1):
+        row = row if isinstance(row, dict) else {}
+        try:
+            line = _parse_row(row)
+        except (TypeError, ValueError) as e:
+            errors.append({'row': number, 'error': str(e)})
+            line = None
+        key = str(row.get('bill_ref') or '').strip() or f'row-{number}'
+        bills.setdefault(key, []).append((number, line))
+
+    codes = {line['product_code'] for bill in bills.values() for _, line in bill if line}
+
+    # Reserve the bill numbers before taking any row locks
+    bill_ids = {}
+    if not dry_run:
+        parsed = [(key, min(line['timestamp'] for _, line in bill)) for key, bill in bills.items()
+                  if all(line for _, line in bill)]
+        bill_ids = dict(zip((key for key, _ in parsed), generate_bill_ids([when for _, when in parsed])))
+
+    stock = {}
+    try:
+        if codes:
+            # Lock the affected products for the length of the import
+            stock = {product.product_code: product for product in
+                     Stock.query.filter(Stock.product_code.in_(codes)).with_for_update()}
+
+        available = {code: product.quantity for code, product in stock.items()}
+        accepted = []
+        for key, bill in bills.items():
+            invalid = any(line is None for _, line in bill)
+            problems = {number: f'Product {line["product_code"]} not found'
+                        for number, line in bill if line and line['product_code'] not in stock}
+            if not invalid and not problems:
+                needed = {}
+                for _, line in bill:
+                    needed[line['product_code']] = needed.get(line['product_code'], 0) + line['quantity']
+                problems = {number: f'Not enough stock available for product {line["product_code"]}'
+                            for number, line in bill
+                            if needed[line['product_code']] > available[line['product_code']]}
+            if invalid or problems:
+                # Rows that failed to parse were reported already
+                errors.extend({'row': number, 'error': problems.get(number, 'Bill rejected because of another row')}
+                              for number, line in bill if line)
+                continue
+            for code, quantity in needed.items():
+                available[code] -= quantity
+            accepted.append((key, [line for _, line in bill]))
+
+        errors.sort(key=lambda error: error['row'])
+        summary = {'bills': len(accepted), 'lines': sum(len(bill) for _, bill in accepted),
+                   'errors': errors, 'dry_run': dry_run}
+        if dry_run or not accepted:
+            db.session.rollback()
+            return summary
+
+        new_bills = []
+        for key, bill in accepted:
+            first = bill[0]
+            timestamp = min(line['timestamp'] for line in bill)
+            bill_lines = []
+            for line in bill:
+                product = stock[line['product_code']]
+                total_price = line['total_price']
+                if total_price is None:
+                    total_price = product.selling_price * line['quantity']
+                bill_lines.append({
+                    'product_code': line['product_code'],
+                    'quantity': line['quantity'],
+                    'total_price': total_price,
+                    'total_profit': total_price - product.price * line['quantity'],
+                    'timestamp': timestamp,
+                })
+            header = {
+                'bill_id': bill_ids[key],
+                'customer_name': first['customer_name'],
+                'customer_mobile': first['customer_mobile'],
+                'status': first['status'],
+                'timestamp': timestamp,
+                'total_price': sum(line['total_price'] for line in bill_lines),
+                'total_profit': sum(line['total_profit'] for line in bill_lines),
+                'line_count': len(bill_lines),
+            }
+            new_bills.append((header, bill_lines))
+
+        # One UPDATE per product, sent as a single executemany, then one
+        # set-based statement to take the units out of the lots
+        sold = {code: stock[code].quantity - left
+                for code, left in available.items() if left != stock[code].quantity}
+        stock_table = Stock.__table__
+        db.session.execute(
+            update(stock_table)
+            .where(stock_table.c.product_code == bindparam('code'))
+            .values(quantity=stock_table.c.quantity - bindparam('sold')),
+            [{'code': code, 'sold': quantity} for code, quantity in sold.items()]
+        )
+        allocate_fefo(sold)
+
+        for start in range(0, len(new_bills), IMPORT_CHUNK_SIZE):
+            chunk = new_bills[start:start + IMPORT_CHUNK_SIZE]
+            db.session.execute(insert(BillHeader), [header for header, _ in chunk])
+            header_ids = dict(db.session.query(BillHeader.bill_id, BillHeader.id)
+                              .filter(BillHeader.bill_id.in_([header['bill_id'] for header, _ in chunk])))
+            chunk_lines = [dict(line, header_id=header_ids[header['bill_id']])
+                           for header, bill_lines in chunk for line in bill_lines]
+            for line_start in range(0, len(chunk_lines), IMPORT_CHUNK_SIZE):
+                db.session.execute(insert(BillLine), chunk_lines[line_start:line_start + IMPORT_CHUNK_SIZE])
+
+        record_sales((header['status'], bill_lines) for header, bill_lines in new_bills)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    try:
+        remember_customers((header['customer_name'], header['customer_mobile'], header['timestamp'])
+                           for header, _ in new_bills)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning("Error updating customers after import: %s", e)
+
+    return summary
+
+
+@bill_import_bp.route('/', methods=['POST'])
+def import_bills_route():
+    """
+    Route to back-fill bills from a CSV upload (form field `file`) or a JSON
+    list of rows. Pass ?dry_run=1 to only validate.
+    """
+    dry_run = request.args.get('dry_run') == '1'
+    try:
+        if 'file' in request.files:
+            stream = io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig')
+            rows = list(csv.DictReader(stream))
+        else:
+            rows = request.get_json(silent=True)
+            if not isinstance(rows, list):
+                return jsonify({"error": "Upload a CSV file or post a JSON list of rows"}), 400
+
+        summary = import_bills(rows, dry_run=dry_run)
+        return jsonify(summary), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
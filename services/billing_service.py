@@ -1,16 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, current_app
+from datetime import datetime, timedelta, timezone
+import json
 from extensions import db
-from sqlalchemy import func
-from services.stock_service import Stock
+from sqlalchemy import func, insert, select, update
+from services.stock_service import Stock, allocate_fefo, expiring_stock, upcoming_expiry
+from services.sequence_service import BillNumberAllocator
+from services.customer_service import remember_customers, search_customers
+from services.rollup_service import DailySalesRollup, record_sales, remove_sales, change_status, clear_rollup
+from services.live_service import publish_sale, publish_bill_status
+from services.time_service import shop_today, day_start, sale_day, to_shop_time
 from uuid import uuid4
 
 billing_bp = Blueprint('billing', __name__)
 
-# Define the Billing model
+# Legacy one-row-per-line bill table. New bills are written to BillHeader /
+# BillLine; this model is kept as the source for `flask billing migrate-headers`.
 class Billing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    bill_id = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid4()))  # Unique bill ID
+    bill_id = db.Column(db.String(36), index=True, nullable=False, default=lambda: str(uuid4()))  # Shared by every line of a bill
     customer_name = db.Column(db.String(100), nullable=False)
     customer_mobile = db.Column(db.String(15), nullable=False)
     product_code = db.Column(db.String(10), db.ForeignKey('stock.product_code'), nullable=False)
@@ -21,27 +28,243 @@ class Billing(db.Model):
     status = db.Column(db.String(10), default='unpaid')
     product = db.relationship('Stock', backref=db.backref('billings', lazy=True))
 
-from datetime import datetime
 
-def generate_bill_id():
+# One row per bill; totals are computed once at checkout
+class BillHeader(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    bill_id = db.Column(db.String(36), unique=True, nullable=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    customer_mobile = db.Column(db.String(15), nullable=False)
+    status = db.Column(db.String(10), default='Unpaid')
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    total_price = db.Column(db.Float, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+    # Set by clients that replay bills (the desktop sales queue) so a bill is never applied twice
+    client_ref = db.Column(db.String(36), unique=True, nullable=True)
+    lines = db.relationship('BillLine', backref='header', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # Serves the newest-first keyset pagination of the bill listing and,
+        # through its leading column, every timestamp range scan
+        db.Index('ix_bill_header_timestamp_bill_id', 'timestamp', 'bill_id'),
+        # Status filters over a time window (dues this month, paid today)
+        db.Index('ix_bill_header_status_timestamp', 'status', 'timestamp'),
+        # A customer's unpaid bills, for reminders
+        db.Index('ix_bill_header_mobile_status', 'customer_mobile', 'status'),
+        # Name prefix searches of the bill listing's customer filter
+        db.Index('ix_bill_header_customer_name', 'customer_name'),
+    )
+
+
+# One row per product on a bill
+class BillLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    header_id = db.Column(db.Integer, db.ForeignKey('bill_header.id'), nullable=False, index=True)
+    product_code = db.Column(db.String(50), db.ForeignKey('stock.product_code'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    total_price = db.Column(db.Float, nullable=False)
+    total_profit = db.Column(db.Float, nullable=False)
+    # Sale time copied from the header (it never changes) so per-product
+    # time-window queries don't need a join
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    product = db.relationship('Stock', backref=db.backref('bill_lines', lazy=True))
+
+    __table_args__ = (
+        # Per-product sales over a time window
+        db.Index('ix_bill_line_product_timestamp', 'product_code', 'timestamp'),
+    )
+
+def _last_bill_number(conn, year, month):
+    """Highest bill number already issued in a month, read through the bill_id index."""
+    prefix = f"{year}{month:02}"
+    bill_ids = conn.execute(
+        select(BillHeader.bill_id).where(BillHeader.bill_id.like(prefix + '%'))
+    ).scalars()
+    return max((int(bill_id[len(prefix):]) for bill_id in bill_ids
+                if bill_id[len(prefix):].isdigit()), default=0)
+
+
+bill_numbers = BillNumberAllocator(seed=_last_bill_number)
+
+
+def generate_bill_id(when=None):
     try:
-        now = datetime.utcnow()
+        now = when or datetime.utcnow()
         year = now.year
         month = now.month
 
-        # Count bills for the current month using the `timestamp` field
-        current_month_bills = Billing.query.filter(
-            db.extract('year', Billing.timestamp) == year,
-            db.extract('month', Billing.timestamp) == month
-        ).count()
+        # Take the next number from this worker's reserved block
+        number = bill_numbers.next(year, month)
 
         # Generate bill ID with format: BYYYYMMNN
-        return f"{year}{month:02}{current_month_bills + 1:02}"
-    except Exception as e:
-        print(f"Error generating bill ID: {e}")
+        return f"{year}{month:02}{number:02}"
+    except Exception:
+        current_app.logger.exception("Error generating bill ID")
+        raise
+
+
+def generate_bill_ids(timestamps):
+    """
+    Bill IDs for many bills at once, one per timestamp in the same order.
+    Numbers are taken from the allocator once per month, so a large batch
+    costs at most one sequence reservation per month it spans.
+    """
+    months = {}
+    for when in timestamps:
+        key = (when.year, when.month)
+        months[key] = months.get(key, 0) + 1
+    numbers = {key: iter(bill_numbers.take(*key, count)) for key, count in months.items()}
+    return [f"{when.year}{when.month:02}{next(numbers[(when.year, when.month)]):02}" for when in timestamps]
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be checked out; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def checkout(customer_name, customer_mobile, status, cart, timestamp=None, client_ref=None):
+    """
+    Check out a cart of (product_code, quantity) pairs as a single bill.
+
+    The number of statements sent to the database does not depend on the
+    number of cart lines: the cart's stock rows are read and locked with one
+    SELECT ... FOR UPDATE, decremented with one guarded UPDATE, the header and
+    its lines go in with one INSERT each and the whole bill is committed once.
+
+    `timestamp` overrides the sale time and `client_ref` tags the bill with
+    the caller's own unique reference. Returns the bill ID and one dict per
+    line (with the header fields merged in) for the receipt template.
+    """
+    # Merge repeated product codes so each stock row is touched once
+    wanted = {}
+    for product_code, quantity in cart:
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise CheckoutError(f'Invalid quantity for product {product_code}')
+        if quantity <= 0:
+            raise CheckoutError(f'Invalid quantity for product {product_code}')
+        wanted[product_code] = wanted.get(product_code, 0) + quantity
+
+    if not wanted:
+        raise CheckoutError('No products in the bill')
+
+    timestamp = timestamp or datetime.utcnow()
+
+    # Reserve the bill number before taking any row locks
+    bill_id = generate_bill_id(timestamp)
+
+    try:
+        # Lock every product in the cart so two tills cannot sell the same units
+        products = {
+            product.product_code: product
+            for product in Stock.query.filter(Stock.product_code.in_(wanted))
+                                      .with_for_update().all()
+        }
+
+        for product_code, quantity in wanted.items():
+            product = products.get(product_code)
+            if not product:
+                raise CheckoutError(f'Product {product_code} not found', 404)
+            if product.quantity < quantity:
+                raise CheckoutError(f'Not enough stock available for product {product_code}')
+
+        # Decrement all products in one statement; the WHERE clause re-checks
+        # availability so the update can never take a quantity below zero
+        needed = db.case(wanted, value=Stock.product_code)
+        result = db.session.execute(
+            update(Stock)
+            .where(Stock.product_code.in_(wanted), Stock.quantity >= needed)
+            .values(quantity=Stock.quantity - needed)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(wanted):
+            raise CheckoutError('Stock changed during checkout, please try again', 409)
+        allocate_fefo(wanted)
+
+        lines = []
+        for product_code, quantity in wanted.items():
+            product = products[product_code]
+            lines.append({
+                'product_code': product_code,
+                'quantity': quantity,
+                'total_price': product.selling_price * quantity,
+                'total_profit': (product.selling_price - product.price) * quantity,
+                'timestamp': timestamp,
+            })
+
+        header = {
+            'bill_id': bill_id,
+            'customer_name': customer_name,
+            'customer_mobile': customer_mobile,
+            'status': status,
+            'timestamp': timestamp,
+            'total_price': sum(line['total_price'] for line in lines),
+            'total_profit': sum(line['total_profit'] for line in lines),
+            'line_count': len(lines),
+            'client_ref': client_ref,
+        }
+        header_id = db.session.execute(insert(BillHeader).values(header)).inserted_primary_key[0]
+        for line in lines:
+            line['header_id'] = header_id
+        db.session.execute(insert(BillLine), lines)
+        record_sales([(status, lines)])
+        names = {code: product.item_name for code, product in products.items()}
+        # The rows are locked, so these are exactly the quantities left after the sale
+        left = [(code, names[code], products[code].quantity - quantity) for code, quantity in wanted.items()]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
         raise
 
+    publish_sale(bill_id, status, header['total_price'], header['total_profit'], left,
+                 sale_day(timestamp).isoformat())
 
+    # Keep the customer directory current; the bill is already saved
+    try:
+        remember_customers([(customer_name, customer_mobile, timestamp)])
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning("Error updating customer %s: %s", customer_mobile, e)
+
+    return bill_id, [dict(header, item_name=names[line['product_code']], **line) for line in lines]
+
+
+def _prerender_receipt(bills):
+    # Hand the receipt to the background renderers; never holds up the checkout
+    receipts = current_app.extensions.get('receipt_jobs')
+    if not receipts or not current_app.config.get('RECEIPT_PRERENDER', True):
+        return
+    try:
+        first = bills[0]
+        receipts.prerender(current_app._get_current_object(), {
+            'bill_id': first['bill_id'],
+            'customer_name': first['customer_name'],
+            'customer_mobile': first['customer_mobile'],
+            'status': first['status'],
+            'timestamp': to_shop_time(first['timestamp']).isoformat(),
+            'total_price': sum(bill['total_price'] for bill in bills),
+            'lines': [{'product_code': bill['product_code'], 'product_name': bill['item_name'],
+                       'quantity': bill['quantity'], 'total_price': bill['total_price']}
+                      for bill in bills],
+        })
+    except Exception as e:
+        current_app.logger.warning("Error queueing receipt for bill %s: %s", bills[0]['bill_id'], e)
+
+
+def _discard_receipts(bill_id):
+    # Drop cached receipts that no longer match the bill
+    receipts = current_app.extensions.get('receipt_jobs')
+    if receipts:
+        try:
+            receipts.discard(current_app._get_current_object(), bill_id)
+        except Exception as e:
+            current_app.logger.warning("Error discarding receipts of bill %s: %s", bill_id, e)
 
 
 @billing_bp.route('/create', methods=['GET', 'POST'])
@@ -56,53 +279,27 @@ def create_bill():
         if len(product_codes) != len(quantities):
             return 'Mismatch between product codes and quantities', 400
 
-        total_price = 0
-        total_profit = 0
-        bills = []
-
-        for i, product_code in enumerate(product_codes):
-            product = Stock.query.filter_by(product_code=product_code).first()
-            if product:
-                quantity = int(quantities[i])
-                if product.quantity >= quantity:
-                    product_total_price = product.selling_price * quantity
-                    product_total_profit = (product.selling_price - product.price) * quantity
-
-                    total_price += product_total_price
-                    total_profit += product_total_profit
-
-                    # Generate the custom bill_id
-                    bill_id = generate_bill_id()
-
-                    new_bill = Billing(
-                        bill_id=bill_id,
-                        customer_name=customer_name,
-                        customer_mobile=customer_mobile,
-                        product_code=product_code,
-                        quantity=quantity,
-                        total_price=product_total_price,
-                        total_profit=product_total_profit,
-                        status=status
-                    )
-                    bills.append(new_bill)
-                    product.quantity -= quantity
-                else:
-                    return f'Not enough stock available for product {product_code}', 400
+        try:
+            queue = current_app.extensions.get('sales_queue')
+            if queue:
+                # Desktop mode: commit to the local queue; it is synced to the server in the background
+                _, bills = queue.enqueue(customer_name, customer_mobile, status,
+                                         zip(product_codes, quantities))
+                bill_id = bills[0]['bill_id']
             else:
-                return f'Product {product_code} not found', 404
-
-        # Add all new bills and commit them to the database
-        for bill in bills:
-            db.session.add(bill)
-        db.session.commit()
+                bill_id, bills = checkout(customer_name, customer_mobile, status,
+                                          zip(product_codes, quantities))
+                _prerender_receipt(bills)
+        except CheckoutError as e:
+            return e.message, e.status
 
         # Send bills and totals to the template
         return render_template(
             'bill_template.html',
             bills=bills,
             bill_id=bill_id,
-            total_price=total_price,
-            total_profit=total_profit
+            total_price=sum(bill['total_price'] for bill in bills),
+            total_profit=sum(bill['total_profit'] for bill in bills)
         )
 
     # Render the form with available product codes
@@ -113,21 +310,18 @@ def create_bill():
 @billing_bp.route('/monthly', methods=['GET'])
 def monthly_sales():
     try:
-        monthly_sales_data = db.session.query(
-            func.extract('year', Billing.timestamp).label('year'),
-            func.extract('month', Billing.timestamp).label('month'),
-            func.sum(Billing.total_price).label('total_sales')
-        ).group_by(
-            func.extract('year', Billing.timestamp),
-            func.extract('month', Billing.timestamp)
-        ).order_by(
-            func.extract('year', Billing.timestamp).desc(),
-            func.extract('month', Billing.timestamp).desc()
-        ).all()
+        # Daily totals from the rollup (shop-local days), folded into months
+        daily_sales = db.session.query(
+            DailySalesRollup.day, func.sum(DailySalesRollup.revenue)
+        ).group_by(DailySalesRollup.day).all()
+
+        months = {}
+        for day, total_sales in daily_sales:
+            months[(day.year, day.month)] = months.get((day.year, day.month), 0) + (total_sales or 0)
 
         monthly_sales_list = [
-            {'year': int(year), 'month': int(month), 'total_sales': total_sales}
-            for year, month, total_sales in monthly_sales_data
+            {'year': year, 'month': month, 'total_sales': months[(year, month)]}
+            for year, month in sorted(months, reverse=True)
         ]
         
         return jsonify(monthly_sales_list), 200
@@ -141,19 +335,19 @@ def monthly_sales():
 @billing_bp.route('/top-selling-products', methods=['GET'])
 def top_selling_products():
     try:
-        # Join Billing with Stock to get product names along with product code
+        # Join bill lines with Stock to get product names along with product code
         top_products = db.session.query(
-            Billing.product_code,
+            BillLine.product_code,
             Stock.item_name,  # Add product name from the Stock table
-            func.sum(Billing.quantity).label('total_quantity'),
-            func.sum(Billing.total_price).label('total_sales')
-        ).join(Stock, Billing.product_code == Stock.product_code)  # Join on product_code
+            func.sum(BillLine.quantity).label('total_quantity'),
+            func.sum(BillLine.total_price).label('total_sales')
+        ).join(Stock, BillLine.product_code == Stock.product_code)  # Join on product_code
 
         # Group by both product_code and product_name
-        top_products = top_products.group_by(Billing.product_code, Stock.item_name)
+        top_products = top_products.group_by(BillLine.product_code, Stock.item_name)
 
         # Order by total sales (highest first)
-        top_products = top_products.order_by(func.sum(Billing.total_price).desc())
+        top_products = top_products.order_by(func.sum(BillLine.total_price).desc())
 
         # Limit to top 5 results
         top_products = top_products.limit(5).all()
@@ -177,14 +371,12 @@ def top_selling_products():
 @billing_bp.route('/next-expiry', methods=['GET'])
 def next_expiry():
     try:
-        next_expiry_product = db.session.query(
-            Stock.item_name, Stock.expiry
-        ).filter(Stock.expiry > datetime.utcnow()).order_by(Stock.expiry.asc()).first()
+        next_expiry_product = db.session.execute(upcoming_expiry(shop_today())).first()
 
         if next_expiry_product:
             return jsonify({
                 'product_name': next_expiry_product.item_name,
-                'expiry_date': next_expiry_product.expiry,
+                'expiry_date': next_expiry_product.expiry.isoformat(),
                 'link': url_for('stock.view_stock')  # Replace with your actual stock page URL
             }), 200
         else:
@@ -214,8 +406,8 @@ def limited_stock():
 @billing_bp.route('/search_customer', methods=['GET'])
 def search_customer():
     query = request.args.get('query', '')
-    customers = Billing.query.filter(Billing.customer_name.ilike(f'%{query}%')).with_entities(Billing.customer_name, Billing.customer_mobile).all()
-    results = [{"customer_name": customer.customer_name, "customer_mobile": customer.customer_mobile} for customer in customers]
+    results = [{"customer_name": name, "customer_mobile": mobile}
+               for name, mobile in search_customers(query)]
     return jsonify(results)
 
 @billing_bp.route('/get_customer')
@@ -224,85 +416,148 @@ def get_customer():
     if not query:
         return jsonify([])  # Return an empty list if no query
 
-    # Fetch customers matching the query
-    customers = Billing.query.filter(Billing.name.ilike(f"%{query}%")).all()
-
-    # Format the response
+    # Fetch customers matching the query from the customer directory
     response = [
-        {"customer_name": customer.name, "customer_mobile": customer.mobile}
-        for customer in customers
+        {"customer_name": name, "customer_mobile": mobile}
+        for name, mobile in search_customers(query)
     ]
     return jsonify(response)
 
 
-
-
-
 @billing_bp.route('/update_status/<string:bill_id>', methods=['POST'])
 def update_status(bill_id):
     try:
-        # Fetch all bills with the given bill_id
-        bills = Billing.query.filter_by(bill_id=bill_id).all()
-        if not bills:
-            return jsonify(success=False, message="Bill not found"), 404
-
-        # Update the status for all bills with the same bill_id
+        # The status lives on the bill header, so this is a single-row update
         new_status = request.form.get('status')  # 'Paid' or 'Unpaid'
-        for bill in bills:
-            bill.status = new_status
+        header = BillHeader.query.filter_by(bill_id=bill_id).with_for_update().first()
+        if not header:
+            return jsonify(success=False, message="Bill not found"), 404
 
+        old_status = header.status
+        change_status(old_status, new_status, _rollup_lines(header.id))
+        header.status = new_status
         db.session.commit()
+        if old_status != new_status:
+            _discard_receipts(bill_id)
+            publish_bill_status(bill_id, old_status, new_status, header.total_price)
         return jsonify(success=True), 200
     except Exception as e:
         db.session.rollback()
         return jsonify(success=False, message=str(e)), 500
 
+def _rollup_lines(header_id):
+    # The line fields the daily sales rollup needs, for one bill. Also locks
+    # the bill's stock rows, as the rollup expects of its callers, so a sale
+    # of the same products cannot update the same rollup rows concurrently
+    lines = [row._asdict() for row in db.session.query(
+        BillLine.timestamp, BillLine.product_code, BillLine.quantity,
+        BillLine.total_price, BillLine.total_profit).filter(BillLine.header_id == header_id)]
+    codes = sorted({line['product_code'] for line in lines})
+    if codes:
+        db.session.execute(select(Stock.id).where(Stock.product_code.in_(codes))
+                           .order_by(Stock.product_code).with_for_update()).all()
+    return lines
+
+
+BILLS_PER_PAGE = 50
+
+
+def _parse_bill_cursor(cursor):
+    """Split an `after` cursor of the form '<ISO timestamp>|<bill_id>'."""
+    timestamp, _, bill_id = cursor.partition('|')
+    return datetime.fromisoformat(timestamp), bill_id
+
+
 # Route to view all bills with product codes and names
 @billing_bp.route('/all')
 def view_all_bills():
-    """Route to display all billing records."""
-    
-    # Query all bills
-    bills = Billing.query.all()
-    
-    # Group bills by bill_id and aggregate products and totals
-    grouped_bills = {}
-    for bill in bills:
-        # If the bill_id is not already in the grouped_bills dictionary, add it
-        if bill.bill_id not in grouped_bills:
-            grouped_bills[bill.bill_id] = {
-                'products': [],
-                'total_price': 0,
-                'timestamp': bill.timestamp,
-                'customer_name': bill.customer_name,
-                'customer_mobile': bill.customer_mobile,
-                'status': bill.status,
-            }
-        
-        # Fetch product details from Stock table
-        product = Stock.query.filter_by(product_code=bill.product_code).first()
-        product_name = product.item_name if product else 'Unknown Product'
-        
-        # Append product code, name, and quantity to the products list
-        grouped_bills[bill.bill_id]['products'].append({
-            'product_code': bill.product_code,
-            'product_name': product_name,
-            'quantity': bill.quantity,
-            'total_price': bill.total_price
-        })
-        
-        # Accumulate the total price for this bill
-        grouped_bills[bill.bill_id]['total_price'] += bill.total_price
-    
-    return render_template('view_all_bills.html', bills=grouped_bills)
+    """Route to display bill records one page at a time, newest first."""
+    status = request.args.get('status', '').strip()
+    customer = request.args.get('customer', '').strip()
+    date_from = request.args.get('from', '').strip()
+    date_to = request.args.get('to', '').strip()
+    after = request.args.get('after', '').strip()
+    per_page = min(request.args.get('per_page', BILLS_PER_PAGE, type=int) or BILLS_PER_PAGE, 200)
+
+    query = BillHeader.query
+    try:
+        if status:
+            query = query.filter(BillHeader.status == status)
+        if customer:
+            # Prefix matches so the name and mobile indexes can be used
+            query = query.filter(db.or_(BillHeader.customer_name.like(f'{customer}%'),
+                                        BillHeader.customer_mobile.like(f'{customer}%')))
+        # Dates are shop-local days, turned into half-open UTC timestamp ranges
+        if date_from:
+            day = datetime.strptime(date_from, '%Y-%m-%d').date()
+            query = query.filter(BillHeader.timestamp >= day_start(day))
+        if date_to:
+            day = datetime.strptime(date_to, '%Y-%m-%d').date() + timedelta(days=1)
+            query = query.filter(BillHeader.timestamp < day_start(day))
+        if after:
+            # Keyset pagination: continue strictly after the last bill shown
+            timestamp, bill_id = _parse_bill_cursor(after)
+            query = query.filter(db.or_(
+                BillHeader.timestamp < timestamp,
+                db.and_(BillHeader.timestamp == timestamp, BillHeader.bill_id < bill_id)
+            ))
+    except ValueError:
+        return "Invalid filter or page cursor", 400
+
+    # Fetch one extra header to know whether there is a next page
+    headers = query.order_by(BillHeader.timestamp.desc(), BillHeader.bill_id.desc()) \
+                   .limit(per_page + 1).all()
+    has_next = len(headers) > per_page
+    headers = headers[:per_page]
+
+    bills = {}
+    for header in headers:
+        bills[header.bill_id] = {
+            'products': [],
+            'total_price': header.total_price,
+            'timestamp': header.timestamp,
+            'customer_name': header.customer_name,
+            'customer_mobile': header.customer_mobile,
+            'status': header.status,
+        }
+
+    # Fetch this page's lines and their product names in one joined query
+    if headers:
+        bill_ids = {header.id: header.bill_id for header in headers}
+        lines = db.session.query(BillLine, Stock.item_name) \
+            .outerjoin(Stock, BillLine.product_code == Stock.product_code) \
+            .filter(BillLine.header_id.in_(bill_ids)) \
+            .order_by(BillLine.id).all()
+        for line, item_name in lines:
+            bills[bill_ids[line.header_id]]['products'].append({
+                'product_code': line.product_code,
+                'product_name': item_name or 'Unknown Product',
+                'quantity': line.quantity,
+                'total_price': line.total_price
+            })
+
+    # Carry the active filters over to the pagination links
+    filters = {key: value for key, value in
+               {'status': status, 'customer': customer, 'from': date_from, 'to': date_to}.items()
+               if value}
+    next_cursor = None
+    if has_next:
+        last = headers[-1]
+        next_cursor = f"{last.timestamp.isoformat()}|{last.bill_id}"
+
+    return render_template('view_all_bills.html', bills=bills, filters=filters,
+                           next_cursor=next_cursor, per_page=per_page)
 
 
 # Route to delete all bills
 @billing_bp.route('/delete_all', methods=['POST'])
 def delete_all_bills():
     try:
-        # Delete all bills from the database
+        # Delete all bills (lines first, then headers) from the database
+        BillLine.query.delete()
+        BillHeader.query.delete()
         Billing.query.delete()
+        clear_rollup()
         db.session.commit()
         return redirect(url_for('billing.view_all_bills'))  # Redirect to view all bills after deletion
     except Exception as e:
@@ -310,49 +565,47 @@ def delete_all_bills():
         return f"An error occurred while deleting bills: {e}", 500
 
 # Route to view a single bill
-@billing_bp.route('/view/<int:bill_id>')
+@billing_bp.route('/view/<string:bill_id>')
 def view_bill(bill_id):
     """Route to display a single bill's details."""
-    # Fetch all Billing records for the given bill_id
-    bill_records = Billing.query.filter_by(bill_id=bill_id).all()
+    header = BillHeader.query.filter_by(bill_id=bill_id).first()
 
-    if not bill_records:
-        # If no records are found, return a 404
+    if not header:
+        # If no bill is found, return a 404
         return f"Bill with ID {bill_id} not found", 404
 
-    # Prepare the detailed data for rendering
-    bills = []
-    for bill in bill_records:
-        # Fetch the product name from Stock using the product_code
-        product = Stock.query.filter_by(product_code=bill.product_code).first()
-        item_name = product.item_name if product else "Unknown Product"
-
-        bills.append({
-            "customer_name": bill.customer_name,
-            "customer_mobile": bill.customer_mobile,
-            "product_code": bill.product_code,
-            "item_name": item_name,
-            "quantity": bill.quantity,
-            "total_price": bill.total_price,
-            "status": bill.status,
-            "timestamp": bill.timestamp,
-        })
+    # Fetch the lines together with their product names in one query
+    lines = db.session.query(BillLine, Stock.item_name) \
+        .outerjoin(Stock, BillLine.product_code == Stock.product_code) \
+        .filter(BillLine.header_id == header.id).all()
 
-    # Calculate the total price for all items in the bill
-    total_price = sum(item["total_price"] for item in bills)
+    # Prepare the detailed data for rendering
+    bills = [{
+        "bill_id": header.bill_id,
+        "customer_name": header.customer_name,
+        "customer_mobile": header.customer_mobile,
+        "product_code": line.product_code,
+        "item_name": item_name or "Unknown Product",
+        "quantity": line.quantity,
+        "total_price": line.total_price,
+        "status": header.status,
+        "timestamp": header.timestamp,
+    } for line, item_name in lines]
 
     # Render the template with the required context
-    return render_template('bill_template.html', bills=bills, total_price=total_price, bill_id=bill_id)
+    return render_template('bill_template.html', bills=bills, total_price=header.total_price, bill_id=bill_id)
 
 
 
 # Route to delete a single bill
-@billing_bp.route('/delete/<int:bill_id>', methods=['POST'])
+@billing_bp.route('/delete/<string:bill_id>', methods=['POST'])
 def delete_bill(bill_id):
-    """Route to delete a single bill by ID."""
-    bill = Billing.query.get_or_404(bill_id)  # Fetch the bill by ID or return 404 if not found
-    db.session.delete(bill)  # Delete the bill
+    """Route to delete a single bill and its lines."""
+    header = BillHeader.query.filter_by(bill_id=bill_id).with_for_update().first_or_404()
+    remove_sales(header.status, _rollup_lines(header.id))
+    db.session.delete(header)  # Lines are removed with the header
     db.session.commit()  # Commit the transaction to the database
+    _discard_receipts(bill_id)
 
     # Redirect to the view all bills page
     return redirect(url_for('billing.view_all_bills'))
@@ -362,9 +615,9 @@ def delete_bill(bill_id):
 @billing_bp.route('/total-sales', methods=['GET'])
 def total_sales():
     try:
-        # Query the sum of all total_price values from the Billing table
+        # Query the sum of all bill totals from the bill headers
         total_sales = db.session.query(
-            func.sum(Billing.total_price).label('total_sales')
+            func.sum(BillHeader.total_price).label('total_sales')
         ).scalar()
 
         return jsonify({'total_sales': total_sales or 0}), 200
@@ -387,18 +640,14 @@ def total_profit():
 @billing_bp.route('/expired-items', methods=['GET'])
 def expired_items():
     try:
-        current_date = datetime.utcnow()
-
-        # Query for expired items
-        expired_products = db.session.query(
-            Stock.item_name, Stock.expiry
-        ).filter(Stock.expiry <= current_date).all()
+        # Query for products with an expired lot still on the shelf
+        expired_products = expiring_stock(shop_today())
 
         if expired_products:
             expired_list = [
                 {
                     'item_name': product.item_name,
-                    'expiry_date': product.expiry,
+                    'expiry_date': product.expiry.isoformat(),
                     'link': url_for('stock.view_stock')  # Replace with the actual URL
                 } for product in expired_products
             ]
@@ -411,10 +660,11 @@ def expired_items():
 @billing_bp.route('/due', methods=['GET'])
 def due():
     try:
-        # Query the sum of all total_price values from unpaid bills
+        # Query the sum of all total_price values from unpaid bills. New bills
+        # are stored as 'Unpaid' and legacy copies may say 'unpaid'
         total_due = db.session.query(
-            func.sum(Billing.total_price).label('total_due')
-        ).filter(Billing.status == 'unpaid').scalar()
+            func.sum(BillHeader.total_price).label('total_due')
+        ).filter(func.lower(BillHeader.status) == 'unpaid').scalar()
 
         return jsonify({'total_due': total_due or 0}), 200
     except Exception as e:
@@ -423,27 +673,166 @@ def due():
 @billing_bp.route('/billing-data', methods=['GET'])
 def billing_data():
     try:
-        # Query all billing records
-        bills = Billing.query.all()
+        # Query all bill lines with their header and product name
+        rows = db.session.query(BillLine, BillHeader, Stock.item_name) \
+            .join(BillHeader, BillLine.header_id == BillHeader.id) \
+            .outerjoin(Stock, BillLine.product_code == Stock.product_code) \
+            .order_by(BillLine.id).all()
 
         # Prepare the data as a list of dictionaries
         billing_list = []
-        for bill in bills:
-            product = Stock.query.filter_by(product_code=bill.product_code).first()
-            product_name = product.item_name if product else "Unknown Product"
+        for line, header, item_name in rows:
             billing_list.append({
-                'bill_id': bill.bill_id,
-                'customer_name': bill.customer_name,
-                'customer_mobile': bill.customer_mobile,
-                'product_code': bill.product_code,
-                'product_name': product_name,
-                'quantity': bill.quantity,
-                'total_price': bill.total_price,
-                'total_profit': bill.total_profit,
-                'status': bill.status,
-                'timestamp': bill.timestamp
+                'bill_id': header.bill_id,
+                'customer_name': header.customer_name,
+                'customer_mobile': header.customer_mobile,
+                'product_code': line.product_code,
+                'product_name': item_name or "Unknown Product",
+                'quantity': line.quantity,
+                'total_price': line.total_price,
+                'total_profit': line.total_profit,
+                'status': header.status,
+                'timestamp': line.timestamp
             })
 
         return jsonify(billing_list), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+def sales_lines_query(since_id=None, since=None):
+    """
+    Select every bill line with its header fields and product name, oldest
+    first. `since_id` and `since` restrict it to lines added after a line id
+    or sold after a (naive UTC) timestamp.
+    """
+    query = select(
+        BillLine.id, BillHeader.bill_id, BillHeader.customer_name, BillHeader.customer_mobile,
+        BillLine.product_code, Stock.item_name, BillLine.quantity, BillLine.total_price,
+        BillLine.total_profit, BillHeader.status, BillLine.timestamp
+    ).join(BillHeader, BillLine.header_id == BillHeader.id) \
+     .outerjoin(Stock, BillLine.product_code == Stock.product_code)
+
+    if since_id is not None:
+        query = query.where(BillLine.id > since_id)
+    if since is not None:
+        query = query.where(BillLine.timestamp > since)
+    return query.order_by(BillLine.id)
+
+
+def _parse_since(value):
+    """Parse a `since` value given as epoch seconds or an ISO-8601 timestamp."""
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value), timezone.utc).replace(tzinfo=None)
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+@billing_bp.route('/billing-data/stream', methods=['GET'])
+def billing_data_stream():
+    """
+    Stream bill lines as newline-delimited JSON, one line per object.
+
+    Pass `since_id` (the last `id` already received) or `since` (epoch seconds
+    or ISO-8601) to pull only newer lines. Rows are read from a server-side
+    cursor, so memory use does not grow with the number of lines.
+    """
+    try:
+        since_id = request.args.get('since_id', type=int)
+        since = request.args.get('since', '').strip()
+        since = _parse_since(since) if since else None
+    except ValueError:
+        return jsonify({"error": "Invalid since value"}), 400
+
+    def generate():
+        rows = db.session.execute(
+            sales_lines_query(since_id, since).execution_options(yield_per=1000)
+        )
+        for row in rows:
+            timestamp = row.timestamp.replace(tzinfo=timezone.utc)
+            yield json.dumps({
+                'id': row.id,
+                'bill_id': row.bill_id,
+                'customer_name': row.customer_name,
+                'customer_mobile': row.customer_mobile,
+                'product_code': row.product_code,
+                'product_name': row.item_name or "Unknown Product",
+                'quantity': row.quantity,
+                'total_price': row.total_price,
+                'total_profit': row.total_profit,
+                'status': row.status,
+                'timestamp': timestamp.isoformat().replace('+00:00', 'Z'),
+                'epoch': int(timestamp.timestamp()),
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _copy_legacy_bills(groups):
+    """Insert headers and lines for a batch of legacy bills grouped by bill_id."""
+    existing = {bill_id for bill_id, in db.session.query(BillHeader.bill_id)
+                .filter(BillHeader.bill_id.in_(groups))}
+    groups = {bill_id: rows for bill_id, rows in groups.items() if bill_id not in existing}
+    if not groups:
+        return 0
+
+    db.session.execute(insert(BillHeader), [{
+        'bill_id': bill_id,
+        'customer_name': rows[0].customer_name,
+        'customer_mobile': rows[0].customer_mobile,
+        'status': rows[0].status,
+        'timestamp': min(row.timestamp for row in rows),
+        'total_price': sum(row.total_price for row in rows),
+        'total_profit': sum(row.total_profit for row in rows),
+        'line_count': len(rows),
+    } for bill_id, rows in groups.items()])
+
+    header_ids = dict(db.session.query(BillHeader.bill_id, BillHeader.id)
+                      .filter(BillHeader.bill_id.in_(groups)))
+    db.session.execute(insert(BillLine), [{
+        'header_id': header_ids[bill_id],
+        'product_code': row.product_code,
+        'quantity': row.quantity,
+        'total_price': row.total_price,
+        'total_profit': row.total_profit,
+        'timestamp': min(r.timestamp for r in rows),
+    } for bill_id, rows in groups.items() for row in rows])
+    db.session.commit()
+    return len(groups)
+
+
+@billing_bp.cli.command('migrate-headers')
+def migrate_bill_headers():
+    """Copy legacy one-row-per-line billing rows into bill_header / bill_line."""
+    db.create_all()
+    migrated = 0
+    last_bill_id = ''
+
+    # Walk the legacy bills in bill_id order, 500 bills at a time
+    while True:
+        bill_ids = [bill_id for bill_id, in db.session.query(Billing.bill_id)
+                    .filter(Billing.bill_id > last_bill_id).distinct()
+                    .order_by(Billing.bill_id).limit(500)]
+        if not bill_ids:
+            break
+
+        groups = {}
+        for row in Billing.query.filter(Billing.bill_id.in_(bill_ids)).order_by(Billing.id):
+            groups.setdefault(row.bill_id, []).append(row)
+        migrated += _copy_legacy_bills(groups)
+        last_bill_id = bill_ids[-1]
+
+    print(f"Migrated {migrated} bills to bill_header / bill_line.")
+
+
+@billing_bp.cli.command('add-indexes')
+def add_bill_indexes():
+    """Create the listing and time-window indexes on existing bill_header / bill_line tables."""
+    db.create_all()
+    with db.engine.begin() as conn:
+        for table in (BillHeader.__table__, BillLine.__table__):
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    print("Bill indexes are in place.")
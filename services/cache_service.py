@@ -0,0 +1,267 @@
+# services/cache_service.py
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from blinker import Namespace
+from flask import Blueprint, jsonify, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, update, insert, select
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+
+cache_bp = Blueprint('result_cache', __name__)
+
+# Tables whose writes make cached results stale, by the data version they bump
+VERSIONED_TABLES = {
+    'billing': 'sales',
+    'bill_header': 'sales',
+    'bill_line': 'sales',
+    'daily_sales_rollup': 'sales',
+    'stock': 'stock',
+    'stock_lot': 'stock',
+    'party': 'stock',  # Supplier lead times feed the reorder points
+}
+DATA_SCOPES = ('sales', 'stock')
+
+# Sent with the app as sender and scopes=set of data scopes after each
+# commit that changed any, e.g. so the desktop sales queue can refresh its
+# stock copy right away
+data_changed = Namespace().signal('data-changed')
+
+
+class DataVersion(db.Model):
+    """Counters bumped after every commit that writes bills or stock."""
+    __tablename__ = 'data_version'
+    scope = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _mark(session, table_name):
+    scope = VERSIONED_TABLES.get(table_name)
+    if scope:
+        session.info.setdefault('changed_scopes', set()).add(scope)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__table__', None)
+        if table is not None:
+            _mark(session, table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_statement(state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None:
+            _mark(state.session, table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_versions(session):
+    scopes = session.info.pop('changed_scopes', None)
+    if not scopes:
+        return
+    # Bumped in a short transaction of its own once the data is committed,
+    # so the version row is never locked for the length of a sale. A result
+    # computed in the moment between the two commits is cached under the old
+    # version and is not looked up again once the bump lands.
+    try:
+        with session.get_bind().begin() as conn:
+            for scope in sorted(scopes):
+                bumped = conn.execute(update(DataVersion).where(DataVersion.scope == scope)
+                                      .values(version=DataVersion.version + 1)).rowcount
+                if not bumped:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(insert(DataVersion).values(scope=scope, version=1))
+                    except IntegrityError:
+                        conn.execute(update(DataVersion).where(DataVersion.scope == scope)
+                                     .values(version=DataVersion.version + 1))
+    except Exception as e:
+        # The data is saved already; cached results then age out by TTL
+        current_app.logger.warning("Error bumping data versions %s: %s", sorted(scopes), e)
+    if has_app_context():
+        data_changed.send(current_app._get_current_object(), scopes=scopes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('changed_scopes', None)
+
+
+def data_versions():
+    """Current version of each data scope, read with a single query."""
+    versions = dict(db.session.execute(select(DataVersion.scope, DataVersion.version)).all())
+    return tuple(versions.get(scope, 0) for scope in DATA_SCOPES)
+
+
+class MemoryBackend:
+    """In-process LRU store."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """Pickle files in a directory, shared by every process of the app; LRU by file mtime."""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, entry = pickle.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        return entry if stored_key == key else None
+
+    def set(self, key, entry):
+        path = self._file(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        files = [name for name in os.listdir(self.path) if name.endswith('.pkl')]
+        if len(files) <= self.max_entries:
+            return 0
+        files.sort(key=lambda name: os.path.getmtime(os.path.join(self.path, name)))
+        for name in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+        return len(files) - self.max_entries
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.path, name))
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.path) if name.endswith('.pkl'))
+
+
+class ResultCache:
+    """
+    Cache of computed report results keyed by (report, parameters, data
+    version). Any commit touching bills or stock bumps the data version, so
+    stale entries are simply never looked up again and age out by LRU/TTL.
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def get_or_compute(self, report, params, compute):
+        key = (report, tuple(sorted((params or {}).items())), data_versions())
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is not None and entry[0] < time.time():
+                self.backend.delete(key)
+                self.stats['expired'] += 1
+                entry = None
+            self.stats['hits' if entry is not None else 'misses'] += 1
+        if entry is not None:
+            return entry[1]
+
+        value = compute()
+        with self._lock:
+            self.stats['evictions'] += self.backend.set(key, (time.time() + self.ttl, value)) or 0
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def info(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self.backend), ttl=self.ttl,
+                        backend=type(self.backend).__name__,
+                        hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else None)
+
+
+@cache_bp.record_once
+def _create_cache(state):
+    app = state.app
+    size = app.config.get('RESULT_CACHE_SIZE', 256)
+    if app.config.get('RESULT_CACHE_BACKEND', 'memory') == 'file':
+        path = app.config.get('RESULT_CACHE_DIR') or os.path.join(app.instance_path, 'result_cache')
+        backend = FileBackend(path, size)
+    else:
+        backend = MemoryBackend(size)
+    app.extensions['result_cache'] = ResultCache(backend, app.config.get('RESULT_CACHE_TTL', 300))
+
+
+def cached_result(report, params, compute):
+    """Return compute()'s result for `report` with `params`, reusing it until bills or stock change."""
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(report, params, compute)
+
+
+@cache_bp.route('/stats', methods=['GET'])
+def cache_stats():
+    """Route to show hit/miss counts of the report cache."""
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        return jsonify({"error": "The report cache is not enabled"}), 404
+    return jsonify(cache.info()), 200
+
+
+@cache_bp.route('/clear', methods=['POST'])
+def clear_cache():
+    """Route to drop every cached report result."""
+    cache = current_app.extensions.get('result_cache')
+    if cache is not None:
+        cache.clear()
+    return jsonify(success=True), 200
@@ -1,13 +1,250 @@
-from flask import Blueprint, jsonify, request, redirect, url_for, flash, render_template
+from flask import Blueprint, jsonify, request, redirect, url_for, flash, render_template, current_app
 from extensions import db
-from services.billing_service import Billing
 from services.account_service import Account
-from sqlalchemy import func
-import pywhatkit as kit
+from sqlalchemy import func, insert, update, bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+from bisect import bisect_left, insort
+import threading
+import time
 import datetime
 
 # Initialize the Blueprint
-customer_bp = Blueprint('customer_service', __name__)
+customer_bp = Blueprint('customer_service', __name__, cli_group='customers')
+
+
+# One row per customer, keyed by normalized mobile number
+class Customer(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    mobile = db.Column(db.String(15), unique=True, nullable=False)  # Digits only
+    name = db.Column(db.String(100), nullable=False)
+    name_key = db.Column(db.String(100), nullable=False, index=True)  # Lower-cased for prefix search
+    last_seen = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # When the row was last written, so every process's type-ahead index can pick up changes
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow, index=True)
+
+
+def normalize_mobile(mobile):
+    """Keep only the digits of a mobile number."""
+    return ''.join(ch for ch in str(mobile or '') if ch.isdigit())[-15:]
+
+
+def normalize_name(name):
+    """Lower-case a name and collapse its whitespace."""
+    return ' '.join(str(name or '').lower().split())[:100]
+
+
+class CustomerIndex:
+    """
+    In-process type-ahead index over customer names and mobiles.
+
+    Every name word and the mobile number are kept in one sorted list of
+    (token, customer id), so a prefix lookup is a bisect plus a short scan.
+    The index is built once by warm(); after that, customers added or
+    changed by any process are pulled in by `updated_at` every `refresh`
+    seconds. Rows written up to `overlap` seconds before the newest one seen
+    are read again, so a write that commits late is not missed.
+    """
+
+    def __init__(self, refresh=30, overlap=120):
+        self.refresh = refresh
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+        self._tokens = []
+        self._customers = {}
+        self._updated = None
+        self._checked = 0
+        self._warming = None
+
+    def _add(self, rows):
+        tokens = []
+        renamed = set()
+        for customer_id, name, mobile in rows:
+            old = self._customers.get(customer_id)
+            if old == (name, mobile):
+                continue
+            if old:
+                renamed.add(customer_id)
+            self._customers[customer_id] = (name, mobile)
+            key = normalize_name(name)
+            # Whole name, each word of it and the mobile are all searchable prefixes
+            tokens.extend((token, customer_id) for token in set(key.split()) | {key, mobile})
+
+        if renamed:
+            self._tokens = [entry for entry in self._tokens if entry[1] not in renamed]
+        if len(tokens) < 16 and not renamed:
+            for token in tokens:
+                insort(self._tokens, token)
+        elif tokens:
+            self._tokens.extend(tokens)
+            self._tokens.sort()
+
+    @property
+    def ready(self):
+        return bool(self._checked)
+
+    def add(self, rows):
+        """Add or update (id, name, mobile) rows if the index has been built."""
+        with self._lock:
+            if self._checked:
+                self._add(rows)
+
+    def _changed_since(self, since):
+        # (id, name, mobile) of customers written at or after `since`, and the newest write time
+        query = db.session.query(Customer.id, Customer.name, Customer.mobile, Customer.updated_at)
+        if since is not None:
+            query = query.filter(Customer.updated_at >= since - self.overlap)
+        rows = query.all()
+        newest = max((row[3] for row in rows if row[3] is not None), default=since)
+        return [row[:3] for row in rows], newest
+
+    def warm(self, app):
+        """Build the index from the customer table; runs off the request path."""
+        with app.app_context():
+            try:
+                rows, newest = self._changed_since(None)
+                with self._lock:
+                    self._add(rows)
+                    self._updated = newest
+                    self._checked = time.monotonic()
+            except Exception as e:
+                app.logger.warning("Customer index not built: %s", e)
+            finally:
+                db.session.remove()
+                self._warming = None
+
+    def start_warming(self, app):
+        """Build the index on a background thread, once."""
+        with self._lock:
+            if self._checked or self._warming:
+                return
+            self._warming = threading.Thread(target=self.warm, args=(app,), daemon=True,
+                                             name='customer-index')
+        self._warming.start()
+
+    def _refresh(self):
+        if time.monotonic() - self._checked < self.refresh:
+            return
+        rows, self._updated = self._changed_since(self._updated)
+        if rows:
+            self._add(rows)
+        self._checked = time.monotonic()
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (name, mobile) pairs with a token starting with `query`."""
+        query = normalize_name(query)
+        with self._lock:
+            self._refresh()
+            results = []
+            seen = set()
+            i = bisect_left(self._tokens, (query,))
+            while i < len(self._tokens) and len(results) < limit:
+                token, customer_id = self._tokens[i]
+                if not token.startswith(query):
+                    break
+                if customer_id not in seen:
+                    seen.add(customer_id)
+                    results.append(self._customers[customer_id])
+                i += 1
+            return results
+
+
+customer_index = CustomerIndex()
+
+
+def remember_customers(customers):
+    """
+    Insert or update customers from (name, mobile, timestamp) tuples.
+
+    Runs in its own transaction after a bill is saved, so a failure here
+    never loses a sale.
+    """
+    latest = {}
+    for name, mobile, seen in customers:
+        key = normalize_mobile(mobile)
+        if key and name and (key not in latest or seen >= latest[key][1]):
+            latest[key] = (name.strip()[:100], seen)
+    if not latest:
+        return
+
+    for attempt in range(2):
+        try:
+            existing = dict(db.session.query(Customer.mobile, Customer.name)
+                            .filter(Customer.mobile.in_(latest)))
+            new_rows = [{'mobile': key, 'name': name, 'name_key': normalize_name(name), 'last_seen': seen}
+                        for key, (name, seen) in latest.items() if key not in existing]
+            changed = [{'m': key, 'name': name, 'name_key': normalize_name(name), 'last_seen': seen}
+                       for key, (name, seen) in latest.items() if key in existing]
+            if new_rows:
+                db.session.execute(insert(Customer), new_rows)
+            if changed:
+                db.session.execute(
+                    update(Customer.__table__).where(Customer.__table__.c.mobile == bindparam('m')),
+                    changed
+                )
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Another till added one of these customers first; update it instead
+            db.session.rollback()
+    else:
+        return
+
+    renamed = {key for key, (name, _) in latest.items() if existing.get(key) != name}
+    if renamed:
+        customer_index.add(db.session.query(Customer.id, Customer.name, Customer.mobile)
+                           .filter(Customer.mobile.in_(renamed)).all())
+
+
+def search_customers(query, limit=10):
+    """Find customers whose name (or a word of it) or mobile starts with `query`."""
+    query = query.strip()
+    if not query:
+        return []
+
+    if current_app.config.get('CUSTOMER_TYPEAHEAD_INDEX', True):
+        if customer_index.ready:
+            return customer_index.search(query, limit)
+        customer_index.start_warming(current_app._get_current_object())
+
+    # Without the in-process index (or while it is being built), fall back to prefix range scans in SQL
+    digits = normalize_mobile(query)
+    condition = Customer.name_key.like(f'{normalize_name(query)}%')
+    if digits and digits == query:
+        condition = db.or_(condition, Customer.mobile.like(f'{digits}%'))
+    rows = db.session.query(Customer.name, Customer.mobile).filter(condition) \
+        .order_by(Customer.name_key).limit(limit).all()
+    return [(name, mobile) for name, mobile in rows]
+
+
+@customer_bp.cli.command('add-columns')
+def add_customer_columns():
+    """Add customer.updated_at to a customer table created before it existed."""
+    db.create_all()
+    if 'updated_at' not in {column['name'] for column in inspect(db.engine).get_columns('customer')}:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE customer ADD COLUMN updated_at DATETIME NULL"))
+            conn.execute(text("UPDATE customer SET updated_at = last_seen"))
+            conn.execute(text("CREATE INDEX ix_customer_updated_at ON customer (updated_at)"))
+    print("Customer columns are in place.")
+
+
+@customer_bp.cli.command('sync')
+def sync_customers():
+    """Populate the customer table from existing bills."""
+    from services.billing_service import BillHeader
+
+    db.create_all()
+    rows = db.session.query(
+        BillHeader.customer_name, BillHeader.customer_mobile, func.max(BillHeader.timestamp)
+    ).group_by(BillHeader.customer_name, BillHeader.customer_mobile) \
+     .order_by(func.max(BillHeader.timestamp)).all()
+
+    # Oldest first, so a customer's most recent name is the one kept
+    for start in range(0, len(rows), 1000):
+        remember_customers(rows[start:start + 1000])
+    print(f"Customer table now holds {Customer.query.count()} customers.")
+
 
 # def send_whatsapp_reminder(customer_name, customer_mobile, reminder_details, total_amount_due, firm_name):
 #     """
@@ -65,12 +302,14 @@ def customer_list():
     """
     Displays a list of customers with their total unpaid bills.
     """
+    from services.billing_service import BillHeader
+
     customers = db.session.query(
-        Billing.customer_name,
-        Billing.customer_mobile,
-        func.sum(Billing.total_price).label('total_unpaid')
-    ).filter(Billing.status == 'Unpaid') \
-     .group_by(Billing.customer_name, Billing.customer_mobile).all()
+        BillHeader.customer_name,
+        BillHeader.customer_mobile,
+        func.sum(BillHeader.total_price).label('total_unpaid')
+    ).filter(func.lower(BillHeader.status) == 'unpaid') \
+     .group_by(BillHeader.customer_name, BillHeader.customer_mobile).all()
 
     return render_template('customer_list.html', customers=customers)
 
@@ -82,19 +321,20 @@ def send_reminder(customer_name, customer_mobile):
     Sends a WhatsApp reminder message to a customer with unpaid bills.
     Returns a JSON response without redirecting.
     """
+    from services.billing_service import BillHeader
+
     # Retrieve the firm name from the Account model
     firm_name = Account.query.first().firm_name
 
     # Get all unpaid bills for the customer
-    unpaid_bills = db.session.query(Billing).filter_by(
+    unpaid_bills = db.session.query(BillHeader).filter_by(
         customer_name=customer_name, 
-        customer_mobile=customer_mobile, 
-        status='Unpaid'
-    ).all()
+        customer_mobile=customer_mobile
+    ).filter(func.lower(BillHeader.status) == 'unpaid').all()
 
     if unpaid_bills:
         # Prepare reminder details and total amount
-        reminder_details = "\n".join([f"Product: {bill.product_code}, Amount: {bill.total_price}" for bill in unpaid_bills])
+        reminder_details = "\n".join([f"Bill: {bill.bill_id}, Amount: {bill.total_price}" for bill in unpaid_bills])
         total_amount_due = sum([bill.total_price for bill in unpaid_bills])
 
         # Send reminder via WhatsApp
@@ -1,12 +1,14 @@
 # services/dashboard_service.py
 from flask import Blueprint, render_template,jsonify,url_for
-from datetime import datetime
+from datetime import datetime, timedelta
 from extensions import db
-from services.stock_service import Stock
-from services.billing_service import Billing
+from services.stock_service import Stock, StockLot, expiring_stock, upcoming_expiry
 from services.reminders_service import reminders_bp
 from services.account_service import Account
-import pywhatkit as kit
+from services.rollup_service import DailySalesRollup, rollup_totals, month_bounds
+from services.cache_service import cached_result
+from services.time_service import shop_today
+from services.replenishment_service import reorder_list
 
 dashboard_bp = Blueprint('dashboard', __name__)
 # services/dashboard_service.py
@@ -29,29 +31,94 @@ class Dashboard(db.Model):
 
 
 
+def _dashboard_figures(today):
+    total_stock_value = db.session.query(db.func.sum(Stock.selling_price * Stock.quantity)).scalar() or 0
+    low_stock_items = [{'product_code': item['product_code'], 'item_name': item['item_name'],
+                        'quantity': item['available']} for item in reorder_list(today)]
+    next_expiry = db.session.execute(
+        upcoming_expiry(today).add_columns(Stock.product_code)).first()
+    next_expiry_item = {'product_code': next_expiry.product_code, 'item_name': next_expiry.item_name,
+                        'expiry': next_expiry.expiry.isoformat()} if next_expiry else None
+
+    monthly_sales = rollup_totals(*month_bounds(today.year, today.month))['revenue']
+    today_sales = rollup_totals(today, today + timedelta(days=1))['revenue']
+    return {'total_stock_value': total_stock_value, 'low_stock_items': low_stock_items,
+            'next_expiry_item': next_expiry_item, 'monthly_sales': monthly_sales,
+            'today_sales': today_sales}
+
+
 # Dashboard Route
 @dashboard_bp.route('/')
 def index():
-    total_stock_value = sum([stock.selling_price * stock.quantity for stock in Stock.query.all()])
-    low_stock_items = Stock.query.filter(Stock.quantity <= 10).all()
-    next_expiry_item = Stock.query.order_by(Stock.expiry).first()
-    
-    month_sales = Billing.query.filter(db.extract('month', Billing.timestamp) == datetime.now().month).all()
-    monthly_sales = sum([bill.total_price for bill in month_sales])
-    today_sales = sum([bill.total_price for bill in Billing.query.filter(db.extract('day', Billing.timestamp) == datetime.now().day).all()])
-    return render_template('dashboard.html', 
-                           total_stock_value=total_stock_value,
-                           low_stock_items=low_stock_items,
-                           next_expiry_item=next_expiry_item,
-                           monthly_sales=monthly_sales,today_sales
-                           =today_sales)
-
-    return jsonify(today_sales), 200
+    today = shop_today()
+    summary = cached_result('dashboard', {'day': today}, lambda: _dashboard_figures(today))
+    return render_template('dashboard.html', **summary)
+
+DASHBOARD_LIST_LIMIT = 20
+
+
+def dashboard_summary(today):
+    """
+    Every dashboard widget in two small queries and the cached reorder plan:
+    one SELECT of scalar subqueries for the totals and next expiry, the top
+    five products from the rollup, and as limited stock the products at or
+    below their reorder point (the purchase lists' rule), capped at
+    DASHBOARD_LIST_LIMIT.
+    """
+    Rollup = DailySalesRollup
+    is_today = Rollup.day == today
+    upcoming = upcoming_expiry(today)
+    totals = db.session.execute(db.select(
+        db.select(db.func.count(Stock.id)).scalar_subquery(),
+        db.select(db.func.sum(Rollup.revenue)).scalar_subquery(),
+        db.select(db.func.sum(Rollup.profit)).scalar_subquery(),
+        db.select(db.func.sum(Rollup.unpaid_revenue)).scalar_subquery(),
+        db.select(db.func.sum(Rollup.revenue)).where(is_today).scalar_subquery(),
+        db.select(db.func.sum(Rollup.profit)).where(is_today).scalar_subquery(),
+        upcoming.with_only_columns(Stock.item_name).scalar_subquery(),
+        upcoming.with_only_columns(StockLot.expiry).scalar_subquery(),
+    )).one()
+    (stock_items, sales, profit, due,
+     today_sales, today_profit, expiry_name, expiry_date) = totals
+
+    top_products = db.session.query(
+        Stock.item_name, db.func.sum(Rollup.quantity), db.func.sum(Rollup.revenue)
+    ).join(Stock, Stock.product_code == Rollup.product_code) \
+     .group_by(Rollup.product_code, Stock.item_name) \
+     .order_by(db.func.sum(Rollup.revenue).desc()).limit(5).all()
+
+    limited = reorder_list(today)
+
+    return {
+        'day': today.isoformat(),
+        'stock_items': stock_items,
+        'total_sales': round(sales or 0, 2),
+        'total_profit': round(profit or 0, 2),
+        'total_due': round(due or 0, 2),
+        'today_sales': round(today_sales or 0, 2),
+        'today_profit': round(today_profit or 0, 2),
+        'top_products': [[name, quantity, round(revenue or 0, 2)] for name, quantity, revenue in top_products],
+        'next_expiry': [expiry_name, str(expiry_date)[:10]] if expiry_name else None,
+        'limited_stock': [[item['product_code'], item['item_name'], item['available'], item['reorder_point']]
+                          for item in limited[:DASHBOARD_LIST_LIMIT]],
+        'limited_stock_count': len(limited),
+    }
+
+
+@dashboard_bp.route('/summary')
+def summary():
+    """Route returning every dashboard widget as one compact JSON document."""
+    try:
+        today = shop_today()
+        return jsonify(cached_result('dashboard_summary', {'day': today},
+                                     lambda: dashboard_summary(today))), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @dashboard_bp.route('/one-purchase')
 def onepurchase():
-    # Fetch low stock items
-    low_stock_items = Stock.query.filter(Stock.quantity <= 10).all()
+    # Products at or below their reorder point, with the suggested order
+    reorder_items = reorder_list()
 
     # Fetch user details from the Account model (you can change this to get based on logged-in user)
     user = Account.query.first()  # Get the first account or filter based on session if needed
@@ -59,11 +126,13 @@ def onepurchase():
     # Prepare the data to send to the template
     stock_data = [
         {
-            "id": stock.id,
-            "name": stock.item_name,
-            "quantity": stock.quantity
+            "id": item['id'],
+            "name": item['item_name'],
+            "quantity": item['quantity'],
+            "reorder_point": item['reorder_point'],
+            "order_quantity": item['order_quantity']
         }
-        for stock in low_stock_items
+        for item in reorder_items
     ]
 
     # Get current timestamp
@@ -80,28 +149,28 @@ def onepurchase():
 
 @dashboard_bp.route('/today_sales')
 def today_sales():
-    today_sales = sum([bill.total_price for bill in Billing.query.filter(db.extract('day', Billing.timestamp) == datetime.now().day).all()])
-    
-    today_profit = sum([bill.total_profit  for bill in Billing.query.filter(db.extract('day', Billing.timestamp) == datetime.now().day).all()])
+    today = shop_today()
+    totals = cached_result('totals', {'start': today, 'end': today + timedelta(days=1)},
+                           lambda: rollup_totals(today, today + timedelta(days=1)))
+    today_sales, today_profit = totals['revenue'], totals['profit']
 
     return jsonify(today_sales=today_sales,today_profit=today_profit), 200
 
 @dashboard_bp.route('/purchase')
 def purchase():
     try:
-        # Fetch low stock items
-        low_stock_items = Stock.query.filter(Stock.quantity <= 10).all()
+        # Products at or below their reorder point
+        reorder_items = reorder_list()
         user = Account.query.first()
         # Fetch expired items
-        expired_products = db.session.query(
-            Stock.item_name
-        ).filter(Stock.expiry <= datetime.utcnow()).all()
+        expired_products = expiring_stock(shop_today())
 
-        # Combine low stock and expired items without duplicates
-        combined_items = list(set([item.item_name for item in low_stock_items] + [product.item_name for product in expired_products]))
+        # Combine reorder and expired items without duplicates
+        combined_items = list(set([item['item_name'] for item in reorder_items] + [product.item_name for product in expired_products]))
+        suggested = {item['item_name']: item['order_quantity'] for item in reorder_items}
 
         return render_template('all-purchase.html', 
-                               combined_items=combined_items,user=user)
+                               combined_items=combined_items, suggested=suggested, user=user)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -109,19 +178,16 @@ def purchase():
 def add_expired():
     try:
         # Fetch expired products
-        expired_products = db.session.query(
-            Stock.item_name
-        ).filter(Stock.expiry <= datetime.utcnow()).all()
+        expired_products = expiring_stock(shop_today())
 
         # Extract item names
         expired_items = [product.item_name for product in expired_products]
 
         # Fetch existing items in the combined list
-        low_stock_items = Stock.query.filter(Stock.quantity <= 10).all()
-        low_stock_item_names = [item.item_name for item in low_stock_items]
+        reorder_item_names = [item['item_name'] for item in reorder_list()]
 
-        # Combine both low-stock items and expired items
-        combined_items = list(set(low_stock_item_names + expired_items))
+        # Combine both reorder items and expired items
+        combined_items = list(set(reorder_item_names + expired_items))
 
         return jsonify({"message": "Expired products added", "combined_items": combined_items}), 200
     except Exception as e:
@@ -129,16 +195,16 @@ def add_expired():
 
 def send_whatsapp_reminder(user_phone):
     try:
-        # Get low stock items
-        low_stock_items = Stock.query.filter(Stock.quantity <= 10).all()
-        low_stock_names = [item.item_name for item in low_stock_items]
+        # Get low stock items (at or below their reorder point)
+        today = shop_today()
+        low_stock_names = [item['item_name'] for item in reorder_list(today)]
 
         # Get today's sales and profit
-        today_sales = sum([bill.total_price for bill in Billing.query.filter(db.extract('day', Billing.timestamp) == datetime.now().day).all()])
-        today_profit = sum([bill.total_profit for bill in Billing.query.filter(db.extract('day', Billing.timestamp) == datetime.now().day).all()])
+        totals = rollup_totals(today, today + timedelta(days=1))
+        today_sales, today_profit = totals['revenue'], totals['profit']
 
         # Get expired products
-        expired_products = db.session.query(Stock.item_name).filter(Stock.expiry <= datetime.utcnow()).all()
+        expired_products = expiring_stock(today)
         expired_item_names = [product.item_name for product in expired_products]
 
         # Prepare the message content
@@ -148,7 +214,9 @@ def send_whatsapp_reminder(user_phone):
         message_content += f"Today's Profit: ${today_profit:.2f}\n"
         message_content += f"Expired Items: {', '.join(expired_item_names)}\n" if expired_item_names else "No expired items.\n"
 
-        # Send WhatsApp message using PyWhatKit (to the user's phone)
+        # Send WhatsApp message using PyWhatKit (to the user's phone). It is
+        # imported here because importing it checks for an internet connection
+        import pywhatkit as kit
         kit.sendwhatmsg(f"+{user_phone}", message_content, datetime.now().hour, datetime.now().minute + 2)  # Sends message 2 minutes from now
 
         return {"message": "Reminder sent successfully"}, 200
@@ -0,0 +1,57 @@
+# services/line_watermark.py
+# Tracks which bill lines an incremental reader has seen. Kept free of the
+# app's models so the predict service can use it without loading them.
+import time
+import numpy as np
+
+# Seconds after which every transaction holding a bill_line id is taken to
+# have committed or rolled back (see LineWatermark)
+LINE_SETTLE_SECONDS = 600
+
+
+class LineWatermark:
+    """
+    Which bill lines have been read, for readers that only pull new lines.
+
+    bill_line ids are handed out at insert but become visible at commit, so
+    a long import can commit lines with ids below ones already read. Every
+    line up to `settled` has been read; above it the ids read so far are
+    kept in `recent`, and each read starts again from `settled` and skips
+    them. `settled` moves up to the highest id seen by a read at least
+    `settle_seconds` ago, once every transaction that could hold a lower id
+    has finished. `marks` are (wall-clock time, highest id seen) pairs.
+    """
+
+    def __init__(self, settled=0, recent=(), marks=(), settle_seconds=LINE_SETTLE_SECONDS):
+        self.settled = int(settled)
+        self.recent = {int(line_id) for line_id in recent}
+        self.marks = [(float(when), int(line_id)) for when, line_id in marks]
+        self.settle_seconds = settle_seconds
+
+    @property
+    def highest(self):
+        return max(self.recent, default=self.settled)
+
+    def fresh(self, line_ids):
+        """Mask of the ids (an array read with id > settled) not read before."""
+        line_ids = np.asarray(line_ids, dtype=np.int64)
+        if not self.recent:
+            return np.ones(len(line_ids), dtype=bool)
+        return ~np.isin(line_ids, np.fromiter(self.recent, dtype=np.int64, count=len(self.recent)))
+
+    def record(self, line_ids, now=None):
+        """Note ids as read by a read that started at `now` and settle what is old enough."""
+        now = time.time() if now is None else now
+        self.recent.update(int(line_id) for line_id in line_ids)
+        highest = self.highest
+        if not self.marks or self.marks[-1][1] != highest:
+            self.marks.append((now, highest))
+        settled = [line_id for when, line_id in self.marks if when <= now - self.settle_seconds]
+        if settled and settled[-1] > self.settled:
+            self.settled = settled[-1]
+            self.recent = {line_id for line_id in self.recent if line_id > self.settled}
+        self.marks = [(when, line_id) for when, line_id in self.marks if line_id > self.settled]
+
+    def state(self):
+        """JSON-friendly form for checkpoints, with the settled id as `last_id`."""
+        return {'last_id': self.settled, 'recent': sorted(self.recent), 'marks': self.marks}
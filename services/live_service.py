@@ -0,0 +1,45 @@
+# services/live_service.py
+# Small change events pushed to open dashboards over Socket.IO, so screens
+# update in place instead of polling the database.
+from flask import current_app, has_app_context
+from extensions import socketio
+
+
+def _publish(event, payload):
+    # Events are best effort: the data is committed already, and dashboards
+    # resync periodically anyway
+    if socketio.server is None:
+        return
+    try:
+        socketio.emit(event, payload)
+    except Exception as e:
+        if has_app_context():
+            current_app.logger.warning("Error publishing %s event: %s", event, e)
+
+
+def publish_sale(bill_id, status, amount, profit, stock, day):
+    """
+    A new bill; `stock` lists (product_code, item_name, quantity left) of the
+    products sold and `day` is the shop-local sale date (ISO), which is not
+    today for bills replayed from the desktop sales queue.
+    """
+    _publish('sale', {
+        'bill_id': bill_id,
+        'day': day,
+        'status': status,
+        'amount': round(amount, 2),
+        'profit': round(profit, 2),
+        'stock': [list(product) for product in stock],
+    })
+
+
+def publish_bill_status(bill_id, old_status, new_status, amount):
+    """A bill moved between paid and unpaid."""
+    _publish('bill_status', {'bill_id': bill_id, 'old_status': old_status,
+                             'status': new_status, 'amount': round(amount, 2)})
+
+
+def publish_stock(action, product_code, item_name=None, quantity=None):
+    """A stock item was added, updated or deleted."""
+    _publish('stock', {'action': action, 'product_code': product_code,
+                       'item_name': item_name, 'quantity': quantity})
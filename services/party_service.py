@@ -1,24 +1,29 @@
 # services/party_service.py
 
-from flask import Blueprint, render_template
+from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for
 from extensions import db
 from services.stock_service import Stock
 
 # services/party_service.py
 from extensions import db
 
+DEFAULT_LEAD_TIME_DAYS = 7  # Days from order to delivery when none is given
+
 class Party(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     party_name = db.Column(db.String(120), nullable=False)
     contact_details = db.Column(db.String(255), nullable=False)
     order_status = db.Column(db.String(50), nullable=False)  # e.g., Ordered, Pending, Delivered
     order_reminder = db.Column(db.DateTime, nullable=False)
+    lead_time_days = db.Column(db.Integer, nullable=False, default=DEFAULT_LEAD_TIME_DAYS)  # Days from order to delivery
 
-    def __init__(self, party_name, contact_details, order_status, order_reminder):
+    def __init__(self, party_name, contact_details, order_status, order_reminder, lead_time_days=DEFAULT_LEAD_TIME_DAYS):
         self.party_name = party_name
         self.contact_details = contact_details
         self.order_status = order_status
         self.order_reminder = order_reminder
+        self.lead_time_days = lead_time_days
 
 
 party_bp = Blueprint('party', __name__)
@@ -38,4 +43,51 @@ def order_reminder():
 # Party Details Route
 @party_bp.route('/details')
 def party_details():
-    return render_template('party_details.html')
+    parties = Party.query.order_by(Party.party_name).all()
+    return render_template('party_details.html', parties=parties)
+
+
+def read_party_form(form):
+    """Party fields from the add/edit form; raises ValueError on a bad lead time."""
+    lead_time_days = int(form.get('lead_time_days') or DEFAULT_LEAD_TIME_DAYS)
+    if lead_time_days < 0:
+        raise ValueError("Lead time cannot be negative")
+    return {
+        'party_name': form['party_name'],
+        'contact_details': form['contact_details'],
+        'order_status': form.get('order_status') or 'Pending',
+        'order_reminder': datetime.strptime(form['order_reminder'], '%Y-%m-%d'),
+        'lead_time_days': lead_time_days,
+    }
+
+
+# Add Party Route
+@party_bp.route('/add', methods=['GET', 'POST'])
+def add_party():
+    if request.method == 'POST':
+        try:
+            fields = read_party_form(request.form)
+        except ValueError as e:
+            return str(e), 400
+        db.session.add(Party(**fields))
+        db.session.commit()
+        return redirect(url_for('party.party_details'))
+    return render_template('party_form.html', party=None, default_lead_time=DEFAULT_LEAD_TIME_DAYS)
+
+
+# Edit Party Route
+@party_bp.route('/edit/<int:party_id>', methods=['GET', 'POST'])
+def edit_party(party_id):
+    party = db.session.get(Party, party_id)
+    if not party:
+        return "Party not found", 404
+    if request.method == 'POST':
+        try:
+            fields = read_party_form(request.form)
+        except ValueError as e:
+            return str(e), 400
+        for name, value in fields.items():
+            setattr(party, name, value)
+        db.session.commit()
+        return redirect(url_for('party.party_details'))
+    return render_template('party_form.html', party=party, default_lead_time=DEFAULT_LEAD_TIME_DAYS)
@@ -0,0 +1,82 @@
+# services/receipt_render.py
+# Receipt rendering that runs inside worker processes. It works on plain
+# dicts and needs only Jinja, so the workers never query the database.
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+_env = None
+_template = None
+
+
+def init_worker(template_dir):
+    """Process pool initializer: compile the receipt template once per worker."""
+    global _env, _template
+    _env = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape(['html']))
+    _template = _env.get_template('receipt.html')
+
+
+def receipt_lines(bill, firm_name):
+    """Plain-text lines of a receipt, used for the PDF version."""
+    lines = [firm_name or 'Stock8Ease', '',
+             f"Bill ID:  {bill['bill_id']}",
+             f"Date:     {bill['timestamp'][:19].replace('T', ' ')}",
+             f"Customer: {bill['customer_name']} ({bill['customer_mobile']})",
+             '-' * 60,
+             f"{'Code':<10} {'Item':<28} {'Qty':>6} {'Amount':>12}",
+             '-' * 60]
+    for line in bill['lines']:
+        lines.append(f"{line['product_code']:<10} {line['product_name'][:28]:<28} "
+                     f"{line['quantity']:>6} {line['total_price']:>12.2f}")
+    lines += ['-' * 60,
+              f"{'Total':<46} {bill['total_price']:>13.2f}",
+              f"Status: {bill['status']}"]
+    return lines
+
+
+def _pdf_escape(text):
+    text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def text_pdf(lines, font_size=10, leading=14):
+    """Lay out lines of text on A4 pages in Courier and return the PDF bytes."""
+    per_page = int((842 - 80) // leading)
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+    # Objects 1-3 are the catalog, the page tree and the font; each page then
+    # takes two objects, the page itself and its content stream
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>'
+         % (' '.join(f'{page_id} 0 R' for page_id in page_ids), len(pages))).encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    for page_id, page in zip(page_ids, pages):
+        text = ''.join(f'({_pdf_escape(line)}) Tj T* ' for line in page)
+        stream = f'BT /F1 {font_size} Tf {leading} TL 40 802 Td {text}ET'.encode('latin-1')
+        objects.append(('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                        '/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (page_id + 1)).encode())
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_receipts(bills, firm_name, fmt):
+    """Render a batch of bills; returns (file name, bytes) pairs."""
+    rendered = []
+    for bill in bills:
+        if fmt == 'pdf':
+            body = text_pdf(receipt_lines(bill, firm_name))
+        else:
+            body = _template.render(bill=bill, firm_name=firm_name).encode('utf-8')
+        rendered.append((f"receipt_{bill['bill_id']}.{fmt}", body))
+    return rendered
@@ -0,0 +1,285 @@
+# services/receipt_service.py
+import glob
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+from flask import Blueprint, request, jsonify, send_file, url_for, current_app
+from extensions import db
+from services.stock_service import Stock
+from services.billing_service import BillHeader, BillLine
+from services.account_service import Account
+from services.receipt_render import init_worker, render_receipts
+from services.time_service import date_range, to_shop_time
+
+receipt_bp = Blueprint('receipts', __name__)
+
+RECEIPT_FORMATS = ('pdf', 'html')
+RECEIPT_BATCH_SIZE = 100
+RECEIPT_JOB_TTL = 3600      # Seconds a finished job and its archive are kept
+RECEIPT_MAX_JOBS = 200      # Jobs remembered at most; the oldest finished ones go first
+
+
+def receipts_dir(app):
+    """Directory for rendered receipts and archives (RECEIPTS_DIR or instance/receipts)."""
+    return app.config.get('RECEIPTS_DIR') or os.path.join(app.instance_path, 'receipts')
+
+
+def receipt_path(app, bill_id, status, fmt):
+    """Cached receipt of a bill in a given status, so a status change never serves the old one."""
+    return os.path.join(receipts_dir(app), 'bills', f"{bill_id}.{(status or '').lower()}.{fmt}")
+
+
+def _write_file(path, body):
+    # Written under a temporary name first, so a half-written receipt is never served
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def _firm_name():
+    account = Account.query.first()
+    return account.firm_name if account else None
+
+
+def iter_receipt_bills(bill_id=None, start=None, end=None, batch_size=RECEIPT_BATCH_SIZE):
+    """
+    Yield batches of bills as plain dicts (picklable for the worker pool),
+    either the single `bill_id` or every bill with start <= timestamp < end.
+    Each batch costs one query for the headers and one joined query for lines.
+    """
+    query = BillHeader.query
+    if bill_id:
+        query = query.filter(BillHeader.bill_id == bill_id)
+    else:
+        query = query.filter(BillHeader.timestamp >= start, BillHeader.timestamp < end)
+
+    last_id = 0
+    while True:
+        headers = query.filter(BillHeader.id > last_id).order_by(BillHeader.id).limit(batch_size).all()
+        if not headers:
+            return
+        bills = {header.id: {
+            'bill_id': header.bill_id,
+            'customer_name': header.customer_name,
+            'customer_mobile': header.customer_mobile,
+            'status': header.status,
+            'timestamp': to_shop_time(header.timestamp).isoformat(),
+            'total_price': header.total_price,
+            'lines': [],
+        } for header in headers}
+        lines = db.session.query(BillLine, Stock.item_name) \
+            .outerjoin(Stock, BillLine.product_code == Stock.product_code) \
+            .filter(BillLine.header_id.in_(bills)).order_by(BillLine.id)
+        for line, item_name in lines:
+            bills[line.header_id]['lines'].append({
+                'product_code': line.product_code,
+                'product_name': item_name or 'Unknown Product',
+                'quantity': line.quantity,
+                'total_price': line.total_price,
+            })
+        yield list(bills.values())
+        last_id = headers[-1].id
+
+
+class ReceiptJobs:
+    """
+    Renders receipts on a process pool in the background.
+
+    Each worker process compiles the receipt template once. Batch jobs are
+    coordinated on a thread that reads bills from the database, fans the
+    rendering out to the pool and writes the results into a zip archive.
+    Finished jobs are forgotten, and their archives deleted, after
+    RECEIPT_JOB_TTL seconds or once more than RECEIPT_MAX_JOBS are kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = {}  # job id -> time.monotonic() when it finished
+        self._pool = None
+        self._runner = ThreadPoolExecutor(max_workers=2, thread_name_prefix='receipt-jobs')
+
+    def pool(self, app):
+        with self._lock:
+            if self._pool is None:
+                # A spawned worker re-imports the main module (app.py) as
+                # __mp_main__, so it loads the app and its blueprints once at
+                # startup; rendering itself only uses receipt_render and
+                # never touches the database
+                self._pool = ProcessPoolExecutor(
+                    max_workers=app.config.get('RECEIPT_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                    initargs=(os.path.join(app.root_path, app.template_folder),),
+                )
+            return self._pool
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            if fields.get('status') in ('done', 'failed'):
+                self._finished[job_id] = time.monotonic()
+
+    def _evict(self):
+        # Caller holds the lock and is about to add a job. Expired jobs go
+        # first, then the oldest finished ones while there are too many
+        expired = time.monotonic() - RECEIPT_JOB_TTL
+        oldest_first = sorted(self._finished, key=self._finished.get)
+        excess = len(self._jobs) + 1 - RECEIPT_MAX_JOBS
+        for job_id in oldest_first:
+            if self._finished[job_id] >= expired and excess <= 0:
+                break
+            path = self._jobs.pop(job_id)['path']
+            del self._finished[job_id]
+            excess -= 1
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def submit(self, app, fmt, bill_id=None, start=None, end=None):
+        """Queue a receipt archive job and return its id straight away."""
+        job_id = uuid4().hex
+        with self._lock:
+            self._evict()
+            self._jobs[job_id] = {'status': 'queued', 'format': fmt, 'rendered': 0,
+                                  'path': None, 'error': None}
+        self._runner.submit(self._run, app, job_id, fmt, bill_id, start, end)
+        return job_id
+
+    def _run(self, app, job_id, fmt, bill_id, start, end):
+        path = os.path.join(receipts_dir(app), 'jobs', f'{job_id}.zip')
+        try:
+            self._update(job_id, status='running')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with app.app_context():
+                firm_name = _firm_name()
+                futures = [self.pool(app).submit(render_receipts, bills, firm_name, fmt)
+                           for bills in iter_receipt_bills(bill_id, start, end)]
+                db.session.remove()
+
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for future in futures:
+                    rendered = future.result()
+                    for name, body in rendered:
+                        archive.writestr(name, body)
+                    with self._lock:
+                        self._jobs[job_id]['rendered'] += len(rendered)
+            self._update(job_id, status='done', path=path)
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e))
+
+    def prerender(self, app, bill, fmt='pdf'):
+        """Render one bill's receipt into the receipt cache without waiting for it."""
+        self._runner.submit(self._prerender, app, bill, fmt)
+
+    def _prerender(self, app, bill, fmt):
+        try:
+            with app.app_context():
+                firm_name = _firm_name()
+                db.session.remove()
+            rendered = self.pool(app).submit(render_receipts, [bill], firm_name, fmt).result()
+            _write_file(receipt_path(app, bill['bill_id'], bill['status'], fmt), rendered[0][1])
+        except Exception as e:
+            app.logger.warning("Error rendering receipt %s: %s", bill['bill_id'], e)
+
+    def discard(self, app, bill_id):
+        """Delete every cached receipt of a bill, after it changes or is deleted."""
+        pattern = os.path.join(glob.escape(os.path.join(receipts_dir(app), 'bills')),
+                               f'{glob.escape(bill_id)}.*')
+        for path in glob.glob(pattern):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@receipt_bp.record_once
+def _register_jobs(state):
+    # create_bill reaches the pipeline through app.extensions, avoiding an import cycle
+    state.app.extensions['receipt_jobs'] = ReceiptJobs()
+
+
+def _jobs():
+    return current_app.extensions['receipt_jobs']
+
+
+@receipt_bp.route('/jobs', methods=['POST'])
+def create_receipt_job():
+    """
+    Route to start rendering receipts for one bill (`bill_id`) or a date range
+    (`from` / `to`, inclusive, YYYY-MM-DD) as `pdf` or `html`. Returns a job id.
+    """
+    params = request.get_json(silent=True) or request.form
+    fmt = params.get('format', 'pdf')
+    if fmt not in RECEIPT_FORMATS:
+        return jsonify({"error": "format must be pdf or html"}), 400
+
+    bill_id = params.get('bill_id')
+    start = end = None
+    if not bill_id:
+        try:
+            first = datetime.strptime(params['from'], '%Y-%m-%d').date()
+            last = datetime.strptime(params.get('to') or params['from'], '%Y-%m-%d').date()
+            start, end = date_range(first, last + timedelta(days=1))
+        except (KeyError, ValueError):
+            return jsonify({"error": "Pass a bill_id or a from/to date range (YYYY-MM-DD)"}), 400
+
+    job_id = _jobs().submit(current_app._get_current_object(), fmt, bill_id, start, end)
+    return jsonify({'job_id': job_id,
+                    'status_url': url_for('receipts.receipt_job_status', job_id=job_id)}), 202
+
+
+@receipt_bp.route('/jobs/<job_id>', methods=['GET'])
+def receipt_job_status(job_id):
+    """Route to check on a receipt job."""
+    job = _jobs().get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    job.pop('path')
+    if job['status'] == 'done':
+        job['archive_url'] = url_for('receipts.receipt_job_archive', job_id=job_id)
+    return jsonify(job), 200
+
+
+@receipt_bp.route('/jobs/<job_id>/archive', methods=['GET'])
+def receipt_job_archive(job_id):
+    """Route to download a finished job's zip archive."""
+    job = _jobs().get(job_id)
+    if not job or job['status'] != 'done':
+        return jsonify({"error": "Archive not ready"}), 404
+    return send_file(job['path'], mimetype='application/zip', as_attachment=True,
+                     download_name=f'receipts_{job_id}.zip')
+
+
+@receipt_bp.route('/bill/<bill_id>.<fmt>', methods=['GET'])
+def bill_receipt(bill_id, fmt):
+    """Route to download one bill's receipt, rendering it if it isn't cached yet."""
+    if fmt not in RECEIPT_FORMATS:
+        return "Unknown receipt format", 404
+    app = current_app._get_current_object()
+    # Cached receipts are keyed by the bill's current status; a deleted bill is never served
+    header = db.session.query(BillHeader.status).filter_by(bill_id=bill_id).first()
+    if not header:
+        return f"Bill with ID {bill_id} not found", 404
+    path = receipt_path(app, bill_id, header.status, fmt)
+    if not os.path.exists(path):
+        bills = next(iter_receipt_bills(bill_id=bill_id), None)
+        if not bills:
+            return f"Bill with ID {bill_id} not found", 404
+        rendered = _jobs().pool(app).submit(render_receipts, bills, _firm_name(), fmt).result()
+        _write_file(path, rendered[0][1])
+    return send_file(path, mimetype='application/pdf' if fmt == 'pdf' else 'text/html')
@@ -3,7 +3,7 @@
 from flask import Blueprint, render_template
 from datetime import datetime, timedelta
 from extensions import db
-from services.stock_service import Stock
+from services.stock_service import Stock, get_near_to_expiry_stock
 
 reminders_bp = Blueprint('reminders', __name__)
 # services/reminders_service.py
@@ -32,11 +32,7 @@ class Reminder(db.Model):
 # Check for Expiry Reminders
 @reminders_bp.route('/expiry_reminder')
 def expiry_reminder():
-    today = datetime.today()
-    expiry_date = today + timedelta(days=7)
-    stock_items = Stock.query.filter(
-        Stock.expiry <= expiry_date.strftime('%Y-%m-%d')
-    ).all()
+    stock_items = get_near_to_expiry_stock(7)
 
     return render_template('expiry_reminder.html', stock_items=stock_items)
 
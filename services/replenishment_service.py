@@ -0,0 +1,156 @@
+# services/replenishment_service.py
+import math
+from datetime import timedelta
+from statistics import NormalDist
+import numpy as np
+from flask import Blueprint, request, jsonify
+from sqlalchemy import inspect, text
+from extensions import db
+from services.stock_service import Stock, StockLot
+from services.party_service import Party, DEFAULT_LEAD_TIME_DAYS
+from services.rollup_service import DailySalesRollup
+from services.cache_service import cached_result
+from services.time_service import shop_today
+
+replenishment_bp = Blueprint('replenishment', __name__)
+
+DEMAND_HISTORY_DAYS = 90      # Days of sales the demand figures are taken from
+REVIEW_PERIOD_DAYS = 14       # Days of demand an order should cover beyond the lead time
+SERVICE_LEVEL = 0.95          # Chance of not running out before a delivery arrives
+
+
+def replenishment_plan(today, history_days=DEMAND_HISTORY_DAYS, service_level=SERVICE_LEVEL,
+                       review_days=REVIEW_PERIOD_DAYS):
+    """
+    Reorder point and order quantity of every product, in one batch.
+
+    One query returns each product with its supplier's lead time, expired
+    units and the sum and sum of squares of its daily rollup quantities over
+    the `history_days` days before today; the mean and standard deviation of
+    daily demand (days without sales count as zero) and everything below are
+    then array operations. With L the lead time and z the normal quantile of
+    `service_level`:
+
+        safety stock  = z * std * sqrt(L)
+        reorder point = mean * L + safety stock
+        order up to   = mean * (L + review_days) + safety stock
+
+    Units in expired lots do not count as available. A product needs
+    ordering when it has demand and its available units are at or below its
+    reorder point, or when it is out of stock; an order is at least one unit.
+    """
+    if not 0.5 <= service_level < 1:
+        raise ValueError("service_level must be at least 0.5 and below 1")
+    if history_days < 2:
+        raise ValueError("history_days must be at least 2")
+
+    Rollup = DailySalesRollup
+    demand = db.session.query(
+        Rollup.product_code.label('product_code'),
+        db.func.sum(Rollup.quantity).label('total'),
+        db.func.sum(Rollup.quantity * Rollup.quantity).label('squares'),
+    ).filter(Rollup.day >= today - timedelta(days=history_days), Rollup.day < today) \
+     .group_by(Rollup.product_code).subquery()
+    expired = db.session.query(
+        StockLot.product_code.label('product_code'), db.func.sum(StockLot.quantity).label('units')
+    ).filter(StockLot.expiry < today, StockLot.quantity > 0).group_by(StockLot.product_code).subquery()
+
+    rows = db.session.query(
+        Stock.id, Stock.product_code, Stock.item_name, Party.party_name,
+        db.func.coalesce(Party.lead_time_days, DEFAULT_LEAD_TIME_DAYS),  # Products without a supplier
+        Stock.quantity, expired.c.units, demand.c.total, demand.c.squares,
+    ).outerjoin(Party, Stock.party_id == Party.id) \
+     .outerjoin(demand, demand.c.product_code == Stock.product_code) \
+     .outerjoin(expired, expired.c.product_code == Stock.product_code) \
+     .order_by(Stock.id).all()
+    if not rows:
+        return []
+    ids, codes, names, suppliers, lead_times = zip(*(row[:5] for row in rows))
+    figures = np.nan_to_num(np.array([row[5:] for row in rows], dtype=np.float64))
+    quantity, expired_units, total, squares = figures.T
+
+    n = len(rows)
+    mean = total / history_days
+    variance = np.maximum(squares - history_days * mean ** 2, 0) / (history_days - 1)
+    std = np.sqrt(variance)
+
+    lead = np.array(lead_times, dtype=np.float64)
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * std * np.sqrt(lead)
+    reorder_point = mean * lead + safety
+    order_up_to = mean * (lead + review_days) + safety
+    available = np.maximum(quantity - expired_units, 0)
+    needed = ((available <= reorder_point) & (mean > 0)) | (available == 0)
+    order = np.where(needed, np.maximum(np.ceil(order_up_to - available), 1), 0)
+    # Zero days left once out of stock, even for products that do not sell
+    days_left = np.divide(available, mean, out=np.where(available == 0, 0.0, np.inf), where=mean > 0)
+
+    columns = [values.tolist() for values in (mean, std, safety, reorder_point, available, order, days_left)]
+    return [{
+        'id': ids[i],
+        'product_code': codes[i],
+        'item_name': names[i],
+        'supplier': suppliers[i],
+        'lead_time_days': lead_times[i],
+        'quantity': int(quantity[i]),
+        'available': int(columns[4][i]),
+        'daily_demand': round(columns[0][i], 3),
+        'demand_std': round(columns[1][i], 3),
+        'safety_stock': math.ceil(columns[2][i]),
+        'reorder_point': math.ceil(columns[3][i]),
+        'order_quantity': int(columns[5][i]),
+        'days_of_stock': None if math.isinf(columns[6][i]) else round(columns[6][i], 1),
+    } for i in range(n)]
+
+
+def cached_plan(today, history_days=DEMAND_HISTORY_DAYS, service_level=SERVICE_LEVEL,
+                review_days=REVIEW_PERIOD_DAYS):
+    """replenishment_plan(), reused until the next sale or stock change."""
+    params = {'history_days': history_days, 'service_level': service_level, 'review_days': review_days}
+    return cached_result('replenishment', dict(params, day=today), lambda: replenishment_plan(today, **params))
+
+
+def reorder_list(today=None):
+    """Products at or below their reorder point, soonest to run out first."""
+    plan = cached_plan(today or shop_today())
+    due = [row for row in plan if row['order_quantity'] > 0]
+    return sorted(due, key=lambda row: (row['days_of_stock'] is None, row['days_of_stock'] or 0))
+
+
+@replenishment_bp.route('/plan', methods=['GET'])
+def replenishment_plan_route():
+    """
+    Route for the reorder plan: ?history_days=90&service_level=0.95&review_days=14,
+    &all=1 to include products that do not need ordering.
+    """
+    try:
+        today = shop_today()
+        params = {
+            'history_days': request.args.get('history_days', DEMAND_HISTORY_DAYS, type=int),
+            'service_level': request.args.get('service_level', SERVICE_LEVEL, type=float),
+            'review_days': request.args.get('review_days', REVIEW_PERIOD_DAYS, type=int),
+        }
+        plan = cached_plan(today, **params)
+        if request.args.get('all') != '1':
+            plan = [row for row in plan if row['order_quantity'] > 0]
+        return jsonify({'as_of': today.isoformat(), **params, 'products': plan}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@replenishment_bp.cli.command('add-columns')
+def add_replenishment_columns():
+    """Add party.lead_time_days and stock.party_id to existing databases."""
+    db.create_all()
+    inspector = inspect(db.engine)
+    party_columns = {column['name'] for column in inspector.get_columns('party')}
+    stock_columns = {column['name'] for column in inspector.get_columns('stock')}
+    with db.engine.begin() as conn:
+        if 'lead_time_days' not in party_columns:
+            conn.execute(text(f"ALTER TABLE party ADD COLUMN lead_time_days INTEGER NOT NULL "
+                              f"DEFAULT {DEFAULT_LEAD_TIME_DAYS}"))
+        if 'party_id' not in stock_columns:
+            conn.execute(text("ALTER TABLE stock ADD COLUMN party_id INTEGER NULL REFERENCES party(id)"))
+    print("Replenishment columns are in place.")
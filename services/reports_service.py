@@ -1,10 +1,13 @@
 # services/reports_service.py
 import calendar
-from flask import Blueprint, render_template
-from datetime import datetime
+import numpy as np
+from flask import Blueprint, render_template, request, jsonify
+from datetime import datetime, timedelta
 from extensions import db
-from services.billing_service import Billing
 from services.stock_service import Stock
+from services.rollup_service import DailySalesRollup, rollup_totals, month_bounds, year_bounds
+from services.cache_service import cached_result
+from services.time_service import shop_today
 
 reports_bp = Blueprint('reports', __name__)
 class Report(db.Model):
@@ -15,124 +18,285 @@ class Report(db.Model):
     profit = db.Column(db.Float, nullable=False)
 
 
+def period_totals(start=None, end=None):
+    """Rollup totals for start <= day < end, cached until bills or stock change."""
+    return cached_result('totals', {'start': start, 'end': end}, lambda: rollup_totals(start, end))
+
+
 # Monthly Sales Report
 @reports_bp.route('/monthly_sales')
 def monthly_sales_report():
-    month = datetime.now().month
-    year = datetime.now().year
-    bills = Billing.query.filter(
-        db.extract('month', Billing.timestamp) == month,
-        db.extract('year', Billing.timestamp) == year
-    ).all()
-
-    total_sales = sum([bill.total_price for bill in bills])
+    today = shop_today()
+    month, year = today.month, today.year
+    total_sales = period_totals(*month_bounds(year, month))['revenue']
 
     return render_template('monthly_sales_report.html', total_sales=total_sales, month=month, year=year)
 
 # Annual Sales Report
 @reports_bp.route('/annual_sales')
 def annual_sales_report():
-    year = datetime.now().year
-    bills = Billing.query.filter(db.extract('year', Billing.timestamp) == year).all()
-
-    total_sales = sum([bill.total_price for bill in bills])
+    year = shop_today().year
+    total_sales = period_totals(*year_bounds(year))['revenue']
 
     return render_template('annual_sales_report.html', total_sales=total_sales, year=year)
 
 # Profit Report
 @reports_bp.route('/monthly_profit')
 def monthly_profit_report():
-    month = datetime.now().month
-    year = datetime.now().year
-    bills = Billing.query.filter(
-        db.extract('month', Billing.timestamp) == month,
-        db.extract('year', Billing.timestamp) == year
-    ).all()
-
-    profit = 0
-    for bill in bills:
-        stock_item = Stock.query.filter_by(product_code=bill.product_code).first()
-        if stock_item:
-            profit += (bill.total_price - stock_item.price * bill.quantity)
-
-    
-    # Monthly Profit Calculation
-    monthly_profit = 0
-    for bill in bills:
-        stock_item = Stock.query.filter_by(product_code=bill.product_code).first()
-        if stock_item:
-            monthly_profit += (bill.total_price - stock_item.price * bill.quantity)
-
-    return render_template('monthly_profit_report.html', profit=profit,monthly_profit=monthly_profit, month=month, year=year)
+    today = shop_today()
+    month, year = today.month, today.year
+
+    # Profit as recorded on each bill line when it was sold
+    monthly_profit = period_totals(*month_bounds(year, month))['profit']
+    return render_template('monthly_profit_report.html', profit=monthly_profit, monthly_profit=monthly_profit,
+                           month=month, year=year)
 
 @reports_bp.route('/profit')
 def profit_report():
-    month = datetime.now().month
-    year = datetime.now().year
-    bills = Billing.query.filter(
-        db.extract('month', Billing.timestamp) == month,
-        db.extract('year', Billing.timestamp) == year
-    ).all()
-    
-    profit = 0
-    for bill in bills:
-        stock_item = Stock.query.filter_by(product_code=bill.product_code).first()
-        if stock_item:
-            profit += (bill.total_price - stock_item.price * bill.quantity)
+    today = shop_today()
+    month, year = today.month, today.year
+    profit = period_totals(*month_bounds(year, month))['profit']
 
     return render_template('profit_report.html', profit=profit, month=month, year=year)
 
 @reports_bp.route('/all_sales')
 def all_sales_report():
     # Get current month and year
-    month = datetime.now().month
-    year = datetime.now().year
+    today = shop_today()
+    month, year = today.month, today.year
 
     # Convert month number to month name
     month_name = calendar.month_name[month]  # e.g., "January", "February", etc.
-    
-    # Monthly Sales Calculation
-    monthly_bills = Billing.query.filter(
-        db.extract('month', Billing.timestamp) == month,
-        db.extract('year', Billing.timestamp) == year
-    ).all()
-
-    total_sales_monthly = sum([bill.total_price for bill in monthly_bills])
-
-    # Annual Sales Calculation
-    annual_bills = Billing.query.filter(db.extract('year', Billing.timestamp) == year).all()
-    total_sales_annual = sum([bill.total_price for bill in annual_bills])
-
-    # Monthly Profit Calculation
-    monthly_profit = 0
-    for bill in monthly_bills:
-        stock_item = Stock.query.filter_by(product_code=bill.product_code).first()
-        if stock_item:
-            monthly_profit += (bill.total_price - stock_item.price * bill.quantity)
-
-    # Total Profit Calculation (for all time)
-    total_profit = 0
-    all_bills = Billing.query.all()
-    for bill in all_bills:
-        stock_item = Stock.query.filter_by(product_code=bill.product_code).first()
-        if stock_item:
-            total_profit += (bill.total_price - stock_item.price * bill.quantity)
-
-    # Total Sales from Billing (without filter)
-    total_sales_billing = sum([bill.total_price for bill in Billing.query.all()])
+
+    # Monthly, annual and all-time figures, computed together and cached as one result
+    totals = cached_result('all_sales', {'year': year, 'month': month}, lambda: {
+        'monthly': rollup_totals(*month_bounds(year, month)),
+        'annual': rollup_totals(*year_bounds(year)),
+        'all_time': rollup_totals(),
+    })
+    monthly, all_time = totals['monthly'], totals['all_time']
+    total_sales_annual = totals['annual']['revenue']
 
     return render_template(
         'reports.html',
         month=month_name,  # Passing the month name
         year=year,
-        total_sales_monthly=total_sales_monthly,
+        total_sales_monthly=monthly['revenue'],
         total_sales_annual=total_sales_annual,
-        profit=monthly_profit,  # Monthly Profit
-        total_sales_billing=total_sales_billing,
-        total_profit=total_profit  # Total Profit
+        profit=monthly['profit'],  # Monthly Profit
+        total_sales_billing=all_time['revenue'],
+        total_profit=all_time['profit']  # Total Profit
     )
 
 @reports_bp.route('/total_sales')
 def total_sales_report():
-    total_sales = sum([bill.total_price for bill in Billing.query.all()])
-    return render_template('total_sales_report.html', total_sales=total_sales)
\ No newline at end of file
+    total_sales = period_totals()['revenue']
+    return render_template('total_sales_report.html', total_sales=total_sales)
+
+
+REPORT_GROUPS = ('day', 'week', 'month')
+
+
+def _period(day, group):
+    # Label of the day/week/month bucket a day falls in; weeks start on Monday
+    if group == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if group == 'month':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+
+def sales_report(start, end, group='day', by_product=False):
+    """
+    Quantity, revenue, cost and profit for start <= day <= end, bucketed by
+    day, week or month and optionally split by product.
+
+    Runs a single GROUP BY over the daily sales rollup; the per-day rows are
+    then folded into weeks or months, so the query count never depends on
+    the range. Profit is the profit stored on each line when it was sold.
+    """
+    if group not in REPORT_GROUPS:
+        raise ValueError(f"group must be one of {', '.join(REPORT_GROUPS)}")
+
+    columns = [DailySalesRollup.day]
+    if by_product:
+        columns += [DailySalesRollup.product_code, Stock.item_name]
+    query = db.session.query(
+        *columns,
+        db.func.sum(DailySalesRollup.quantity), db.func.sum(DailySalesRollup.revenue),
+        db.func.sum(DailySalesRollup.cost), db.func.sum(DailySalesRollup.profit)
+    ).filter(DailySalesRollup.day >= start, DailySalesRollup.day < end + timedelta(days=1))
+    if by_product:
+        query = query.outerjoin(Stock, Stock.product_code == DailySalesRollup.product_code)
+    query = query.group_by(*columns)
+
+    buckets = {}
+    for row in query:
+        day, sums = row[0], row[-4:]
+        key = (_period(day, group),) + tuple(row[1:-4])
+        bucket = buckets.setdefault(key, [0, 0.0, 0.0, 0.0])
+        for i, value in enumerate(sums):
+            bucket[i] += value or 0
+
+    rows = []
+    for key in sorted(buckets):
+        quantity, revenue, cost, profit = buckets[key]
+        row = {'period': key[0]}
+        if by_product:
+            row['product_code'], row['product_name'] = key[1], key[2] or 'Unknown Product'
+        row.update(quantity=quantity, revenue=revenue, cost=cost, profit=profit)
+        rows.append(row)
+
+    totals = {name: sum(row[name] for row in rows) for name in ('quantity', 'revenue', 'cost', 'profit')}
+    return {'from': start.isoformat(), 'to': end.isoformat(), 'group': group,
+            'by_product': by_product, 'rows': rows, 'totals': totals}
+
+
+@reports_bp.route('/sales')
+def sales_report_route():
+    """
+    Route for a sales report over any range: ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    (inclusive, default this month so far), &group=day|week|month and
+    &by=product to split each period by product.
+    """
+    try:
+        today = shop_today()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() \
+            if request.args.get('from') else today.replace(day=1)
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() \
+            if request.args.get('to') else today
+        if end < start:
+            return jsonify({"error": "'to' must not be before 'from'"}), 400
+        group = request.args.get('group', 'day')
+        by_product = request.args.get('by') == 'product'
+        report = cached_result('sales', {'from': start, 'to': end, 'group': group, 'by_product': by_product},
+                               lambda: sales_report(start, end, group=group, by_product=by_product))
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+ABC_MEASURES = ('revenue', 'profit')
+
+
+def _abc_classes(values, a_share, b_share):
+    """
+    Rank products by `values` (largest first) and class them A/B/C by
+    cumulative share. A product is in A while the products ranked above it
+    hold less than `a_share` of the total, so the one crossing the cut-off
+    still counts as A. Products contributing nothing (or a loss) are C.
+    """
+    positive = np.clip(values, 0, None)
+    order = np.argsort(-positive, kind='stable')
+    total = positive.sum()
+    cumulative = np.cumsum(positive[order])
+    shares = cumulative / total if total > 0 else np.zeros_like(cumulative)
+    # Share of the products ranked above, from their own sum so a product
+    # sitting exactly on a cut-off is not pushed below it by rounding
+    above = np.concatenate(([0.0], cumulative[:-1]))
+    before = above / total if total > 0 else np.zeros_like(cumulative)
+
+    ranked = np.where(before < a_share, 'A', np.where(before < b_share, 'B', 'C'))
+    ranked[positive[order] <= 0] = 'C'
+
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(1, len(values) + 1)
+    share = np.empty(len(values))
+    share[order] = shares
+    classes = np.empty(len(values), dtype='<U1')
+    classes[order] = ranked
+    return order, rank, share, classes
+
+
+def abc_classification(start, end, by='revenue', a_share=0.8, b_share=0.95):
+    """
+    Class every product in the catalog A/B/C by its revenue and profit over
+    start <= day <= end. Per-product sums come from one query over the daily
+    rollup (products that sold nothing are included as C); ranks, cumulative
+    shares and cut-offs are computed with NumPy. Rows are ordered by `by`.
+    """
+    if by not in ABC_MEASURES:
+        raise ValueError(f"by must be one of {', '.join(ABC_MEASURES)}")
+    if not 0 < a_share <= b_share <= 1:
+        raise ValueError("expected 0 < a <= b <= 1")
+
+    sold = db.session.query(
+        DailySalesRollup.product_code.label('product_code'),
+        db.func.sum(DailySalesRollup.quantity).label('quantity'),
+        db.func.sum(DailySalesRollup.revenue).label('revenue'),
+        db.func.sum(DailySalesRollup.profit).label('profit'),
+    ).filter(DailySalesRollup.day >= start, DailySalesRollup.day < end + timedelta(days=1)) \
+     .group_by(DailySalesRollup.product_code).subquery()
+    rows = db.session.query(
+        Stock.product_code, Stock.item_name, sold.c.quantity, sold.c.revenue, sold.c.profit
+    ).outerjoin(sold, sold.c.product_code == Stock.product_code).all()
+
+    codes = [row[0] for row in rows]
+    names = [row[1] for row in rows]
+    figures = np.array([row[2:] for row in rows], dtype=np.float64).reshape(len(rows), 3)
+    figures = np.nan_to_num(figures)  # NULL sums of products without sales
+    quantity, revenue, profit = figures.T
+
+    classified = {measure: _abc_classes(values, a_share, b_share)
+                  for measure, values in (('revenue', revenue), ('profit', profit))}
+    order = classified[by][0]
+
+    # Plain lists for the row loop; indexing NumPy arrays per element is slow
+    quantities, revenues, profits = quantity.astype(np.int64).tolist(), revenue.tolist(), profit.tolist()
+    columns = {measure: (rank.tolist(), share.round(4).tolist(), classes.tolist())
+               for measure, (_, rank, share, classes) in classified.items()}
+    revenue_rank, revenue_share, revenue_class = columns['revenue']
+    profit_rank, profit_share, profit_class = columns['profit']
+    products = [{
+        'product_code': codes[i],
+        'product_name': names[i],
+        'quantity': quantities[i],
+        'revenue': round(revenues[i], 2),
+        'profit': round(profits[i], 2),
+        'revenue_rank': revenue_rank[i],
+        'revenue_cumulative_share': revenue_share[i],
+        'revenue_class': revenue_class[i],
+        'profit_rank': profit_rank[i],
+        'profit_cumulative_share': profit_share[i],
+        'profit_class': profit_class[i],
+    } for i in order.tolist()]
+
+    summary = {}
+    for measure, values in (('revenue', revenue), ('profit', profit)):
+        classes = classified[measure][3]
+        summary[measure] = {
+            label: {'products': int((classes == label).sum()),
+                    measure: round(float(values[classes == label].sum()), 2)}
+            for label in 'ABC'
+        }
+    return {'from': start.isoformat(), 'to': end.isoformat(), 'by': by,
+            'cutoffs': {'A': a_share, 'B': b_share}, 'summary': summary, 'products': products}
+
+
+@reports_bp.route('/abc')
+def abc_report_route():
+    """
+    Route for the ABC (Pareto) classification of every product:
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default the last 90 days),
+    &by=revenue|profit for the ordering and &a=0.8&b=0.95 for the cut-offs.
+    """
+    try:
+        today = shop_today()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() \
+            if request.args.get('from') else today - timedelta(days=89)
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() \
+            if request.args.get('to') else today
+        if end < start:
+            return jsonify({"error": "'to' must not be before 'from'"}), 400
+        by = request.args.get('by', 'revenue')
+        a_share = request.args.get('a', 0.8, type=float)
+        b_share = request.args.get('b', 0.95, type=float)
+        report = cached_result('abc', {'from': start, 'to': end, 'by': by, 'a': a_share, 'b': b_share},
+                               lambda: abc_classification(start, end, by, a_share, b_share))
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,181 @@
+# services/rollup_service.py
+from datetime import date
+from flask import Blueprint, jsonify
+from sqlalchemy import func, insert, update, bindparam
+from extensions import db
+from services.time_service import sale_day, period_dates
+
+rollup_bp = Blueprint('rollup', __name__, cli_group='rollup')
+
+
+class DailySalesRollup(db.Model):
+    """Sales totals per day and product, kept in step with the bill tables."""
+    __tablename__ = 'daily_sales_rollup'
+    day = db.Column(db.Date, primary_key=True)
+    product_code = db.Column(db.String(50), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    cost = db.Column(db.Float, nullable=False, default=0.0)
+    profit = db.Column(db.Float, nullable=False, default=0.0)
+    unpaid_revenue = db.Column(db.Float, nullable=False, default=0.0)  # Revenue of bills still unpaid
+    bill_lines = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _is_unpaid(status):
+    return (status or '').lower() == 'unpaid'
+
+
+def _apply(deltas):
+    # Add the deltas to existing rows with one executemany UPDATE and insert
+    # the rest. Callers (checkout, import, bill deletes and status changes)
+    # hold the stock locks of the products involved, so two of them cannot
+    # race to insert the same row. Removing a bill whose rows were never
+    # rolled up (bills migrated without a rebuild) leaves negative rows
+    # until `flask rollup rebuild`.
+    if not deltas:
+        return
+    days = {day for day, _ in deltas}
+    codes = {code for _, code in deltas}
+    existing = set(db.session.query(DailySalesRollup.day, DailySalesRollup.product_code)
+                   .filter(DailySalesRollup.day.in_(days), DailySalesRollup.product_code.in_(codes)))
+
+    new_rows = [dict(values, day=day, product_code=code)
+                for (day, code), values in deltas.items() if (day, code) not in existing]
+    changed = [dict(values, d=day, c=code)
+               for (day, code), values in deltas.items() if (day, code) in existing]
+    if new_rows:
+        db.session.execute(insert(DailySalesRollup), new_rows)
+    if changed:
+        table = DailySalesRollup.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.day == bindparam('d'), table.c.product_code == bindparam('c'))
+            .values({name: table.c[name] + bindparam(name)
+                     for name in ('quantity', 'revenue', 'cost', 'profit', 'unpaid_revenue', 'bill_lines')}),
+            changed
+        )
+
+
+def _add_line(deltas, line, status, sign=1):
+    key = (sale_day(line['timestamp']), line['product_code'])
+    values = deltas.setdefault(key, {'quantity': 0, 'revenue': 0.0, 'cost': 0.0, 'profit': 0.0,
+                                     'unpaid_revenue': 0.0, 'bill_lines': 0})
+    values['quantity'] += sign * line['quantity']
+    values['revenue'] += sign * line['total_price']
+    values['cost'] += sign * (line['total_price'] - line['total_profit'])
+    values['profit'] += sign * line['total_profit']
+    if _is_unpaid(status):
+        values['unpaid_revenue'] += sign * line['total_price']
+    values['bill_lines'] += sign
+
+
+def record_sales(bills):
+    """
+    Add bills to the rollup inside the caller's transaction. `bills` is an
+    iterable of (status, lines) where each line is a dict with timestamp,
+    product_code, quantity, total_price and total_profit.
+    """
+    deltas = {}
+    for status, lines in bills:
+        for line in lines:
+            _add_line(deltas, line, status)
+    _apply(deltas)
+
+
+def remove_sales(status, lines):
+    """Take a deleted bill's lines back out of the rollup (caller commits)."""
+    deltas = {}
+    for line in lines:
+        _add_line(deltas, line, status, sign=-1)
+    _apply(deltas)
+
+
+def change_status(old_status, new_status, lines):
+    """Move a bill's revenue in or out of unpaid_revenue (caller commits)."""
+    if _is_unpaid(old_status) == _is_unpaid(new_status):
+        return
+    sign = 1 if _is_unpaid(new_status) else -1
+    deltas = {}
+    for line in lines:
+        key = (sale_day(line['timestamp']), line['product_code'])
+        values = deltas.setdefault(key, {'quantity': 0, 'revenue': 0.0, 'cost': 0.0, 'profit': 0.0,
+                                         'unpaid_revenue': 0.0, 'bill_lines': 0})
+        values['unpaid_revenue'] += sign * line['total_price']
+    _apply(deltas)
+
+
+def clear_rollup():
+    """Empty the rollup, e.g. when every bill is deleted (caller commits)."""
+    DailySalesRollup.query.delete()
+
+
+def rebuild_rollup(chunk_size=10000):
+    """Recompute the whole rollup from the bill lines in one transaction."""
+    from services.billing_service import BillHeader, BillLine
+
+    deltas = {}
+    rows = db.session.execute(
+        db.select(BillLine.timestamp, BillLine.product_code, BillLine.quantity,
+                  BillLine.total_price, BillLine.total_profit, BillHeader.status)
+        .join(BillHeader, BillLine.header_id == BillHeader.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for timestamp, product_code, quantity, total_price, total_profit, status in rows:
+        _add_line(deltas, {'timestamp': timestamp, 'product_code': product_code, 'quantity': quantity,
+                           'total_price': total_price or 0, 'total_profit': total_profit or 0}, status)
+
+    try:
+        clear_rollup()
+        new_rows = [dict(values, day=day, product_code=code) for (day, code), values in deltas.items()]
+        for start in range(0, len(new_rows), chunk_size):
+            db.session.execute(insert(DailySalesRollup), new_rows[start:start + chunk_size])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(new_rows)
+
+
+def rollup_totals(start=None, end=None, product_code=None):
+    """
+    Sum the rollup over days with start <= day < end (either bound optional).
+    Returns a dict of quantity, revenue, cost, profit and unpaid_revenue.
+    """
+    query = db.session.query(
+        func.sum(DailySalesRollup.quantity), func.sum(DailySalesRollup.revenue),
+        func.sum(DailySalesRollup.cost), func.sum(DailySalesRollup.profit),
+        func.sum(DailySalesRollup.unpaid_revenue))
+    if start is not None:
+        query = query.filter(DailySalesRollup.day >= start)
+    if end is not None:
+        query = query.filter(DailySalesRollup.day < end)
+    if product_code is not None:
+        query = query.filter(DailySalesRollup.product_code == product_code)
+    quantity, revenue, cost, profit, unpaid = query.one()
+    return {'quantity': quantity or 0, 'revenue': revenue or 0, 'cost': cost or 0,
+            'profit': profit or 0, 'unpaid_revenue': unpaid or 0}
+
+
+def month_bounds(year, month):
+    """First day of the month and first day of the next one."""
+    return period_dates('month', date(year, month, 1))
+
+
+def year_bounds(year):
+    return period_dates('year', date(year, 1, 1))
+
+
+@rollup_bp.route('/rebuild', methods=['POST'])
+def rebuild_rollup_route():
+    """Route to recompute the daily sales rollup from all bills."""
+    try:
+        return jsonify({'rows': rebuild_rollup()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@rollup_bp.cli.command('rebuild')
+def rebuild_rollup_command():
+    """Recompute the daily sales rollup from all historical bills."""
+    db.create_all()
+    print(f"Daily sales rollup rebuilt with {rebuild_rollup()} rows.")
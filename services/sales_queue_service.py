@@ -0,0 +1,290 @@
+# services/sales_queue_service.py
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from uuid import uuid4
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy.exc import IntegrityError, OperationalError
+from extensions import db
+from services.stock_service import Stock
+from services.billing_service import BillHeader, CheckoutError, checkout
+from services.cache_service import data_changed
+
+sales_queue_bp = Blueprint('sales_queue', __name__)
+
+
+class SalesQueue:
+    """
+    Local SQLite write-ahead queue for checkouts in desktop mode.
+
+    A sale is committed to a WAL-mode SQLite file next to the app and priced
+    from a local copy of the stock catalog, so the till never waits for the
+    MySQL server. A background worker (see start_sync_worker) replays queued
+    bills to MySQL and refreshes the catalog copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS queued_bill (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_ref TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending, synced or conflict
+                bill_id TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                synced_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_queued_bill_status ON queued_bill (status, id);
+            CREATE TABLE IF NOT EXISTS stock_cache (
+                product_code TEXT PRIMARY KEY,
+                item_name TEXT NOT NULL,
+                selling_price REAL NOT NULL,
+                price REAL NOT NULL,
+                quantity INTEGER NOT NULL
+            );
+        ''')
+
+    def enqueue(self, customer_name, customer_mobile, status, cart):
+        """
+        Record a checkout locally. Raises CheckoutError like checkout() does;
+        returns the local reference and one dict per line for the receipt.
+        """
+        wanted = {}
+        for product_code, quantity in cart:
+            try:
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                raise CheckoutError(f'Invalid quantity for product {product_code}')
+            if quantity <= 0:
+                raise CheckoutError(f'Invalid quantity for product {product_code}')
+            wanted[product_code] = wanted.get(product_code, 0) + quantity
+        if not wanted:
+            raise CheckoutError('No products in the bill')
+
+        client_ref = str(uuid4())
+        timestamp = datetime.utcnow()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                products = {row['product_code']: row for row in self._conn.execute(
+                    f"SELECT * FROM stock_cache WHERE product_code IN ({','.join('?' * len(wanted))})",
+                    list(wanted))}
+                for product_code, quantity in wanted.items():
+                    product = products.get(product_code)
+                    if not product:
+                        raise CheckoutError(f'Product {product_code} not found', 404)
+                    if product['quantity'] < quantity:
+                        raise CheckoutError(f'Not enough stock available for product {product_code}')
+
+                self._conn.executemany(
+                    'UPDATE stock_cache SET quantity = quantity - ? WHERE product_code = ?',
+                    [(quantity, product_code) for product_code, quantity in wanted.items()])
+                self._conn.execute(
+                    'INSERT INTO queued_bill (client_ref, payload, created_at) VALUES (?, ?, ?)',
+                    (client_ref, json.dumps({
+                        'customer_name': customer_name,
+                        'customer_mobile': customer_mobile,
+                        'status': status,
+                        'cart': list(wanted.items()),
+                        'timestamp': timestamp.isoformat(),
+                    }), timestamp.isoformat()))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        self.wakeup.set()
+
+        lines = [{
+            'bill_id': f'Q-{client_ref[:8]}',  # Replaced by the real bill number once synced
+            'customer_name': customer_name,
+            'customer_mobile': customer_mobile,
+            'status': status,
+            'timestamp': timestamp,
+            'product_code': product_code,
+            'quantity': quantity,
+            'total_price': products[product_code]['selling_price'] * quantity,
+            'total_profit': (products[product_code]['selling_price'] - products[product_code]['price']) * quantity,
+        } for product_code, quantity in wanted.items()]
+        return client_ref, lines
+
+    def pending(self, limit):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM queued_bill WHERE status = 'pending' ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+
+    def mark(self, entry_id, status, bill_id=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE queued_bill SET status = ?, bill_id = ?, error = ?, synced_at = ? WHERE id = ?',
+                (status, bill_id, error, datetime.utcnow().isoformat(), entry_id))
+
+    def retry(self, entry_id):
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE queued_bill SET status = 'pending', error = NULL WHERE id = ? AND status = 'conflict'",
+                (entry_id,)).rowcount
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM queued_bill GROUP BY status').fetchall())
+            conflicts = [dict(row) for row in self._conn.execute(
+                "SELECT id, client_ref, payload, error, created_at FROM queued_bill "
+                "WHERE status = 'conflict' ORDER BY id")]
+        for conflict in conflicts:
+            conflict['payload'] = json.loads(conflict['payload'])
+        return {'counts': counts, 'conflicts': conflicts}
+
+    def on_data_changed(self, sender, scopes):
+        # Stock changed on this server; sync now rather than on the next tick
+        if 'stock' in scopes:
+            self.wakeup.set()
+
+    def refresh_stock(self, products):
+        """Replace the catalog copy, keeping back units held by bills not yet synced."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                held = {}
+                for row in self._conn.execute("SELECT payload FROM queued_bill WHERE status = 'pending'"):
+                    for product_code, quantity in json.loads(row['payload'])['cart']:
+                        held[product_code] = held.get(product_code, 0) + quantity
+                self._conn.execute('DELETE FROM stock_cache')
+                self._conn.executemany(
+                    'INSERT INTO stock_cache VALUES (?, ?, ?, ?, ?)',
+                    [(code, name, selling_price, price, quantity - held.get(code, 0))
+                     for code, name, selling_price, price, quantity in products])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+
+def sync_pending(queue, batch_size=50):
+    """
+    Replay a batch of queued bills to the server database.
+
+    Replays are idempotent: a bill whose client_ref is already on the server
+    is only marked synced. Bills the server rejects (a stock shortfall or an
+    unknown product) or that break another constraint are marked as
+    conflicts for someone to resolve; a lost connection leaves the rest of
+    the batch pending for the next run.
+    Returns the number of bills handled.
+    """
+    entries = queue.pending(batch_size)
+    if entries:
+        done = dict(db.session.query(BillHeader.client_ref, BillHeader.bill_id)
+                    .filter(BillHeader.client_ref.in_([entry['client_ref'] for entry in entries])))
+        for entry in entries:
+            if entry['client_ref'] in done:
+                queue.mark(entry['id'], 'synced', bill_id=done[entry['client_ref']])
+                continue
+
+            payload = json.loads(entry['payload'])
+            try:
+                bill_id, _ = checkout(payload['customer_name'], payload['customer_mobile'],
+                                      payload['status'], payload['cart'],
+                                      timestamp=datetime.fromisoformat(payload['timestamp']),
+                                      client_ref=entry['client_ref'])
+            except CheckoutError as e:
+                if e.status == 409:
+                    break  # Stock moved underneath us; try again next run
+                queue.mark(entry['id'], 'conflict', error=e.message)
+                continue
+            except IntegrityError as e:
+                # Applied by an earlier run that died before marking it
+                bill_id = db.session.query(BillHeader.bill_id) \
+                    .filter_by(client_ref=entry['client_ref']).scalar()
+                if bill_id is None:
+                    # Some other constraint (a bill_id collision, say); park the
+                    # bill so it does not hold up the rest of the queue
+                    queue.mark(entry['id'], 'conflict', error=str(e.orig))
+                    continue
+            queue.mark(entry['id'], 'synced', bill_id=bill_id)
+
+    queue.refresh_stock(server_catalog())
+    return len(entries)
+
+
+def server_catalog():
+    """(product_code, item_name, selling_price, price, quantity) of every product on the server."""
+    return db.session.query(
+        Stock.product_code, Stock.item_name, Stock.selling_price, Stock.price, Stock.quantity).all()
+
+
+def start_sync_worker(app, interval=30, batch_size=50):
+    """Start a daemon thread that drains the app's sales queue to the server."""
+    queue = app.extensions['sales_queue']
+
+    def run():
+        while True:
+            try:
+                with app.app_context():
+                    # Keep draining while there are full batches waiting
+                    while sync_pending(queue, batch_size) == batch_size:
+                        pass
+            except OperationalError as e:
+                app.logger.warning("Sales queue sync paused, database unreachable: %s", e)
+            except Exception:
+                app.logger.exception("Sales queue sync failed")
+            queue.wakeup.wait(interval)
+            queue.wakeup.clear()
+            time.sleep(1)  # Let a burst of sales collect into one batch
+
+    worker = threading.Thread(target=run, name='sales-queue-sync', daemon=True)
+    worker.start()
+    return worker
+
+
+def init_sales_queue(app, path):
+    """
+    Attach a local sales queue to the app; create_bill then checks out
+    through it. The stock copy is refreshed from the server before the first
+    sale, or kept as the last run saved it when the server is unreachable,
+    and the queue syncs as soon as stock changes on this server.
+    """
+    queue = SalesQueue(path)
+    try:
+        with app.app_context():
+            queue.refresh_stock(server_catalog())
+    except OperationalError as e:
+        app.logger.warning("Sales queue using its saved stock copy, database unreachable: %s", e)
+    data_changed.connect(queue.on_data_changed, sender=app)
+    app.config['LOCAL_SALES_QUEUE'] = path
+    app.extensions['sales_queue'] = queue
+    return queue
+
+
+def get_sales_queue():
+    """The app's local sales queue, or None when checkouts go straight to the server."""
+    return current_app.extensions.get('sales_queue')
+
+
+@sales_queue_bp.route('/', methods=['GET'])
+def queue_status():
+    """Route to show queued bill counts and the conflicts waiting to be resolved."""
+    queue = get_sales_queue()
+    if not queue:
+        return jsonify({"error": "The local sales queue is not enabled"}), 404
+    return jsonify(queue.summary()), 200
+
+
+@sales_queue_bp.route('/retry/<int:entry_id>', methods=['POST'])
+def retry_conflict(entry_id):
+    """Route to put a conflicting bill back in the queue, e.g. after a restock."""
+    queue = get_sales_queue()
+    if not queue or not queue.retry(entry_id):
+        return jsonify(success=False, message="Queued bill not found"), 404
+    queue.wakeup.set()
+    return jsonify(success=True), 200
@@ -0,0 +1,87 @@
+# services/sequence_service.py
+import os
+import threading
+from flask import current_app
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+
+
+class BillSequence(db.Model):
+    """Next free bill number for each (year, month)."""
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+
+class BillNumberAllocator:
+    """
+    Hands out bill numbers from blocks reserved in the bill_sequence table.
+
+    Each process reserves a block of numbers with one atomic UPDATE and then
+    serves them from memory, so a bill number costs a database round trip only
+    once per block. Blocks never overlap, which keeps numbers unique across
+    gunicorn workers; numbers left in a block when a worker exits are skipped.
+    """
+
+    def __init__(self, seed=None, block_size=None):
+        # seed(conn, year, month) returns the last number already used in a
+        # month that has no sequence row yet
+        self.seed = seed
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._pid = os.getpid()
+
+    def next(self, year, month):
+        """Return the next bill number for the given month."""
+        return self.take(year, month, 1)[0]
+
+    def take(self, year, month, count):
+        """
+        Return `count` bill numbers for the given month, in increasing order.
+        Numbers left in the current block are used first; the rest come from
+        a single reservation of at least that many.
+        """
+        with self._lock:
+            # A forked worker must not reuse the block its parent reserved
+            if self._pid != os.getpid():
+                self._blocks = {}
+                self._pid = os.getpid()
+
+            start, end = self._blocks.get((year, month), (0, 0))
+            numbers = list(range(start, min(end, start + count)))
+            start += len(numbers)
+            missing = count - len(numbers)
+            if missing > 0:
+                size = max(missing, self.block_size or current_app.config.get('BILL_SEQUENCE_BLOCK', 20))
+                start, end = self._reserve(year, month, size)
+                numbers.extend(range(start, start + missing))
+                start += missing
+            self._blocks[(year, month)] = (start, end)
+            return numbers
+
+    def _reserve(self, year, month, size):
+        while True:
+            try:
+                # Runs on its own connection so the row lock is held only for
+                # this short transaction, not for the whole checkout
+                with db.engine.begin() as conn:
+                    reserved = conn.execute(
+                        update(BillSequence)
+                        .where(BillSequence.year == year, BillSequence.month == month)
+                        .values(next_value=BillSequence.next_value + size)
+                    ).rowcount
+                    if reserved:
+                        end = conn.execute(
+                            select(BillSequence.next_value)
+                            .where(BillSequence.year == year, BillSequence.month == month)
+                        ).scalar_one()
+                    else:
+                        last = self.seed(conn, year, month) if self.seed else 0
+                        end = last + 1 + size
+                        conn.execute(insert(BillSequence).values(year=year, month=month, next_value=end))
+                return end - size, end
+            except IntegrityError:
+                # Another worker created the month's row first; reserve from it
+                continue
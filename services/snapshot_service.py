@@ -0,0 +1,159 @@
+# services/snapshot_service.py
+import json
+import os
+import threading
+import time
+import click
+import numpy as np
+from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy import select
+from extensions import db
+from services.billing_service import BillLine
+from services.line_watermark import LineWatermark
+
+snapshot_bp = Blueprint('snapshot', __name__)
+
+# Column files of the sales snapshot and their on-disk dtypes
+SNAPSHOT_COLUMNS = {
+    'line_id': np.int64,     # bill_line.id; mostly ascending, late commits come after higher ids
+    'product': np.int32,     # index into meta['codes']
+    'quantity': np.float64,
+    'price': np.float64,     # line total price
+    'profit': np.float64,    # line total profit
+    'timestamp': np.int64,   # epoch seconds, UTC
+}
+
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_dir():
+    """Directory holding the sales snapshot (SALES_SNAPSHOT_DIR or instance/sales_snapshot)."""
+    return current_app.config.get('SALES_SNAPSHOT_DIR') or \
+        os.path.join(current_app.instance_path, 'sales_snapshot')
+
+
+def read_meta(path):
+    """Read the snapshot's meta.json; an empty snapshot if there is none yet."""
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'rows': 0, 'last_id': 0, 'codes': [], 'recent': [], 'marks': []}
+
+
+def _write_meta(path, meta):
+    # Written last and atomically: rows beyond meta['rows'] are never visible
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def load_snapshot(path):
+    """
+    Open the snapshot as read-only memory-mapped arrays.
+
+    Returns (columns, codes): a dict of column name -> array and the list of
+    product codes that the `product` column indexes into.
+    """
+    meta = read_meta(path)
+    columns = {}
+    for name, dtype in SNAPSHOT_COLUMNS.items():
+        if meta['rows']:
+            columns[name] = np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype,
+                                      mode='r', shape=(meta['rows'],))
+        else:
+            columns[name] = np.empty(0, dtype=dtype)
+    return columns, meta['codes']
+
+
+def update_snapshot(path, rebuild=False, chunk_size=50000):
+    """
+    Append bill lines added since the last update to the snapshot.
+
+    Lines committed out of id order are still picked up (see LineWatermark;
+    meta['last_id'] is its settled id). Lines of bills deleted after they
+    were snapshotted stay in the files until the snapshot is rebuilt.
+    """
+    with _snapshot_lock:
+        os.makedirs(path, exist_ok=True)
+        meta = {'rows': 0, 'last_id': 0, 'codes': []} if rebuild else read_meta(path)
+        watermark = LineWatermark(meta['last_id'], meta.get('recent', ()), meta.get('marks', ()))
+
+        # Drop anything an interrupted update wrote past the recorded row count
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            with open(os.path.join(path, f'{name}.bin'), 'ab') as f:
+                f.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+
+        code_index = {code: i for i, code in enumerate(meta['codes'])}
+        appended = 0
+        started = time.time()
+        rows = db.session.execute(
+            select(BillLine.id, BillLine.product_code, BillLine.quantity,
+                   BillLine.total_price, BillLine.total_profit, BillLine.timestamp)
+            .where(BillLine.id > watermark.settled)
+            .order_by(BillLine.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for chunk in rows.partitions():
+            keep = watermark.fresh([row[0] for row in chunk])
+            chunk = [row for row, fresh in zip(chunk, keep.tolist()) if fresh]
+            if not chunk:
+                continue
+            line_ids, codes, quantities, prices, profits, timestamps = zip(*chunk)
+            for code in codes:
+                if code not in code_index:
+                    code_index[code] = len(meta['codes'])
+                    meta['codes'].append(code)
+
+            arrays = {
+                'line_id': np.array(line_ids, dtype=np.int64),
+                'product': np.array([code_index[code] for code in codes], dtype=np.int32),
+                'quantity': np.array(quantities, dtype=np.float64),
+                'price': np.array(prices, dtype=np.float64),
+                'profit': np.array(profits, dtype=np.float64),
+                # Timestamps are stored as naive UTC
+                'timestamp': np.array(timestamps, dtype='datetime64[s]').astype(np.int64),
+            }
+            for name, values in arrays.items():
+                with open(os.path.join(path, f'{name}.bin'), 'ab') as f:
+                    values.tofile(f)
+
+            meta['rows'] += len(chunk)
+            watermark.record(line_ids, started)
+            meta.update(watermark.state())
+            appended += len(chunk)
+            _write_meta(path, meta)
+
+        watermark.record((), started)
+        meta.update(watermark.state())
+        _write_meta(path, meta)
+        return {'rows': meta['rows'], 'appended': appended, 'last_id': meta['last_id'],
+                'products': len(meta['codes'])}
+
+
+@snapshot_bp.route('/sales', methods=['GET'])
+def sales_snapshot_info():
+    """Route to report the size and watermark of the sales snapshot."""
+    meta = read_meta(snapshot_dir())
+    return jsonify({'rows': meta['rows'], 'last_id': meta['last_id'],
+                    'products': len(meta['codes'])}), 200
+
+
+@snapshot_bp.route('/sales', methods=['POST'])
+def refresh_sales_snapshot():
+    """Route to append new bill lines to the sales snapshot (?rebuild=1 starts over)."""
+    try:
+        result = update_snapshot(snapshot_dir(), rebuild=request.args.get('rebuild') == '1')
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@snapshot_bp.cli.command('build')
+@click.option('--rebuild', is_flag=True, help='Rewrite the snapshot from scratch.')
+def build_sales_snapshot(rebuild):
+    """Append new bill lines to the columnar sales snapshot."""
+    path = snapshot_dir()
+    result = update_snapshot(path, rebuild=rebuild)
+    print(f"Sales snapshot at {path}: {result['rows']} rows ({result['appended']} appended).")
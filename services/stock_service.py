@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash
-from datetime import datetime
+from datetime import datetime, date
+from sqlalchemy import func, select, update, insert
 from extensions import db
+from services.time_service import shop_today
+from services.live_service import publish_stock
 
 stock_bp = Blueprint('stock', __name__)
 
@@ -12,6 +15,7 @@ class Stock(db.Model):
     price = db.Column(db.Float, nullable=False)
     expiry = db.Column(db.String(10), nullable=False)  # Keep as string
     quantity = db.Column(db.Integer, nullable=False)
+    party_id = db.Column(db.Integer, db.ForeignKey('party.id'), nullable=True)  # Supplier
 
     def to_dict(self):
         """Convert stock to a dictionary with formatted expiry date."""
@@ -28,6 +32,98 @@ class Stock(db.Model):
     def __repr__(self):
         return f'<Stock {self.product_code} - {self.item_name}>'
 
+
+class StockLot(db.Model):
+    """
+    One delivery of a product with its own expiry and cost. The quantities of
+    a product's lots add up to Stock.quantity, and Stock.expiry mirrors the
+    earliest lot still holding units.
+    """
+    __tablename__ = 'stock_lot'
+    id = db.Column(db.Integer, primary_key=True)
+    product_code = db.Column(db.String(50), db.ForeignKey('stock.product_code'), nullable=False)
+    lot_no = db.Column(db.String(50), nullable=False)
+    expiry = db.Column(db.Date, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False, default=0)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # FEFO order within a product
+        db.Index('ix_stock_lot_product_expiry', 'product_code', 'expiry'),
+    )
+
+
+def parse_expiry(value):
+    """An expiry given as a date or a 'YYYY-MM-DD' string."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def add_lot(product_code, quantity, expiry, unit_cost, lot_no=None):
+    """Record a delivery as a new lot (the caller updates Stock.quantity and commits)."""
+    db.session.execute(insert(StockLot).values(
+        product_code=product_code,
+        lot_no=lot_no or f"{product_code}-{datetime.utcnow():%Y%m%d%H%M%S}",
+        expiry=parse_expiry(expiry),
+        quantity=quantity,
+        unit_cost=unit_cost,
+    ))
+
+
+def allocate_fefo(wanted):
+    """
+    Take {product_code: quantity} out of the products' lots, earliest expiry
+    first, with one UPDATE. A running total over each product's lots decides
+    how much every lot gives up. The caller must hold the Stock row locks.
+    """
+    if not wanted:
+        return
+    needed = db.case(wanted, value=StockLot.product_code)
+    taken_before = func.coalesce(func.sum(StockLot.quantity).over(
+        partition_by=StockLot.product_code,
+        order_by=(StockLot.expiry, StockLot.id),
+        rows=(None, -1),
+    ), 0)
+    remaining = needed - taken_before
+    take = db.case(
+        (remaining >= StockLot.quantity, StockLot.quantity),
+        (remaining > 0, remaining),
+        else_=0,
+    )
+    allocation = select(StockLot.id.label('id'), take.label('take')) \
+        .where(StockLot.product_code.in_(wanted), StockLot.quantity > 0).subquery()
+    db.session.execute(
+        update(StockLot)
+        .where(StockLot.id == allocation.c.id, allocation.c.take > 0)
+        .values(quantity=StockLot.quantity - allocation.c.take)
+        .execution_options(synchronize_session=False)
+    )
+    sync_stock_expiry(wanted)
+
+
+def sync_stock_expiry(product_codes):
+    """Point Stock.expiry at each product's earliest lot that still has units."""
+    earliest = select(func.min(StockLot.expiry)).where(
+        StockLot.product_code == Stock.product_code, StockLot.quantity > 0
+    ).scalar_subquery()
+    db.session.execute(
+        update(Stock)
+        .where(Stock.product_code.in_(list(product_codes)))
+        .values(expiry=func.coalesce(earliest, Stock.expiry))
+        .execution_options(synchronize_session=False)
+    )
+
+# Supplier choice on the add and edit stock forms
+def suppliers():
+    """Parties to pick a product's supplier from, by name."""
+    from services.party_service import Party  # party_service imports this module
+    return Party.query.order_by(Party.party_name).all()
+
+
+def parse_party_id(value):
+    """Supplier id from a form field, None when left empty."""
+    return int(value) if value else None
+
 # Utility function to generate product code based on item name
 def generate_product_code(item_name):
     """Generate a unique product code based on item name."""
@@ -35,13 +131,52 @@ def generate_product_code(item_name):
 
 from datetime import datetime, timedelta
 
+
+def expiring_stock(until):
+    """
+    (item_name, earliest expiry) of products with units in a lot expiring on
+    or before `until`; an index range scan over stock_lot.expiry.
+    """
+    return db.session.query(Stock.item_name, func.min(StockLot.expiry).label('expiry')) \
+        .join(StockLot, StockLot.product_code == Stock.product_code) \
+        .filter(StockLot.expiry <= until, StockLot.quantity > 0) \
+        .group_by(Stock.product_code, Stock.item_name) \
+        .order_by(func.min(StockLot.expiry)).all()
+
+
+def upcoming_expiry(today):
+    """SELECT of (item_name, expiry) for the first live lot expiring after `today`."""
+    return select(Stock.item_name, StockLot.expiry) \
+        .join(StockLot, StockLot.product_code == Stock.product_code) \
+        .where(StockLot.expiry > today, StockLot.quantity > 0) \
+        .order_by(StockLot.expiry).limit(1)
+
+
+def expiry_valuation(today, days=30):
+    """Units, lots and cost value already expired and expiring within `days`, in one query."""
+    expired = StockLot.expiry < today
+    value = StockLot.quantity * StockLot.unit_cost
+    row = db.session.query(
+        func.count(db.case((expired, StockLot.id))),
+        func.sum(db.case((expired, StockLot.quantity), else_=0)),
+        func.sum(db.case((expired, value), else_=0)),
+        func.count(db.case((~expired, StockLot.id))),
+        func.sum(db.case((~expired, StockLot.quantity), else_=0)),
+        func.sum(db.case((~expired, value), else_=0)),
+    ).filter(StockLot.expiry < today + timedelta(days=days), StockLot.quantity > 0).one()
+    return {
+        'expired': {'lots': row[0], 'units': row[1] or 0, 'value': round(row[2] or 0, 2)},
+        'near_expiry': {'lots': row[3], 'units': row[4] or 0, 'value': round(row[5] or 0, 2), 'days': days},
+    }
+
+
 def get_near_to_expiry_stock(days=30):
-    """Fetch stock items expiring within the given number of days."""
-    today = datetime.today()
-    threshold_date = today + timedelta(days=days)
-    return Stock.query.filter(
-        datetime.strptime(Stock.expiry, '%Y-%m-%d') <= threshold_date
-    ).all()
+    """Fetch stock items with a lot expiring within the given number of days."""
+    threshold_date = shop_today() + timedelta(days=days)
+    codes = select(StockLot.product_code).where(
+        StockLot.expiry <= threshold_date, StockLot.quantity > 0
+    ).distinct()
+    return Stock.query.filter(Stock.product_code.in_(codes)).all()
 
 @stock_bp.route('/overview', methods=['GET'])
 def stock_overview():
@@ -72,6 +207,7 @@ def add_stock():
         price = float(request.form['price'])
         expiry = request.form['expiry']
         quantity = int(request.form['quantity'])
+        party_id = parse_party_id(request.form.get('party_id'))
 
         product_code = generate_product_code(item_name)
 
@@ -81,15 +217,19 @@ def add_stock():
             selling_price=selling_price,
             price=price,
             expiry=expiry,
-            quantity=quantity
+            quantity=quantity,
+            party_id=party_id
         )
 
         db.session.add(new_stock)
+        if quantity > 0:
+            add_lot(product_code, quantity, expiry, price)
         db.session.commit()
+        publish_stock('added', product_code, item_name, quantity)
 
         return redirect(url_for('stock.view_stock'))
 
-    return render_template('add_stock.html')
+    return render_template('add_stock.html', suppliers=suppliers())
 
 # Route to view all stock
 @stock_bp.route('/view')
@@ -102,12 +242,15 @@ def view_stock():
 @stock_bp.route('/sell/<product_code>', methods=['POST'])
 def sell_product(product_code):
     """Route to handle selling of stock items."""
-    stock_item = Stock.query.filter_by(product_code=product_code).first()
+    stock_item = Stock.query.filter_by(product_code=product_code).with_for_update().first()
     if stock_item:
         quantity_sold = int(request.form['quantity_sold'])
         if stock_item.quantity >= quantity_sold:
             stock_item.quantity -= quantity_sold
+            item_name, left = stock_item.item_name, stock_item.quantity
+            allocate_fefo({product_code: quantity_sold})
             db.session.commit()
+            publish_stock('updated', product_code, item_name, left)
             return redirect(url_for('stock.view_stock'))
         return 'Not enough stock available', 400  # Handle insufficient stock
     return 'Product not found', 404
@@ -135,12 +278,8 @@ def view():
 @stock_bp.route('/expired-items', methods=['GET'])
 def expired_items():
     try:
-        current_date = datetime.utcnow()
-
-        # Query for expired items
-        expired_products = db.session.query(
-            Stock.item_name, Stock.expiry
-        ).filter(Stock.expiry <= current_date).all()
+        # Products with units in an expired lot
+        expired_products = expiring_stock(shop_today())
 
         if expired_products:
             expired_list = [
@@ -159,7 +298,7 @@ def expired_items():
 @stock_bp.route('/edit/<product_code>', methods=['GET', 'POST'])
 def edit_stock(product_code):
     """Route to edit stock items using product_code."""
-    stock_item = Stock.query.filter_by(product_code=product_code).first()
+    stock_item = Stock.query.filter_by(product_code=product_code).with_for_update().first()
 
     if not stock_item:
         return "Product not found", 404
@@ -170,13 +309,24 @@ def edit_stock(product_code):
         stock_item.selling_price = float(request.form['selling_price'])
         stock_item.price = float(request.form['price'])
         stock_item.expiry = request.form['expiry']
-        stock_item.quantity = int(request.form['quantity'])
+        stock_item.party_id = parse_party_id(request.form.get('party_id'))
+        quantity = int(request.form['quantity'])
+
+        # A higher count is a delivery with the entered expiry; a lower one is
+        # taken out of the lots earliest expiry first
+        if quantity > stock_item.quantity:
+            add_lot(product_code, quantity - stock_item.quantity, stock_item.expiry, stock_item.price)
+            sync_stock_expiry([product_code])
+        elif quantity < stock_item.quantity:
+            allocate_fefo({product_code: stock_item.quantity - quantity})
+        stock_item.quantity = quantity
 
         db.session.commit()
+        publish_stock('updated', product_code, request.form['item_name'], int(request.form['quantity']))
         return redirect(url_for('stock.view_stock'))
 
     # Render the edit form with the current stock details
-    return render_template('edit_stock.html', stock=stock_item)
+    return render_template('edit_stock.html', stock=stock_item, suppliers=suppliers())
 
 @stock_bp.route("/delete-stock/<product_code>", methods=["GET"])
 def delete_stock(product_code):
@@ -189,9 +339,11 @@ def delete_stock(product_code):
             flash("Stock item not found.", "danger")
             return redirect(url_for("view_stock"))
 
-        # Delete the stock item from the database
+        # Delete the stock item and its lots from the database
+        StockLot.query.filter_by(product_code=product_code).delete()
         db.session.delete(stock_item)
         db.session.commit()
+        publish_stock('deleted', product_code)
 
         # Flash a success message
         flash("Stock item successfully deleted.", "success")
@@ -201,4 +353,48 @@ def delete_stock(product_code):
         flash(f"An error occurred while deleting the stock item: {str(e)}", "danger")
 
     # Redirect to the stock overview page
-    return redirect(url_for("view_stock"))
\ No newline at end of file
+    return redirect(url_for("view_stock"))
+
+
+@stock_bp.route('/expiry', methods=['GET'])
+def expiry_overview():
+    """Route for expired and near-expiry lots with their value at cost (?days=30)."""
+    try:
+        today = shop_today()
+        days = request.args.get('days', 30, type=int)
+        lots = db.session.query(StockLot, Stock.item_name) \
+            .join(Stock, Stock.product_code == StockLot.product_code) \
+            .filter(StockLot.expiry < today + timedelta(days=days), StockLot.quantity > 0) \
+            .order_by(StockLot.expiry).limit(request.args.get('limit', 100, type=int)).all()
+
+        overview = expiry_valuation(today, days)
+        overview['lots'] = [{
+            'product_code': lot.product_code,
+            'item_name': item_name,
+            'lot_no': lot.lot_no,
+            'expiry': lot.expiry.isoformat(),
+            'quantity': lot.quantity,
+            'value': round(lot.quantity * lot.unit_cost, 2),
+            'expired': lot.expiry < today,
+        } for lot, item_name in lots]
+        return jsonify(overview), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@stock_bp.cli.command('seed-lots')
+def seed_stock_lots():
+    """Give every product without lots one lot holding its current quantity."""
+    db.create_all()
+    with_lots = select(StockLot.product_code).distinct()
+    created = 0
+    for product in Stock.query.filter(Stock.quantity > 0, Stock.product_code.not_in(with_lots)).all():
+        try:
+            expiry = parse_expiry(product.expiry)
+        except ValueError:
+            print(f"Skipping {product.product_code}: unreadable expiry {product.expiry!r}")
+            continue
+        add_lot(product.product_code, product.quantity, expiry, product.price, lot_no=f'{product.product_code}-OPENING')
+        created += 1
+    db.session.commit()
+    print(f"Created opening lots for {created} products.")
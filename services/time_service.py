@@ -0,0 +1,105 @@
+# services/time_service.py
+# Time windows in the shop's timezone. Bill timestamps are stored as naive
+# UTC; every "today" / "this month" filter should be a half-open range
+#   timestamp >= start AND timestamp < end
+# built here, so the timestamp indexes can be used.
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+from flask import current_app, has_app_context
+
+DEFAULT_SHOP_TIMEZONE = 'Asia/Kolkata'
+PERIODS = ('day', 'week', 'month', 'year')
+
+
+def shop_timezone():
+    """The shop's timezone (SHOP_TIMEZONE config, an IANA name)."""
+    name = current_app.config.get('SHOP_TIMEZONE') if has_app_context() else None
+    return ZoneInfo(name or DEFAULT_SHOP_TIMEZONE)
+
+
+def shop_now():
+    return datetime.now(shop_timezone())
+
+
+def shop_today():
+    """Today's date in the shop."""
+    return shop_now().date()
+
+
+def to_shop_time(timestamp):
+    """A stored naive-UTC timestamp as an aware datetime in the shop's timezone."""
+    return timestamp.replace(tzinfo=timezone.utc).astimezone(shop_timezone())
+
+
+def to_utc(local_timestamp):
+    """A naive wall-clock time in the shop as naive UTC, the way timestamps are stored."""
+    aware = local_timestamp.replace(tzinfo=shop_timezone())
+    return aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def sale_day(timestamp):
+    """The shop-local business day a stored timestamp falls on."""
+    return to_shop_time(timestamp).date()
+
+
+def shop_days(timestamps):
+    """
+    sale_day() of many stored timestamps at once, as days since 1970-01-01
+    (int32 array). The zone's UTC offset is looked up at both ends of each
+    distinct UTC day, and per quarter hour (which every offset change falls
+    on) only on days where the two differ.
+    """
+    seconds = np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+    if not len(seconds):
+        return np.empty(0, dtype=np.int32)
+    zone = shop_timezone()
+
+    def offsets(instants):
+        return np.array([datetime.fromtimestamp(instant, zone).utcoffset().total_seconds()
+                         for instant in instants.tolist()], dtype=np.int64)
+
+    days, inverse = np.unique(seconds // 86400, return_inverse=True)
+    first, last = offsets(days * 86400), offsets(days * 86400 + 86399)
+    offset = first[inverse]
+    changing = (first != last)[inverse]
+    if changing.any():
+        quarters, quarter_inverse = np.unique(seconds[changing] // 900, return_inverse=True)
+        offset[changing] = offsets(quarters * 900)[quarter_inverse]
+    return ((seconds + offset) // 86400).astype(np.int32)
+
+
+def period_dates(period, day=None):
+    """
+    First day of the day/week/month/year containing `day` (default today)
+    and the first day after it, as dates: start <= d < end.
+    """
+    day = day or shop_today()
+    if period == 'day':
+        start = day
+        return start, start + timedelta(days=1)
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == 'month':
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    if period == 'year':
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+    raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+
+def day_start(day):
+    """Naive-UTC timestamp of midnight at the start of a shop-local date."""
+    return to_utc(datetime.combine(day, time.min))
+
+
+def date_range(start, end):
+    """Naive-UTC bounds for shop-local dates start <= d < end."""
+    return day_start(start), day_start(end)
+
+
+def time_window(period, day=None):
+    """Naive-UTC [start, end) timestamp bounds of the shop's current day/week/month/year."""
+    return date_range(*period_dates(period, day))
+
@@ -0,0 +1,81 @@
+# tests/conftest.py
+# An app with the service blueprints on a SQLite file per test. app.py is
+# not imported: it pulls in the desktop window and basic auth packages,
+# which the services themselves do not need.
+import os
+import sys
+import pytest
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extensions import db
+from services import billing_service
+from services.stock_service import stock_bp, Stock, add_lot
+from services.billing_service import billing_bp
+from services.party_service import party_bp
+from services.customer_service import customer_bp
+from services.bill_import_service import bill_import_bp
+from services.sales_queue_service import sales_queue_bp
+from services.reports_service import reports_bp
+from services.rollup_service import rollup_bp
+from services.cache_service import cache_bp
+from services.replenishment_service import replenishment_bp
+from services.dashboard_service import dashboard_bp
+from services.sequence_service import BillNumberAllocator
+import services.snapshot_service  # noqa: F401  (models)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__, root_path=ROOT, instance_path=str(tmp_path / 'instance'))
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'shop.db'}",
+        SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30, 'check_same_thread': False}},
+        SHOP_TIMEZONE='Asia/Kolkata',
+        BILL_SEQUENCE_BLOCK=20,
+        RECEIPT_PRERENDER=False,
+    )
+    db.init_app(app)
+    app.register_blueprint(stock_bp, url_prefix='/stock')
+    app.register_blueprint(billing_bp, url_prefix='/billing')
+    app.register_blueprint(party_bp, url_prefix='/party')
+    app.register_blueprint(customer_bp, url_prefix='/customers')
+    app.register_blueprint(bill_import_bp, url_prefix='/billing/import')
+    app.register_blueprint(sales_queue_bp, url_prefix='/sales-queue')
+    app.register_blueprint(reports_bp, url_prefix='/reports')
+    app.register_blueprint(rollup_bp, url_prefix='/rollup')
+    app.register_blueprint(cache_bp, url_prefix='/cache')
+    app.register_blueprint(replenishment_bp, url_prefix='/replenishment')
+    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
+
+    # Bill numbers reserved against an earlier test's database must not carry over
+    monkeypatch.setattr(billing_service, 'bill_numbers',
+                        BillNumberAllocator(seed=billing_service._last_bill_number))
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_stock(app):
+    """Add a product with one lot; returns its product code."""
+    def make(code, quantity, selling_price=10.0, price=6.0, expiry='2030-01-01', name=None, party_id=None):
+        db.session.add(Stock(product_code=code, item_name=name or f'Item {code}', selling_price=selling_price,
+                             price=price, expiry=expiry, quantity=quantity, party_id=party_id))
+        if quantity > 0:
+            add_lot(code, quantity, expiry, price, lot_no=f'{code}-1')
+        db.session.commit()
+        return code
+    return make
@@ -0,0 +1,45 @@
+# tests/test_abc.py
+from datetime import date
+import numpy as np
+from extensions import db
+from services.rollup_service import DailySalesRollup
+from services.reports_service import _abc_classes, abc_classification
+
+
+def test_cutoffs_keep_the_product_crossing_them():
+    _, rank, share, classes = _abc_classes(np.array([15.0, 50, 0, 30, -3, 5]), 0.8, 0.95)
+    assert classes.tolist() == ['B', 'A', 'C', 'A', 'C', 'C']
+    assert rank.tolist() == [3, 1, 5, 2, 6, 4]
+    assert share.round(2).tolist() == [0.95, 0.5, 1.0, 0.8, 1.0, 1.0]
+
+
+def test_nothing_sold_is_all_c():
+    _, _, share, classes = _abc_classes(np.zeros(3), 0.8, 0.95)
+    assert classes.tolist() == ['C', 'C', 'C']
+    assert share.tolist() == [0, 0, 0]
+
+
+def test_classification_over_the_rollup(make_stock, client):
+    for code in 'ABCD':
+        make_stock(code, 10)
+    day = date(2026, 3, 5)
+    db.session.add_all([
+        DailySalesRollup(day=day, product_code='A', quantity=1, revenue=70, cost=60, profit=10, bill_lines=1),
+        DailySalesRollup(day=day, product_code='B', quantity=2, revenue=20, cost=0, profit=20, bill_lines=1),
+        DailySalesRollup(day=date(2026, 3, 6), product_code='C', quantity=3, revenue=10, cost=5, profit=5,
+                         bill_lines=1),
+        # Outside the window
+        DailySalesRollup(day=date(2026, 3, 7), product_code='D', quantity=9, revenue=500, cost=0, profit=500,
+                         bill_lines=1),
+    ])
+    db.session.commit()
+
+    report = abc_classification(day, date(2026, 3, 6))
+    assert [(row['product_code'], row['revenue_class'], row['profit_class']) for row in report['products']] == \
+        [('A', 'A', 'A'), ('B', 'A', 'A'), ('C', 'B', 'B'), ('D', 'C', 'C')]
+    assert report['summary']['revenue']['A'] == {'products': 2, 'revenue': 90.0}
+
+    by_profit = client.get('/reports/abc?from=2026-03-05&to=2026-03-06&by=profit').json
+    assert [row['product_code'] for row in by_profit['products']] == ['B', 'A', 'C', 'D']
+    assert client.get('/reports/abc?by=quantity').status_code == 400
+    assert client.get('/reports/abc?a=0.9&b=0.5').status_code == 400
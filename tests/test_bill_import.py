@@ -0,0 +1,100 @@
+# tests/test_bill_import.py
+import io
+from datetime import date, datetime
+from extensions import db
+from services.stock_service import Stock
+from services.billing_service import BillHeader, BillLine
+from services.rollup_service import DailySalesRollup
+from services.bill_import_service import import_bills
+
+
+def row(**fields):
+    return dict({'customer_name': 'Asha', 'customer_mobile': '9876543210', 'product_code': 'A',
+                 'quantity': '1'}, **fields)
+
+
+def test_rows_sharing_a_bill_ref_form_one_bill(make_stock):
+    make_stock('A', 10, selling_price=5, price=3)
+    make_stock('B', 10, selling_price=8, price=2)
+
+    summary = import_bills([
+        row(bill_ref='x', quantity='2', timestamp='2026-03-05 10:00', status='paid'),
+        row(bill_ref='x', product_code='B', total_price='7.5'),
+        row(timestamp='2026-03-05 23:30'),
+    ])
+
+    assert summary == {'bills': 2, 'lines': 3, 'errors': [], 'dry_run': False}
+    bills = {bill.line_count: bill for bill in BillHeader.query}
+    assert bills[2].status == 'Paid' and bills[2].total_price == 17.5
+    # Import times are shop-local (Asia/Kolkata) and stored as UTC
+    assert bills[2].timestamp == datetime(2026, 3, 5, 4, 30)
+    assert bills[1].timestamp == datetime(2026, 3, 5, 18, 0)
+    assert BillLine.query.count() == 3
+    assert dict(db.session.query(Stock.product_code, Stock.quantity)) == {'A': 7, 'B': 9}
+    assert db.session.query(db.func.sum(DailySalesRollup.quantity)) \
+        .filter(DailySalesRollup.day == date(2026, 3, 5)).scalar() == 4
+
+
+def test_invalid_rows_reject_their_whole_bill(make_stock):
+    make_stock('A', 3)
+
+    summary = import_bills([
+        row(bill_ref='x'),
+        row(bill_ref='x', quantity='-1'),
+        row(customer_mobile=''),
+        row(product_code='NOPE'),
+        row(status='Maybe'),
+        row(quantity='5'),
+        row(quantity='2'),
+    ])
+
+    assert summary['bills'] == 1
+    assert summary['errors'] == [
+        {'row': 1, 'error': 'Bill rejected because of another row'},
+        {'row': 2, 'error': 'quantity must be a positive whole number'},
+        {'row': 3, 'error': 'customer_name and customer_mobile are required'},
+        {'row': 4, 'error': 'Product NOPE not found'},
+        {'row': 5, 'error': 'status must be Paid or Unpaid'},
+        {'row': 6, 'error': 'Not enough stock available for product A'},
+    ]
+    assert BillHeader.query.count() == 1
+    assert db.session.query(Stock.quantity).scalar() == 1
+
+
+def test_fractional_quantities_are_rejected_not_truncated(client, make_stock):
+    make_stock('A', 10)
+    rows = [row(quantity=2.7), row(quantity='2.7'), row(quantity='two'), row(quantity=2.0), row(quantity=3)]
+    summary = client.post('/billing/import/', json=rows).json
+    assert summary['errors'] == [
+        {'row': row_number, 'error': 'quantity must be a positive whole number'} for row_number in (1, 2, 3)]
+    assert summary['bills'] == 2
+    assert db.session.query(Stock.quantity).scalar() == 5
+
+
+def test_stock_is_shared_between_bills_in_file_order(make_stock):
+    make_stock('A', 3)
+    summary = import_bills([row(quantity='2'), row(quantity='2'), row(quantity='1')])
+    assert summary['bills'] == 2
+    assert [error['row'] for error in summary['errors']] == [2]
+
+
+def test_dry_run_writes_nothing(make_stock):
+    make_stock('A', 3)
+    summary = import_bills([row(), row(quantity='9')], dry_run=True)
+    assert summary['bills'] == 1 and summary['dry_run'] is True
+    assert BillHeader.query.count() == 0
+    assert db.session.query(Stock.quantity).scalar() == 3
+
+
+def test_csv_upload(client, make_stock):
+    make_stock('A', 3)
+    csv = 'customer_name,customer_mobile,product_code,quantity\nAsha,9876543210,A,2\n'
+    response = client.post('/billing/import/', data={'file': (io.BytesIO(csv.encode()), 'bills.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.json['bills'] == 1
+
+
+def test_body_must_be_a_list(client):
+    response = client.post('/billing/import/', json={'rows': []})
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+# tests/test_bill_listing.py
+import html
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from extensions import db
+from services.billing_service import checkout
+
+
+def pages(client, url):
+    """Bill ids of every page, following the Next page links."""
+    seen = []
+    while url:
+        page = client.get(url).get_data(as_text=True)
+        seen.append(re.findall(r'data-bill-id="([^"]+)"', page))
+        link = re.search(r'<a href="([^"]+)" class="btn btn-outline-primary btn-sm">Next page', page)
+        url = html.unescape(link.group(1)) if link else None
+    return seen
+
+
+def test_pages_walk_ties_on_timestamp_once(client, make_stock):
+    make_stock('A', 50)
+    noon = datetime(2026, 3, 5, 12, 0)
+    bills = [checkout('Asha', '9876543210', 'Paid', [('A', 1)], timestamp=noon)[0] for _ in range(5)]
+    older = checkout('Ravi', '9123456780', 'Paid', [('A', 1)], timestamp=noon - timedelta(hours=1))[0]
+    newer = checkout('Ravi', '9123456780', 'Paid', [('A', 1)], timestamp=noon + timedelta(hours=1))[0]
+
+    seen = pages(client, '/billing/all?per_page=2')
+    assert [len(page) for page in seen] == [2, 2, 2, 1]
+    # Newest first, bills sharing a timestamp by bill id descending
+    assert sum(seen, []) == [newer] + sorted(bills, reverse=True) + [older]
+
+
+def test_pages_keep_the_customer_filter(client, make_stock):
+    make_stock('A', 50)
+    noon = datetime(2026, 3, 5, 12, 0)
+    asha = [checkout('Asha', '9876543210', 'Paid', [('A', 1)], timestamp=noon)[0] for _ in range(3)]
+    ravi = checkout('Ravi', '9123456780', 'Paid', [('A', 1)], timestamp=noon)[0]
+
+    seen = pages(client, '/billing/all?per_page=2&customer=As')
+    assert sum(seen, []) == sorted(asha, reverse=True)
+    assert sum(pages(client, '/billing/all?customer=91234'), []) == [ravi]
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get('/billing/all?after=yesterday').status_code == 400
+
+
+def test_customer_filter_has_name_and_mobile_indexes(app):
+    indexed = {tuple(index['column_names']) for index in inspect(db.engine).get_indexes('bill_header')}
+    assert ('customer_name',) in indexed
+    assert ('customer_mobile', 'status') in indexed
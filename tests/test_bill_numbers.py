@@ -0,0 +1,66 @@
+# tests/test_bill_numbers.py
+import threading
+from datetime import datetime
+from extensions import db
+from services import billing_service
+from services.billing_service import checkout, generate_bill_id, generate_bill_ids
+from services.sequence_service import BillSequence, BillNumberAllocator
+
+
+def test_numbers_follow_the_last_bill_of_the_month(make_stock, monkeypatch):
+    make_stock('A', 10)
+    when = datetime(2026, 3, 5, 10)
+    first = checkout('Asha', '9876543210', 'Paid', [('A', 1)], timestamp=when)[0]
+    assert first == '20260301'
+
+    # A fresh worker seeds from the bills already issued, not from 1
+    monkeypatch.setattr(billing_service, 'bill_numbers',
+                        BillNumberAllocator(seed=billing_service._last_bill_number))
+    db.session.query(BillSequence).delete()
+    db.session.commit()
+    assert generate_bill_id(when) == '20260302'
+
+
+def test_block_is_reserved_once(app):
+    app.config['BILL_SEQUENCE_BLOCK'] = 5
+    when = datetime(2026, 3, 5)
+    ids = [generate_bill_id(when) for _ in range(5)]
+    assert ids == [f'202603{n:02}' for n in range(1, 6)]
+    assert db.session.get(BillSequence, (2026, 3)).next_value == 6
+
+    assert generate_bill_id(when) == '20260306'
+    assert db.session.get(BillSequence, (2026, 3)).next_value == 11
+
+
+def test_batch_takes_one_reservation_per_month(app):
+    app.config['BILL_SEQUENCE_BLOCK'] = 2
+    stamps = [datetime(2026, 3, 1)] * 7 + [datetime(2026, 4, 1)] * 3 + [datetime(2026, 3, 2)]
+    ids = generate_bill_ids(stamps)
+
+    assert ids[:7] + ids[10:] == [f'202603{n:02}' for n in range(1, 9)]
+    assert ids[7:10] == ['20260401', '20260402', '20260403']
+    assert db.session.get(BillSequence, (2026, 3)).next_value == 9
+    assert db.session.get(BillSequence, (2026, 4)).next_value == 4
+
+
+def test_workers_never_share_a_number(app):
+    app.config['BILL_SEQUENCE_BLOCK'] = 3
+    issued, failed = [], []
+
+    def worker():
+        # Each worker process has an allocator of its own
+        allocator = BillNumberAllocator(seed=billing_service._last_bill_number)
+        with app.app_context():
+            try:
+                issued.extend(allocator.next(2026, 3) for _ in range(10))
+            except Exception as e:
+                failed.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not failed
+    assert len(issued) == 60 and len(set(issued)) == 60
@@ -0,0 +1,41 @@
+# tests/test_billing_stream.py
+import json
+from datetime import datetime, timezone
+from services.billing_service import checkout
+
+
+def stream(client, query=''):
+    response = client.get('/billing/billing-data/stream' + query)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_streams_one_object_per_line(client, make_stock):
+    make_stock('A', 10, selling_price=5, price=3, name='Tea')
+    make_stock('B', 10, selling_price=2, price=1, name='Salt')
+    bill_id, _ = checkout('Asha', '9876543210', 'Paid', [('A', 2), ('B', 1)],
+                          timestamp=datetime(2026, 3, 5, 10, 30))
+
+    lines = stream(client)
+    assert [(line['product_code'], line['product_name'], line['quantity'], line['total_price'])
+            for line in lines] == [('A', 'Tea', 2, 10), ('B', 'Salt', 1, 2)]
+    assert {line['bill_id'] for line in lines} == {bill_id}
+    assert lines[0]['timestamp'] == '2026-03-05T10:30:00Z'
+    assert lines[0]['epoch'] == int(datetime(2026, 3, 5, 10, 30, tzinfo=timezone.utc).timestamp())
+
+
+def test_since_id_and_since_return_only_newer_lines(client, make_stock):
+    make_stock('A', 10)
+    checkout('Asha', '9876543210', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 5, 10, 0))
+    checkout('Ravi', '9123456780', 'Unpaid', [('A', 2)], timestamp=datetime(2026, 3, 6, 10, 0))
+
+    first, second = stream(client)
+    assert stream(client, f"?since_id={first['id']}") == [second]
+    assert stream(client, f"?since={first['epoch']}") == [second]
+    assert stream(client, '?since=2026-03-05T12:00:00Z') == [second]
+    assert stream(client, f"?since_id={second['id']}") == []
+
+
+def test_bad_since_is_rejected(client):
+    assert client.get('/billing/billing-data/stream?since=soon').status_code == 400
@@ -0,0 +1,65 @@
+# tests/test_cache.py
+from datetime import datetime
+from extensions import db
+from services.stock_service import Stock
+from services.party_service import Party
+from services.billing_service import checkout
+from services.customer_service import Customer
+from services.cache_service import cached_result, data_versions
+
+
+def counting(report='report', params=None):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+    return lambda: cached_result(report, params or {}, compute), calls
+
+
+def test_results_are_reused_until_a_sale(make_stock):
+    make_stock('A', 10)
+    lookup, calls = counting()
+    assert lookup() == lookup() == 1
+
+    checkout('Asha', '9876543210', 'Paid', [('A', 1)])
+    assert lookup() == 2
+    assert len(calls) == 2
+
+
+def test_parameters_are_part_of_the_key(app):
+    first, _ = counting(params={'day': '2026-03-05'})
+    second, _ = counting(params={'day': '2026-03-06'})
+    assert (first(), second()) == (1, 1)
+    assert app.extensions['result_cache'].info()['entries'] == 2
+
+
+def test_writes_bump_their_scope_only_on_commit(make_stock):
+    make_stock('A', 10)
+    before = data_versions()
+
+    db.session.query(Stock).update({'quantity': 3})
+    db.session.rollback()
+    assert data_versions() == before
+
+    Stock.query.one().quantity = 3
+    db.session.commit()
+    sales, stock = data_versions()
+    assert (sales, stock) == (before[0], before[1] + 1)
+
+    db.session.add(Party('Acme', 'x', 'Pending', datetime(2026, 3, 5), lead_time_days=3))
+    db.session.commit()
+    assert data_versions() == (sales, stock + 1)
+
+    db.session.add(Customer(mobile='9876543210', name='Asha', name_key='asha'))
+    db.session.commit()
+    assert data_versions() == (sales, stock + 1)
+
+
+def test_clear_route(client, app):
+    lookup, calls = counting()
+    lookup()
+    assert client.post('/cache/clear').status_code == 200
+    lookup()
+    assert len(calls) == 2
+    assert client.get('/cache/stats').json['misses'] == 2
@@ -0,0 +1,77 @@
+# tests/test_checkout.py
+import threading
+import pytest
+from extensions import db
+from services.stock_service import Stock, StockLot
+from services.billing_service import BillHeader, BillLine, CheckoutError, checkout
+
+
+def quantity(code):
+    return db.session.query(Stock.quantity).filter_by(product_code=code).scalar()
+
+
+def test_checkout_writes_one_header_and_its_lines(make_stock):
+    make_stock('A', 10, selling_price=5, price=3)
+    make_stock('B', 4, selling_price=20, price=15)
+
+    bill_id, lines = checkout('Asha', '9876543210', 'Unpaid', [('A', 2), ('B', 1), ('A', 1)])
+
+    header = BillHeader.query.filter_by(bill_id=bill_id).one()
+    assert (header.line_count, header.total_price, header.total_profit) == (2, 35, 11)
+    assert {(line.product_code, line.quantity) for line in BillLine.query} == {('A', 3), ('B', 1)}
+    assert {line['product_code']: line['item_name'] for line in lines} == {'A': 'Item A', 'B': 'Item B'}
+    assert (quantity('A'), quantity('B')) == (7, 3)
+
+
+def test_oversell_is_rejected_without_touching_stock(make_stock):
+    make_stock('A', 10)
+    make_stock('B', 1)
+
+    with pytest.raises(CheckoutError) as error:
+        checkout('Asha', '9876543210', 'Paid', [('A', 2), ('B', 2)])
+
+    assert error.value.status == 400
+    assert (quantity('A'), quantity('B')) == (10, 1)
+    assert BillHeader.query.count() == 0
+
+
+@pytest.mark.parametrize('cart, status', [
+    ([], 400),
+    ([('A', 0)], 400),
+    ([('A', 'two')], 400),
+    ([('MISSING', 1)], 404),
+])
+def test_invalid_carts(make_stock, cart, status):
+    make_stock('A', 10)
+    with pytest.raises(CheckoutError) as error:
+        checkout('Asha', '9876543210', 'Paid', cart)
+    assert error.value.status == status
+
+
+def test_concurrent_checkouts_never_oversell(app, make_stock):
+    make_stock('A', 5)
+    sold, refused, failed = [], [], []
+
+    def till():
+        with app.app_context():
+            try:
+                sold.append(checkout('Asha', '9876543210', 'Paid', [('A', 1)])[0])
+            except CheckoutError as e:
+                refused.append(e.status)
+            except Exception as e:
+                failed.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=till) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not failed
+    assert len(sold) == 5 and len(set(sold)) == 5
+    assert len(refused) == 7 and set(refused) <= {400, 409}
+    db.session.expire_all()
+    assert quantity('A') == 0
+    assert db.session.query(db.func.sum(StockLot.quantity)).scalar() == 0
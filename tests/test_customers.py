@@ -0,0 +1,83 @@
+# tests/test_customers.py
+from datetime import datetime
+import pytest
+from extensions import db
+from services import customer_service
+from services.account_service import Account
+from services.billing_service import checkout
+from services.customer_service import Customer, CustomerIndex, remember_customers, search_customers
+
+
+def test_list_counts_unpaid_bills_in_any_case(client, make_stock):
+    # Imported and older bills carry the status as it was typed
+    make_stock('A', 20)
+    checkout('Asha', '9876543210', 'unpaid', [('A', 2)])
+    checkout('Asha', '9876543210', 'UNPAID', [('A', 1)])
+    checkout('Ravi', '9123456780', 'Paid', [('A', 1)])
+
+    page = client.get('/customers/list').get_data(as_text=True)
+    assert '<td>Asha</td>' in page and '<td>30.0</td>' in page
+    assert '<td>Ravi</td>' not in page
+
+
+def test_reminder_finds_lowercase_unpaid_bills(client, make_stock):
+    db.session.add(Account('owner', 'owner@example.com', '9000000000', 'secret', 'Shop'))
+    db.session.commit()
+    make_stock('A', 20)
+    checkout('Asha', '9876543210', 'unpaid', [('A', 2)])
+
+    client.get('/customers/send_reminder/Asha/9876543210')
+    with client.session_transaction() as session:
+        assert not session.get('_flashes')
+    client.get('/customers/send_reminder/Ravi/9123456780')
+    with client.session_transaction() as session:
+        assert session['_flashes'] == [('message', 'No unpaid bills found for Ravi.')]
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    index = CustomerIndex(refresh=0)
+    monkeypatch.setattr(customer_service, 'customer_index', index)
+    return index
+
+
+def test_checkout_remembers_the_latest_name_per_mobile(make_stock):
+    make_stock('A', 20)
+    checkout('Asha', '98765 43210', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 5))
+    checkout('Asha Kumar', '9876543210', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 6))
+    assert [(c.name, c.mobile, c.name_key) for c in Customer.query] == \
+        [('Asha Kumar', '9876543210', 'asha kumar')]
+
+
+def test_sql_search_matches_name_and_mobile_prefixes(app, client):
+    app.config['CUSTOMER_TYPEAHEAD_INDEX'] = False
+    remember_customers([('Asha Kumar', '9876543210', datetime(2026, 3, 5)),
+                        ('Ravi', '9123456780', datetime(2026, 3, 5))])
+
+    assert client.get('/billing/search_customer?query=AS').json == \
+        [{'customer_name': 'Asha Kumar', 'customer_mobile': '9876543210'}]
+    assert search_customers('912') == [('Ravi', '9123456780')]
+    assert search_customers('  ') == []
+
+
+def test_index_matches_any_name_word_and_follows_renames(app, index):
+    remember_customers([('Asha Kumar', '9876543210', datetime(2026, 3, 5)),
+                        ('Kumar Ravi', '9123456780', datetime(2026, 3, 5))])
+    index.warm(app)
+    assert index.ready
+
+    assert sorted(search_customers('kum')) == [('Asha Kumar', '9876543210'), ('Kumar Ravi', '9123456780')]
+    assert search_customers('98765') == [('Asha Kumar', '9876543210')]
+    assert len(search_customers('kum', limit=1)) == 1
+
+    remember_customers([('Asha Rao', '9876543210', datetime(2026, 3, 6))])
+    assert search_customers('kum') == [('Kumar Ravi', '9123456780')]
+    assert search_customers('rao') == [('Asha Rao', '9876543210')]
+
+
+def test_index_picks_up_customers_written_by_other_processes(app, index):
+    index.warm(app)
+    # Written straight to the table, as another worker's checkout would
+    db.session.add(Customer(mobile='9000000000', name='Meera', name_key='meera'))
+    db.session.commit()
+    assert search_customers('mee') == [('Meera', '9000000000')]
@@ -0,0 +1,46 @@
+# tests/test_dashboard.py
+from datetime import datetime, timedelta
+from extensions import db
+from services.billing_service import checkout
+from services.rollup_service import DailySalesRollup
+from services.time_service import shop_today
+
+
+def rollup_sum(column, *conditions):
+    return round(db.session.query(db.func.sum(column)).filter(*conditions).scalar() or 0, 2)
+
+
+def test_summary_matches_the_rollup(client, make_stock):
+    make_stock('A', 50, selling_price=5, price=3, name='Tea')
+    make_stock('B', 3, selling_price=12, price=7, name='Soap', expiry='2027-01-01')
+    make_stock('C', 0, name='Rice')
+    now = datetime.utcnow()
+    checkout('Asha', '9876543210', 'Paid', [('A', 4), ('B', 1)], timestamp=now)
+    checkout('Ravi', '9123456780', 'Unpaid', [('A', 2)], timestamp=now)
+    checkout('Meera', '9000000000', 'Unpaid', [('B', 2)], timestamp=now - timedelta(days=3))
+
+    summary = client.get('/dashboard/summary').json
+    today = shop_today()
+    is_today = DailySalesRollup.day == today
+    assert summary['day'] == today.isoformat()
+    assert summary['stock_items'] == 3
+    assert summary['total_sales'] == rollup_sum(DailySalesRollup.revenue) == 66
+    assert summary['total_profit'] == rollup_sum(DailySalesRollup.profit)
+    assert summary['total_due'] == rollup_sum(DailySalesRollup.unpaid_revenue) == 34
+    assert summary['today_sales'] == rollup_sum(DailySalesRollup.revenue, is_today) == 42
+    assert summary['today_profit'] == rollup_sum(DailySalesRollup.profit, is_today) == 17
+    assert summary['top_products'] == [['Soap', 3, 36], ['Tea', 6, 30]]
+    # Soap's only lot sold out, so the next live lot to expire is Tea's
+    assert summary['next_expiry'] == ['Tea', '2030-01-01']
+
+    # Soap sold out and Rice never stocked are both below their reorder points
+    codes = [row[0] for row in summary['limited_stock']]
+    assert set(codes) == {'B', 'C'} and summary['limited_stock_count'] == 2
+    assert all(row[2] <= row[3] for row in summary['limited_stock'])
+
+
+def test_summary_updates_after_a_sale(client, make_stock):
+    make_stock('A', 10, selling_price=5, price=3)
+    assert client.get('/dashboard/summary').json['today_sales'] == 0
+    checkout('Asha', '9876543210', 'Paid', [('A', 1)])
+    assert client.get('/dashboard/summary').json['today_sales'] == 5
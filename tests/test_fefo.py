@@ -0,0 +1,67 @@
+# tests/test_fefo.py
+from datetime import date, timedelta
+from extensions import db
+from services.stock_service import Stock, StockLot, add_lot
+from services.billing_service import checkout
+from services.time_service import shop_today
+
+
+def lots(code):
+    return [(lot.expiry, lot.quantity) for lot in
+            StockLot.query.filter_by(product_code=code).order_by(StockLot.expiry, StockLot.id)]
+
+
+def test_sales_take_the_earliest_expiry_first(make_stock):
+    make_stock('A', 4, expiry='2026-06-01')
+    add_lot('A', 3, '2026-04-01', 6.0)
+    add_lot('A', 5, '2026-05-01', 6.0)
+    Stock.query.one().quantity = 12
+    db.session.commit()
+
+    checkout('Asha', '9876543210', 'Paid', [('A', 5)])
+    assert lots('A') == [(date(2026, 4, 1), 0), (date(2026, 5, 1), 3), (date(2026, 6, 1), 4)]
+    assert Stock.query.one().expiry == '2026-05-01'
+
+    checkout('Asha', '9876543210', 'Paid', [('A', 7)])
+    assert [quantity for _, quantity in lots('A')] == [0, 0, 0]
+    assert Stock.query.one().quantity == 0
+
+
+def test_allocation_is_per_product(make_stock):
+    make_stock('A', 2, expiry='2026-04-01')
+    make_stock('B', 2, expiry='2026-03-01')
+    checkout('Asha', '9876543210', 'Paid', [('A', 1), ('B', 2)])
+    assert lots('A') == [(date(2026, 4, 1), 1)]
+    assert lots('B') == [(date(2026, 3, 1), 0)]
+
+
+def test_editing_stock_adds_or_takes_lots(client, make_stock):
+    make_stock('A', 5, expiry='2026-05-01')
+    form = {'item_name': 'Item A', 'selling_price': '10', 'price': '6', 'expiry': '2026-04-01', 'party_id': ''}
+
+    assert client.post('/stock/edit/A', data=dict(form, quantity='8')).status_code == 302
+    assert lots('A') == [(date(2026, 4, 1), 3), (date(2026, 5, 1), 5)]
+
+    assert client.post('/stock/edit/A', data=dict(form, quantity='4')).status_code == 302
+    assert lots('A') == [(date(2026, 4, 1), 0), (date(2026, 5, 1), 4)]
+    assert Stock.query.one().expiry == '2026-05-01'
+
+
+def test_expiry_overview_values_expired_and_near_lots(client, make_stock):
+    today = shop_today()
+    make_stock('A', 4, price=2.5, expiry=(today - timedelta(days=1)).isoformat())
+    make_stock('B', 3, price=4.0, expiry=(today + timedelta(days=10)).isoformat())
+    make_stock('C', 6, expiry=(today + timedelta(days=60)).isoformat())
+    add_lot('B', 2, (today + timedelta(days=5)).isoformat(), 4.0)
+    # Sold-out lots are left out
+    add_lot('C', 0, today.isoformat(), 6.0)
+    db.session.commit()
+
+    overview = client.get('/stock/expiry?days=30').json
+    assert overview['expired'] == {'lots': 1, 'units': 4, 'value': 10}
+    assert overview['near_expiry'] == {'lots': 2, 'units': 5, 'value': 20, 'days': 30}
+    assert [(lot['product_code'], lot['quantity'], lot['expired']) for lot in overview['lots']] == \
+        [('A', 4, True), ('B', 2, False), ('B', 3, False)]
+
+    wider = client.get('/stock/expiry?days=90&limit=2').json
+    assert wider['near_expiry']['units'] == 11 and len(wider['lots']) == 2
@@ -0,0 +1,65 @@
+# tests/test_forecast.py
+import os
+import sys
+from datetime import date
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'predict'))
+
+from forecast import SmoothingState, forecast_demand
+from sales_engine import SalesData, day_number
+
+
+def fold(days, alpha=0.1, start=100):
+    state = SmoothingState(days.shape[1], alpha)
+    state.fold(days, start)
+    return state.rates(start + len(days))
+
+
+def test_steady_seller_uses_ses():
+    demand = np.zeros((6, 1))
+    demand[:, 0] = [4, 0, 2, 2, 2, 2]
+    rates, adi, methods = fold(demand, alpha=0.5)
+    # 4, then 4 + 0.5 * (0 - 4) = 2, then level stays at 2
+    assert methods.tolist() == ['ses']
+    assert rates[0] == pytest.approx(2)
+    assert adi[0] == pytest.approx(6 / 5)
+
+
+def test_intermittent_seller_uses_croston():
+    demand = np.zeros((12, 1))
+    demand[0::3, 0] = 6
+    rates, adi, methods = fold(demand)
+    # Six units every third day: size 6 over an interval of 3
+    assert methods.tolist() == ['croston']
+    assert adi[0] == pytest.approx(3)
+    assert rates[0] == pytest.approx(2)
+
+
+def test_single_sale_is_spread_and_unsold_is_none():
+    demand = np.zeros((12, 2))
+    demand[2, 0] = 5
+    rates, _, methods = fold(demand)
+    assert methods.tolist() == ['croston', 'none']
+    assert rates.tolist() == pytest.approx([0.5, 0])
+
+
+def test_rates_do_not_depend_on_the_window_start():
+    demand = np.zeros((30, 1))
+    demand[10::2, 0] = 3
+    padded = np.vstack([np.zeros((50, 1)), demand])
+    assert fold(demand)[0] == pytest.approx(fold(padded, start=50)[0])
+
+
+def test_forecast_demand_over_sales_lines():
+    today = date(2026, 3, 31)
+    end = day_number(today)
+    days = np.arange(end - 20, end, dtype=np.int32)
+    sales = SalesData(['A', 'B'], ['Tea', 'Soap'], np.zeros(len(days), dtype=np.int32), days,
+                      np.full(len(days), 3.0))
+    rows = forecast_demand(sales, today, history_days=60, horizons=(7,))
+    assert [(row['product_code'], row['method']) for row in rows] == [('A', 'ses'), ('B', 'none')]
+    assert rows[0]['forecast'] == {'7': 21.0}
+    assert rows[1]['forecast'] == {'7': 0.0}
+
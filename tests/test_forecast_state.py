@@ -0,0 +1,58 @@
+# tests/test_forecast_state.py
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'predict'))
+
+from forecast import SmoothingState
+from forecast_state import ForecastState
+from sales_engine import SalesData
+
+START, END = 1000, 1090
+
+
+@pytest.fixture
+def lines():
+    rng = np.random.default_rng(7)
+    return (rng.integers(0, 5, 400).astype(np.int32), rng.integers(START, END, 400).astype(np.int32),
+            rng.integers(1, 6, 400).astype(np.float64))
+
+
+def full_fold(lines):
+    sales = SalesData(list('ABCDE'), list('ABCDE'), *lines)
+    state = SmoothingState(5, 0.2)
+    state.fold(sales.daily(START, END), START)
+    return state.rates(END)
+
+
+def assert_same_rates(got, expected):
+    rates, adi, methods = got
+    assert rates.tolist() == pytest.approx(expected[0].tolist())
+    assert adi.tolist() == pytest.approx(expected[1].tolist())
+    assert methods.tolist() == expected[2].tolist()
+
+
+def test_batches_folded_day_by_day_match_a_full_fold(lines):
+    product, day, quantity = lines
+    state = ForecastState(alpha=0.2)
+    for chunk in np.array_split(np.argsort(day, kind='stable'), 4):
+        state.add([(product[chunk], day[chunk], quantity[chunk])], 5)
+        state.advance(int(day[chunk].max()))
+    state.advance(END)
+    assert_same_rates(state.rates(END), full_fold(lines))
+
+
+def test_checkpoint_round_trip(lines, tmp_path):
+    state = ForecastState(alpha=0.2)
+    state.add([lines], 5)
+    state.advance(END - 10)
+    path = str(tmp_path / 'state.npz')
+    state.save(path, {'codes': list('ABCDE'), 'names': list('ABCDE'), 'last_id': 400, 'timezone': 'UTC'})
+
+    restored, meta = ForecastState.load(path)
+    assert (meta['last_id'], meta['timezone'], meta['codes']) == (400, 'UTC', list('ABCDE'))
+    restored.advance(END)
+    assert_same_rates(restored.rates(END), full_fold(lines))
+    assert restored.monthly_totals()[1].sum() == lines[2].sum()
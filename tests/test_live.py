@@ -0,0 +1,44 @@
+# tests/test_live.py
+import pytest
+from extensions import socketio
+from services.billing_service import checkout
+
+
+@pytest.fixture
+def dashboard(app, monkeypatch):
+    # A connected dashboard; the server is dropped again after the test so
+    # other tests keep publishing into nothing
+    monkeypatch.setattr(socketio, 'server', None)
+    socketio.init_app(app, async_mode='threading')
+    dashboard = socketio.test_client(app)
+    yield dashboard
+    dashboard.disconnect()
+
+
+def events(dashboard, name):
+    return [event['args'][0] for event in dashboard.get_received() if event['name'] == name]
+
+
+def test_checkout_publishes_the_sale(dashboard, make_stock):
+    make_stock('A', 10, selling_price=5, price=3, name='Tea')
+    bill_id, _ = checkout('Asha', '9876543210', 'Paid', [('A', 4)])
+
+    [sale] = events(dashboard, 'sale')
+    assert sale['bill_id'] == bill_id
+    assert sale['status'] == 'Paid'
+    assert (sale['amount'], sale['profit']) == (20, 8)
+    assert sale['stock'] == [['A', 'Tea', 6]]
+
+
+def test_status_change_publishes_once(client, dashboard, make_stock):
+    make_stock('A', 10, selling_price=5, price=3)
+    bill_id, _ = checkout('Asha', '9876543210', 'Unpaid', [('A', 2)])
+    dashboard.get_received()
+
+    assert client.post(f'/billing/update_status/{bill_id}', data={'status': 'Paid'}).json['success']
+    assert events(dashboard, 'bill_status') == [
+        {'bill_id': bill_id, 'old_status': 'Unpaid', 'status': 'Paid', 'amount': 10}]
+
+    # Setting the same status again changes nothing and publishes nothing
+    client.post(f'/billing/update_status/{bill_id}', data={'status': 'Paid'})
+    assert events(dashboard, 'bill_status') == []
@@ -0,0 +1,85 @@
+# tests/test_out_of_order_lines.py
+# bill_line ids are handed out at insert but become visible at commit, so a
+# lower id can commit after a higher one has been read. Inserting a line
+# with a lower explicit id after the first read reproduces that.
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'predict'))
+
+from extensions import db
+from services.billing_service import BillHeader, BillLine
+from services.snapshot_service import update_snapshot, load_snapshot
+from services.time_service import shop_today
+from sales_source import SalesSource, init_sales_source
+
+
+@pytest.fixture
+def add_line(make_stock):
+    make_stock('A', 100)
+    make_stock('B', 100)
+
+    def add(line_id, code, quantity):
+        when = datetime.utcnow()
+        header = BillHeader(bill_id=f'B{line_id}', customer_name='Asha', customer_mobile='9876543210',
+                            status='Paid', timestamp=when)
+        db.session.add(header)
+        db.session.flush()
+        db.session.add(BillLine(id=line_id, header_id=header.id, product_code=code, quantity=quantity,
+                                total_price=quantity * 10.0, total_profit=quantity * 4.0, timestamp=when))
+        db.session.commit()
+    return add
+
+
+@pytest.fixture
+def predict_app(app, tmp_path):
+    predict_app = Flask('predict', instance_path=str(tmp_path / 'predict'))
+    predict_app.config.update(SQLALCHEMY_DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'],
+                              PREDICT_STATE_PATH=str(tmp_path / 'predict' / 'state.npz'),
+                              SHOP_TIMEZONE=app.config['SHOP_TIMEZONE'])
+    return predict_app
+
+
+def test_snapshot_picks_up_a_late_lower_id_once(add_line, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    add_line(1, 'A', 1)
+    add_line(10, 'B', 2)
+    assert update_snapshot(path)['appended'] == 2
+
+    add_line(7, 'A', 4)
+    assert update_snapshot(path)['appended'] == 1
+    assert update_snapshot(path)['appended'] == 0
+
+    columns, codes = load_snapshot(path)
+    assert sorted(columns['line_id'].tolist()) == [1, 7, 10]
+    totals = np.bincount(columns['product'], weights=columns['quantity'])
+    assert dict(zip(codes, totals.tolist())) == {'A': 5, 'B': 2}
+
+
+def test_sales_source_picks_up_a_late_lower_id_once(add_line, predict_app):
+    source = init_sales_source(predict_app)
+    today = shop_today()
+    add_line(1, 'A', 1)
+    add_line(10, 'B', 2)
+    with predict_app.app_context():
+        source.refresh(today, lines=True)
+    add_line(7, 'A', 4)
+    with predict_app.app_context():
+        source.refresh(today, lines=True)
+        sales = source.refresh(today, lines=True)
+
+    totals = sales.totals()
+    assert len(sales.quantity) == 3
+    assert {code: totals[i] for code, i in sales.index.items()} == {'A': 5, 'B': 2}
+    assert source.state.monthly_totals()[1].sum() == 7
+
+    # A restart resumes from the checkpoint without counting anything twice
+    restarted = SalesSource(predict_app.config['PREDICT_STATE_PATH'], timezone=predict_app.config['SHOP_TIMEZONE'])
+    with predict_app.app_context():
+        sales = restarted.refresh(today, lines=True)
+    assert restarted.state.monthly_totals()[1].sum() == 7
+    assert sorted(sales.quantity.tolist()) == [1, 2, 4]
@@ -0,0 +1,84 @@
+# tests/test_receipts.py
+import io
+import re
+import time
+import zipfile
+from datetime import datetime
+import pytest
+from services.billing_service import checkout
+from services.receipt_render import receipt_lines, text_pdf
+from services.receipt_service import receipt_bp
+
+
+@pytest.fixture
+def receipts(app, tmp_path):
+    app.config.update(RECEIPTS_DIR=str(tmp_path / 'receipts'), RECEIPT_WORKERS=1)
+    app.register_blueprint(receipt_bp, url_prefix='/receipts')
+    yield app.extensions['receipt_jobs']
+    if app.extensions['receipt_jobs']._pool:
+        app.extensions['receipt_jobs']._pool.shutdown()
+
+
+def wait_for(client, job_id):
+    for _ in range(300):
+        job = client.get(f'/receipts/jobs/{job_id}').json
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError('receipt job did not finish')
+
+
+def test_text_pdf_is_well_formed():
+    pdf = text_pdf([f'line {i} (x)' for i in range(100)])
+    assert pdf.startswith(b'%PDF-1.4\n') and pdf.endswith(b'%%EOF\n')
+    assert b'/Count 2' in pdf  # 54 lines fit on a page
+    assert b'(line 0 \\(x\\)) Tj' in pdf
+
+    # Every xref entry points at the start of its object
+    xref = int(re.search(rb'startxref\n(\d+)', pdf).group(1))
+    offsets = re.findall(rb'(\d{10}) 00000 n', pdf[xref:])
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[int(offset):].startswith(b'%d 0 obj' % number)
+
+
+def test_receipt_lines_list_every_line_and_the_total():
+    bill = {'bill_id': '20260301', 'timestamp': '2026-03-05T16:00:00+05:30', 'customer_name': 'Asha',
+            'customer_mobile': '9876543210', 'status': 'Paid', 'total_price': 12.5,
+            'lines': [{'product_code': 'A', 'product_name': 'Tea', 'quantity': 2, 'total_price': 12.5}]}
+    lines = receipt_lines(bill, 'Shop')
+    assert lines[0] == 'Shop'
+    assert 'Date:     2026-03-05 16:00:00' in lines
+    assert any(line.startswith('A ') and 'Tea' in line and line.endswith('12.50') for line in lines)
+    assert lines[-1] == 'Status: Paid'
+
+
+def test_job_archives_the_bills_of_a_date_range(client, receipts, make_stock):
+    make_stock('A', 10)
+    inside = checkout('Asha', '9876543210', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 5, 6, 0))[0]
+    checkout('Ravi', '9123456780', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 7, 6, 0))
+
+    response = client.post('/receipts/jobs', json={'from': '2026-03-05', 'to': '2026-03-06', 'format': 'html'})
+    assert response.status_code == 202
+    job = wait_for(client, response.json['job_id'])
+    assert (job['status'], job['rendered']) == ('done', 1)
+
+    archive = zipfile.ZipFile(io.BytesIO(client.get(job['archive_url']).data))
+    assert archive.namelist() == [f'receipt_{inside}.html']
+    assert b'Asha' in archive.read(f'receipt_{inside}.html')
+
+
+def test_bad_job_requests_are_rejected(client, receipts):
+    assert client.post('/receipts/jobs', json={'format': 'doc', 'bill_id': 'x'}).status_code == 400
+    assert client.post('/receipts/jobs', json={'from': 'March'}).status_code == 400
+    assert client.get('/receipts/jobs/unknown').status_code == 404
+
+
+def test_cached_receipt_follows_the_bill_status(client, receipts, make_stock):
+    make_stock('A', 10)
+    bill_id = checkout('Asha', '9876543210', 'Unpaid', [('A', 1)])[0]
+
+    first = client.get(f'/receipts/bill/{bill_id}.pdf')
+    assert first.mimetype == 'application/pdf' and b'Status: Unpaid' in first.data
+    client.post(f'/billing/update_status/{bill_id}', data={'status': 'Paid'})
+    assert b'Status: Paid' in client.get(f'/receipts/bill/{bill_id}.pdf').data
+    assert client.get('/receipts/bill/missing.pdf').status_code == 404
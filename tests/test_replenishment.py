@@ -0,0 +1,112 @@
+# tests/test_replenishment.py
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+import math
+import numpy as np
+from extensions import db
+from services.stock_service import add_lot
+from services.party_service import Party, DEFAULT_LEAD_TIME_DAYS
+from services.rollup_service import DailySalesRollup
+from services.replenishment_service import replenishment_plan, reorder_list
+
+TODAY = date(2026, 3, 31)
+
+
+def sell(code, quantities):
+    """Rollup rows for the days before TODAY, the last quantity yesterday."""
+    db.session.add_all(DailySalesRollup(day=TODAY - timedelta(days=len(quantities) - i), product_code=code,
+                                        quantity=quantity, bill_lines=1)
+                       for i, quantity in enumerate(quantities) if quantity)
+    db.session.commit()
+
+
+def plan():
+    return {row['product_code']: row for row in replenishment_plan(TODAY)}
+
+
+def test_reorder_point_and_order_quantity(make_stock):
+    party = Party('Acme', 'x', 'Pending', datetime(2026, 3, 1), lead_time_days=4)
+    db.session.add(party)
+    db.session.commit()
+    make_stock('A', 15, party_id=party.id)
+    make_stock('C', 200)
+    sell('A', [5] * 90)
+    demand = [0, 3, 9, 1] * 20
+    sell('C', demand)
+
+    rows = plan()
+    a = rows['A']
+    assert (a['supplier'], a['lead_time_days'], a['daily_demand'], a['demand_std']) == ('Acme', 4, 5, 0)
+    assert (a['reorder_point'], a['order_quantity'], a['days_of_stock']) == (20, 75, 3.0)
+
+    # Days without sales count as zero demand; C has the default lead time of 7
+    history = np.array([0] * 10 + demand, dtype=float)
+    mean, std = history.mean(), history.std(ddof=1)
+    safety = NormalDist().inv_cdf(0.95) * std * math.sqrt(7)
+    c = rows['C']
+    assert c['lead_time_days'] == 7 and c['supplier'] is None
+    assert c['daily_demand'] == round(mean, 3) and c['demand_std'] == round(std, 3)
+    assert c['reorder_point'] == math.ceil(mean * 7 + safety)
+    assert c['order_quantity'] == 0
+
+
+def test_out_of_stock_products_are_always_ordered(make_stock):
+    make_stock('B', 0)
+    assert plan()['B']['order_quantity'] == 1
+    assert [row['product_code'] for row in reorder_list(TODAY)] == ['B']
+
+
+def test_expired_units_are_not_available(make_stock):
+    make_stock('E', 10, expiry='2026-06-01')
+    add_lot('E', 4, '2026-03-01', 6.0)
+    db.session.commit()
+    sell('E', [1] * 90)
+    row = plan()['E']
+    assert (row['quantity'], row['available']) == (10, 6)
+    assert row['order_quantity'] == math.ceil(1 * (7 + 14) - 6)
+
+
+def test_soonest_to_run_out_comes_first(make_stock):
+    make_stock('SLOW', 1)
+    make_stock('FAST', 10)
+    make_stock('NONE', 0)
+    sell('SLOW', [1, 0] * 45)
+    sell('FAST', [8] * 90)
+    assert [row['product_code'] for row in reorder_list(TODAY)] == ['NONE', 'FAST', 'SLOW']
+
+
+def test_plan_route(client, make_stock):
+    make_stock('A', 0)
+    response = client.get('/replenishment/plan')
+    assert response.status_code == 200
+    assert [row['product_code'] for row in response.json['products']] == ['A']
+    assert client.get('/replenishment/plan?service_level=1.5').status_code == 400
+    assert client.get('/replenishment/plan?history_days=1').status_code == 400
+
+
+def test_forms_set_supplier_and_lead_time(client, make_stock):
+    assert client.post('/party/add', data={'party_name': 'Acme', 'contact_details': 'x',
+                                           'order_reminder': '2026-03-01', 'lead_time_days': '3'}).status_code == 302
+    party = Party.query.one()
+    assert client.post('/party/add', data={'party_name': 'Bad', 'contact_details': 'x',
+                                           'order_reminder': '2026-03-01', 'lead_time_days': '-1'}).status_code == 400
+    assert b'Acme' in client.get('/party/details').data
+
+    form = {'item_name': 'Tea', 'selling_price': '10', 'price': '6', 'expiry': '2030-01-01', 'quantity': '0',
+            'party_id': str(party.id)}
+    assert client.post('/stock/add', data=form).status_code == 302
+    assert plan()['TEA1']['lead_time_days'] == 3
+
+    client.post(f'/party/edit/{party.id}', data={'party_name': 'Acme', 'contact_details': 'y',
+                                                  'order_reminder': '2026-03-02', 'lead_time_days': '9'})
+    assert plan()['TEA1']['lead_time_days'] == 9
+
+
+def test_default_lead_time_is_shared(client, make_stock):
+    make_stock('A', 0)
+    assert plan()['A']['lead_time_days'] == DEFAULT_LEAD_TIME_DAYS
+
+    client.post('/party/add', data={'party_name': 'Acme', 'contact_details': 'x',
+                                    'order_reminder': '2026-03-01', 'lead_time_days': ''})
+    assert Party.query.one().lead_time_days == DEFAULT_LEAD_TIME_DAYS
+    assert f'value="{DEFAULT_LEAD_TIME_DAYS}"' in client.get('/party/add').get_data(as_text=True)
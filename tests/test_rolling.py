@@ -0,0 +1,77 @@
+# tests/test_rolling.py
+import os
+import sys
+from datetime import date
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'predict'))
+
+from rolling import PrefixSums, parse_window
+from sales_engine import SalesData
+
+BASE, END = 500, 560
+
+
+@pytest.fixture
+def sales():
+    rng = np.random.default_rng(3)
+    return SalesData(list('ABCD'), list('ABCD'), rng.integers(0, 4, 300).astype(np.int32),
+                     rng.integers(BASE - 10, END, 300).astype(np.int32), rng.integers(1, 9, 300).astype(np.float64))
+
+
+def brute(sales, products, start, end, base=BASE):
+    return [sales.quantity[(sales.product == p) & (sales.day >= max(start, base)) & (sales.day < end)].sum()
+            for p in products]
+
+
+def test_windows_match_a_direct_sum(sales):
+    prefix = PrefixSums.from_sales(sales, BASE, END)
+    starts, ends = [BASE, 510, 530, 559, 540], [END, 520, 531, 560, 540]
+    matrix = prefix.windows([0, 1, 2, 3], starts, ends)
+    assert matrix.shape == (5, 4)
+    for row, start, end in zip(matrix, starts, ends):
+        assert row.tolist() == brute(sales, range(4), start, end)
+
+
+def test_windows_are_clipped_to_the_covered_days(sales):
+    prefix = PrefixSums.from_sales(sales, BASE, END)
+    assert prefix.windows([1], [BASE - 30], [END + 30]).tolist() == [brute(sales, [1], BASE, END)]
+    assert prefix.windows([1], [END + 5], [END + 9]).tolist() == [[0]]
+
+
+def test_added_lines_match_a_rebuild(sales):
+    head = sales.day < 540
+    early = SalesData(list('ABCD'), list('ABCD'), sales.product[head], sales.day[head], sales.quantity[head])
+    prefix = PrefixSums.from_sales(early, BASE, 540)
+    prefix.add([(sales.product[~head], sales.day[~head], sales.quantity[~head])], 5, END)
+
+    # The 40 days kept move up with the end
+    assert (prefix.base_day, prefix.end_day) == (END - 40, END)
+    for start, end in ((END - 40, END), (525, 545), (550, 551)):
+        assert prefix.windows(range(5), [start], [end]).tolist() == \
+            [brute(sales, range(5), start, end, base=END - 40)]
+
+
+def test_days_older_than_the_window_are_dropped():
+    prefix = PrefixSums(0, 2, max_days=30)
+    for day in range(1000):
+        prefix.add([(np.array([0, 1], dtype=np.int32), np.array([day, day]), np.array([1.0, 2.0]))], 2, day + 1)
+        assert len(prefix._buffer) <= 31 + 32
+    assert (prefix.base_day, prefix.end_day) == (970, 1000)
+    assert prefix.windows([0, 1], [970, 990], [1000, 1000]).tolist() == [[30, 60], [10, 20]]
+
+    # A gap longer than the window keeps the totals and covers the new days
+    prefix.add([], 2, 1500)
+    assert (prefix.base_day, prefix.end_day) == (1470, 1500)
+    assert prefix.windows([0], [1470], [1500]).tolist() == [[0]]
+
+
+def test_parse_window():
+    today = date(2026, 3, 31)
+    assert parse_window('7', today) == (date(2026, 3, 25), today)
+    assert parse_window('2026-01-01:2026-01-31', today) == (date(2026, 1, 1), date(2026, 1, 31))
+    assert parse_window({'from': '2026-03-01'}, today) == (date(2026, 3, 1), today)
+    for spec in ('0', '2026-02-01:2026-01-01', 'soon'):
+        with pytest.raises(ValueError):
+            parse_window(spec, today)
@@ -0,0 +1,59 @@
+# tests/test_rollup.py
+from datetime import date, datetime
+from extensions import db
+from services.billing_service import checkout
+from services.rollup_service import DailySalesRollup, rebuild_rollup, rollup_totals
+
+COLUMNS = ('quantity', 'revenue', 'cost', 'profit', 'unpaid_revenue', 'bill_lines')
+
+
+def rollup():
+    rows = DailySalesRollup.query.order_by(DailySalesRollup.day, DailySalesRollup.product_code)
+    return {(row.day, row.product_code): tuple(getattr(row, name) for name in COLUMNS)
+            for row in rows if row.bill_lines}
+
+
+def assert_matches_rebuild():
+    kept = rollup()
+    rebuild_rollup()
+    assert kept == rollup()
+
+
+def test_sales_land_on_the_shop_day(make_stock):
+    make_stock('A', 10, selling_price=5, price=3)
+    # 19:00 UTC is 00:30 the next day in Asia/Kolkata
+    checkout('Asha', '9876543210', 'Unpaid', [('A', 2)], timestamp=datetime(2026, 3, 5, 19, 0))
+    checkout('Ravi', '9123456780', 'Paid', [('A', 1)], timestamp=datetime(2026, 3, 6, 5, 0))
+
+    assert rollup() == {(date(2026, 3, 6), 'A'): (3, 15.0, 9.0, 6.0, 10.0, 2)}
+    assert rollup_totals(date(2026, 3, 6), date(2026, 3, 7))['revenue'] == 15.0
+
+
+def test_status_changes_and_deletes_keep_the_rollup_exact(client, make_stock):
+    make_stock('A', 20, selling_price=5, price=3)
+    make_stock('B', 20, selling_price=9, price=4)
+    bills = [checkout('Asha', '9876543210', status, cart, timestamp=when)[0] for status, cart, when in (
+        ('Unpaid', [('A', 2), ('B', 1)], datetime(2026, 3, 5, 8)),
+        ('Unpaid', [('A', 1)], datetime(2026, 3, 5, 9)),
+        ('Paid', [('B', 3)], datetime(2026, 3, 6, 9)),
+    )]
+    assert_matches_rebuild()
+
+    assert client.post(f'/billing/update_status/{bills[0]}', data={'status': 'Paid'}).status_code == 200
+    assert rollup()[(date(2026, 3, 5), 'A')][4] == 5.0
+    assert_matches_rebuild()
+
+    assert client.post(f'/billing/update_status/{bills[2]}', data={'status': 'Unpaid'}).status_code == 200
+    # Setting the same status again must not count it twice
+    assert client.post(f'/billing/update_status/{bills[2]}', data={'status': 'Unpaid'}).status_code == 200
+    assert rollup()[(date(2026, 3, 6), 'B')][4] == 27.0
+    assert_matches_rebuild()
+
+    assert client.post(f'/billing/delete/{bills[1]}').status_code == 302
+    assert rollup()[(date(2026, 3, 5), 'A')] == (2, 10.0, 6.0, 4.0, 0.0, 1)
+    assert_matches_rebuild()
+
+    assert client.post(f'/billing/delete/{bills[0]}').status_code == 302
+    assert client.post(f'/billing/delete/{bills[2]}').status_code == 302
+    assert rollup() == {}
+    assert db.session.query(db.func.sum(DailySalesRollup.quantity)).scalar() == 0
@@ -0,0 +1,87 @@
+# tests/test_sales_engine.py
+import os
+import sys
+from datetime import date
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'predict'))
+
+from sales_engine import SalesData, day_number, month_number, month_window, most_least, top_bottom
+
+
+@pytest.fixture
+def sales():
+    # 400 random lines of 6 products over roughly a year and a half
+    rng = np.random.default_rng(3)
+    first = day_number(date(2025, 1, 1))
+    sales = SalesData.empty()
+    codes = [f'P{i}' for i in rng.integers(0, 6, 400)]
+    product = sales.product_indexes(codes, [f'Item {code}' for code in codes])
+    sales.extend([(product[:200], rng.integers(first, first + 540, 200).astype(np.int32),
+                   rng.integers(1, 5, 200).astype(np.float64)),
+                  (product[200:], rng.integers(first, first + 540, 200).astype(np.int32),
+                   rng.integers(1, 5, 200).astype(np.float64))])
+    return sales
+
+
+def brute(sales, keep):
+    totals = np.zeros(sales.n_products)
+    for p, d, q in zip(sales.product, sales.day, sales.quantity):
+        if keep(int(d)):
+            totals[p] += q
+    return totals
+
+
+def test_totals_and_daily_match_a_loop(sales):
+    start, end = day_number(date(2025, 6, 1)), day_number(date(2025, 7, 1))
+    assert np.array_equal(sales.totals(), brute(sales, lambda d: True))
+    assert np.array_equal(sales.totals(start, end), brute(sales, lambda d: start <= d < end))
+
+    daily = sales.daily(start, end)
+    assert daily.shape == (30, sales.n_products)
+    assert np.array_equal(daily[5], brute(sales, lambda d: d == start + 5))
+    assert np.array_equal(daily.sum(axis=0), sales.totals(start, end))
+
+
+def test_monthly_matches_calendar_months(sales):
+    monthly = sales.monthly()
+    first, matrix = monthly
+    assert first == month_number(date(2025, 1, 1))
+
+    def month_of(d):
+        return month_number(date.fromordinal(date(1970, 1, 1).toordinal() + d))
+
+    june = month_number(date(2025, 6, 1))
+    assert np.array_equal(matrix[june - first], brute(sales, lambda d: month_of(d) == june))
+    assert np.array_equal(month_window(monthly, june, 3),
+                          brute(sales, lambda d: june - 3 < month_of(d) <= june))
+    # Months before the first sale contribute nothing
+    assert np.array_equal(month_window(monthly, first - 1, 12), np.zeros(sales.n_products))
+
+
+def test_product_indexes_keep_codes_and_latest_names():
+    sales = SalesData.empty()
+    assert sales.product_indexes(['A', 'B', 'A'], ['Tea', 'Salt', 'Tea']).tolist() == [0, 1, 0]
+    assert sales.product_indexes(['B', 'C'], ['Rock salt', 'Rice']).tolist() == [1, 2]
+    assert (sales.codes, sales.names) == (['A', 'B', 'C'], ['Tea', 'Rock salt', 'Rice'])
+
+
+def test_most_least_ignores_unsold_and_breaks_ties():
+    assert most_least(np.array([0.0, 0.0])) == (None, None)
+    # Most sold: first of the tied; least sold: last of the tied among those that sold
+    assert most_least(np.array([3.0, 0.0, 5.0, 5.0, 1.0, 1.0])) == (2, 5)
+
+
+@pytest.mark.parametrize('n', [1, 3, 10, 40, 100])
+def test_top_bottom_match_a_full_sort(n):
+    totals = np.random.default_rng(n).integers(0, 8, 40).astype(np.float64)  # plenty of ties
+    top, bottom = top_bottom(totals, n)
+    by_total = sorted(range(len(totals)), key=lambda i: (-totals[i], i))
+    assert top.tolist() == by_total[:n]
+    assert bottom.tolist() == sorted(range(len(totals)), key=lambda i: (totals[i], i))[:n]
+
+
+def test_top_bottom_of_nothing():
+    top, bottom = top_bottom(np.zeros(0), 5)
+    assert len(top) == len(bottom) == 0
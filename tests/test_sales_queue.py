@@ -0,0 +1,89 @@
+# tests/test_sales_queue.py
+import pytest
+from sqlalchemy.exc import OperationalError
+from extensions import db
+from services import sales_queue_service
+from services.stock_service import Stock
+from services.billing_service import BillHeader, CheckoutError, checkout
+from services.sales_queue_service import init_sales_queue, sync_pending
+
+
+@pytest.fixture
+def queue(app, tmp_path, make_stock):
+    make_stock('A', 5)
+    return init_sales_queue(app, str(tmp_path / 'sales_queue.db'))
+
+
+def entries(queue):
+    return [dict(row) for row in queue._conn.execute('SELECT id, client_ref, status, bill_id FROM queued_bill')]
+
+
+def test_queued_bills_are_replayed_once(queue):
+    refs = [queue.enqueue('Asha', '9876543210', 'Paid', [('A', 1)])[0] for _ in range(2)]
+    assert sync_pending(queue) == 2
+    synced = entries(queue)
+    assert [entry['status'] for entry in synced] == ['synced', 'synced']
+    assert dict(db.session.query(BillHeader.client_ref, BillHeader.bill_id)) == \
+        {entry['client_ref']: entry['bill_id'] for entry in synced}
+    assert set(refs) == {entry['client_ref'] for entry in synced}
+
+    # A run that died after the checkout but before marking replays the bill again
+    queue.mark(synced[0]['id'], 'pending')
+    assert sync_pending(queue) == 1
+    assert BillHeader.query.count() == 2
+    assert entries(queue) == synced
+    assert db.session.query(Stock.quantity).scalar() == 3
+
+
+def test_local_stock_holds_back_unsynced_bills(queue):
+    queue.enqueue('Asha', '9876543210', 'Paid', [('A', 4)])
+    queue.refresh_stock([('A', 'Item A', 10.0, 6.0, 5)])
+    with pytest.raises(CheckoutError):
+        queue.enqueue('Asha', '9876543210', 'Paid', [('A', 2)])
+
+
+def test_conflict_is_parked_and_the_queue_moves_on(queue, client):
+    queue.enqueue('Asha', '9876543210', 'Paid', [('A', 4)])
+    queue.enqueue('Ravi', '9123456780', 'Paid', [('A', 1)])
+    # Sold at another till before the sync
+    checkout('Meera', '9000000000', 'Paid', [('A', 3)])
+
+    assert sync_pending(queue) == 2
+    first, second = entries(queue)
+    assert (first['status'], second['status']) == ('conflict', 'synced')
+    assert client.get('/sales-queue/').json['conflicts'][0]['error'] == \
+        'Not enough stock available for product A'
+
+    db.session.query(Stock).update({'quantity': 10})
+    db.session.commit()
+    assert client.post(f"/sales-queue/retry/{first['id']}").status_code == 200
+    assert sync_pending(queue) == 1
+    assert entries(queue)[0]['status'] == 'synced'
+    assert client.post(f"/sales-queue/retry/{first['id']}").status_code == 404
+
+
+def test_sells_before_the_first_sync(queue):
+    _, lines = queue.enqueue('Asha', '9876543210', 'Paid', [('A', 2)])
+    assert lines[0]['total_price'] == 20.0
+
+
+def test_keeps_the_saved_stock_copy_while_the_server_is_down(app, tmp_path, queue, monkeypatch):
+    def unreachable():
+        raise OperationalError('SELECT', {}, Exception('server has gone away'))
+    monkeypatch.setattr(sales_queue_service, 'server_catalog', unreachable)
+
+    restarted = init_sales_queue(app, str(tmp_path / 'sales_queue.db'))
+    restarted.enqueue('Asha', '9876543210', 'Paid', [('A', 5)])
+    with pytest.raises(CheckoutError):
+        restarted.enqueue('Asha', '9876543210', 'Paid', [('A', 1)])
+
+
+def test_stock_changes_wake_the_sync(queue, client):
+    queue.wakeup.clear()
+    form = {'item_name': 'Item A', 'selling_price': '10', 'price': '6', 'expiry': '2030-01-01',
+            'quantity': '9', 'party_id': ''}
+    assert client.post('/stock/edit/A', data=form).status_code == 302
+    assert queue.wakeup.is_set()
+
+    sync_pending(queue)
+    queue.enqueue('Asha', '9876543210', 'Paid', [('A', 9)])
@@ -0,0 +1,42 @@
+# tests/test_sales_report.py
+from datetime import datetime
+from services.billing_service import checkout
+
+
+def sell(code, quantity, when):
+    checkout('Asha', '9876543210', 'Paid', [(code, quantity)], timestamp=when)
+
+
+def test_days_follow_the_shop_timezone(client, make_stock):
+    make_stock('A', 50, selling_price=5, price=3)
+    sell('A', 1, datetime(2026, 3, 2, 6, 0))
+    # 20:00 UTC is already 01:30 the next day in the shop (Asia/Kolkata)
+    sell('A', 2, datetime(2026, 3, 4, 20, 0))
+
+    report = client.get('/reports/sales?from=2026-03-01&to=2026-03-31').json
+    assert [(row['period'], row['quantity'], row['revenue']) for row in report['rows']] == \
+        [('2026-03-02', 1, 5), ('2026-03-05', 2, 10)]
+    assert report['totals'] == {'quantity': 3, 'revenue': 15, 'cost': 9, 'profit': 6}
+
+
+def test_weeks_and_months_and_products(client, make_stock):
+    make_stock('A', 50, selling_price=5, price=3, name='Tea')
+    make_stock('B', 50, selling_price=2, price=1, name='Salt')
+    sell('A', 1, datetime(2026, 3, 2, 6, 0))   # Monday
+    sell('B', 3, datetime(2026, 3, 8, 6, 0))   # Sunday, same week
+    sell('A', 2, datetime(2026, 3, 9, 6, 0))   # next Monday
+    sell('A', 4, datetime(2026, 4, 1, 6, 0))
+
+    weeks = client.get('/reports/sales?from=2026-03-01&to=2026-03-31&group=week').json
+    assert [(row['period'], row['revenue']) for row in weeks['rows']] == [('2026-03-02', 11), ('2026-03-09', 10)]
+
+    months = client.get('/reports/sales?from=2026-03-01&to=2026-04-30&group=month&by=product').json
+    assert [(row['period'], row['product_code'], row['product_name'], row['quantity'])
+            for row in months['rows']] == [('2026-03', 'A', 'Tea', 3), ('2026-03', 'B', 'Salt', 3),
+                                           ('2026-04', 'A', 'Tea', 4)]
+
+
+def test_bad_ranges_are_rejected(client):
+    assert client.get('/reports/sales?from=2026-03-05&to=2026-03-01').status_code == 400
+    assert client.get('/reports/sales?from=March').status_code == 400
+    assert client.get('/reports/sales?group=year').status_code == 400
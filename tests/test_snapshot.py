@@ -0,0 +1,60 @@
+# tests/test_snapshot.py
+import os
+from datetime import datetime, timezone
+from services.billing_service import checkout
+from services.snapshot_service import load_snapshot, read_meta, update_snapshot
+
+
+def epoch(when):
+    return int(when.replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_columns_hold_every_line(make_stock, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    make_stock('A', 10, selling_price=5, price=3)
+    make_stock('B', 10, selling_price=2, price=1)
+    when = datetime(2026, 3, 5, 10, 30)
+    checkout('Asha', '9876543210', 'Paid', [('A', 2), ('B', 3)], timestamp=when)
+
+    result = update_snapshot(path)
+    assert (result['rows'], result['appended'], result['products']) == (2, 2, 2)
+    columns, codes = load_snapshot(path)
+    assert [codes[i] for i in columns['product']] == ['A', 'B']
+    assert columns['quantity'].tolist() == [2, 3]
+    assert columns['price'].tolist() == [10, 6]
+    assert columns['profit'].tolist() == [4, 3]
+    assert columns['timestamp'].tolist() == [epoch(when)] * 2
+
+
+def test_updates_append_and_rebuild_starts_over(make_stock, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    make_stock('A', 10)
+    checkout('Asha', '9876543210', 'Paid', [('A', 1)])
+    update_snapshot(path)
+    checkout('Ravi', '9123456780', 'Paid', [('A', 2)])
+
+    assert update_snapshot(path)['appended'] == 1
+    result = update_snapshot(path, rebuild=True)
+    assert (result['rows'], result['appended'], result['products']) == (2, 2, 1)
+    assert load_snapshot(path)[0]['quantity'].tolist() == [1, 2]
+
+
+def test_rows_an_interrupted_update_wrote_are_dropped(make_stock, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    make_stock('A', 10)
+    checkout('Asha', '9876543210', 'Paid', [('A', 1)])
+    update_snapshot(path)
+    # Bytes written after the last meta.json, as a crash mid-update leaves them
+    with open(os.path.join(path, 'quantity.bin'), 'ab') as f:
+        f.write(b'\0' * 24)
+
+    checkout('Ravi', '9123456780', 'Paid', [('A', 2)])
+    update_snapshot(path)
+    assert read_meta(path)['rows'] == 2
+    assert load_snapshot(path)[0]['quantity'].tolist() == [1, 2]
+    assert os.path.getsize(os.path.join(path, 'quantity.bin')) == 2 * 8
+
+
+def test_empty_snapshot_loads_as_empty_columns(tmp_path):
+    columns, codes = load_snapshot(str(tmp_path / 'missing'))
+    assert codes == [] and all(len(values) == 0 for values in columns.values())
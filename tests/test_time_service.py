@@ -0,0 +1,62 @@
+# tests/test_time_service.py
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytest
+from services.time_service import (day_start, period_dates, sale_day, shop_days, shop_today,
+                                   time_window, to_utc)
+
+
+@pytest.fixture
+def zone(app):
+    def use(name):
+        app.config['SHOP_TIMEZONE'] = name
+    with app.app_context():
+        yield use
+
+
+def test_day_window_starts_at_local_midnight(zone):
+    assert time_window('day', date(2026, 3, 5)) == (datetime(2026, 3, 4, 18, 30), datetime(2026, 3, 5, 18, 30))
+    assert sale_day(datetime(2026, 3, 4, 18, 29, 59)) == date(2026, 3, 4)
+    assert sale_day(datetime(2026, 3, 4, 18, 30)) == date(2026, 3, 5)
+
+
+def test_windows_across_dst_changes(zone):
+    zone('America/New_York')
+    # Clocks go forward on 8 March 2026 and back on 1 November 2026
+    start, end = time_window('day', date(2026, 3, 8))
+    assert (start, end) == (datetime(2026, 3, 8, 5, 0), datetime(2026, 3, 9, 4, 0))
+    start, end = time_window('day', date(2026, 11, 1))
+    assert end - start == timedelta(hours=25)
+    start, end = time_window('month', date(2026, 3, 20))
+    assert (start, end) == (datetime(2026, 3, 1, 5, 0), datetime(2026, 4, 1, 4, 0))
+    assert to_utc(datetime(2026, 7, 1, 0, 0)) == datetime(2026, 7, 1, 4, 0)
+
+
+def test_period_dates():
+    thursday = date(2026, 3, 5)
+    assert period_dates('day', thursday) == (thursday, date(2026, 3, 6))
+    assert period_dates('week', thursday) == (date(2026, 3, 2), date(2026, 3, 9))
+    assert period_dates('month', date(2026, 1, 31)) == (date(2026, 1, 1), date(2026, 2, 1))
+    assert period_dates('month', date(2026, 12, 31)) == (date(2026, 12, 1), date(2027, 1, 1))
+    assert period_dates('year', thursday) == (date(2026, 1, 1), date(2027, 1, 1))
+    with pytest.raises(ValueError):
+        period_dates('fortnight', thursday)
+
+
+@pytest.mark.parametrize('name', ['Asia/Kolkata', 'America/New_York', 'Australia/Lord_Howe'])
+def test_shop_days_match_sale_day_around_offset_changes(zone, name):
+    zone(name)
+    # Every 10 minutes through days holding both of the year's changes (Lord Howe moves by 30 minutes)
+    timestamps = []
+    for first in (datetime(2026, 3, 7), datetime(2026, 4, 4), datetime(2026, 10, 3), datetime(2026, 10, 31)):
+        timestamps += [first + timedelta(minutes=10 * i) for i in range(3 * 144)]
+    epoch = date(1970, 1, 1)
+    expected = [(sale_day(timestamp) - epoch).days for timestamp in timestamps]
+    assert shop_days(timestamps).tolist() == expected
+    assert shop_days([]).dtype == np.int32
+
+
+def test_today_and_midnight_agree(zone):
+    today = shop_today()
+    assert sale_day(day_start(today)) == today
+    assert sale_day(day_start(today) - timedelta(seconds=1)) == today - timedelta(days=1)